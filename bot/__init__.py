@@ -1,10 +1,23 @@
 # coding=utf-8
-import ast
+import functools
 import logging
-import sys
-from logging import Logger, StreamHandler
+import os
+from logging import Logger
+from typing import Callable, Optional, Tuple
 
-import discord.ext.commands.view
+# Installs the import profiler, so this has to come before the other imports
+import bot.profiling  # noqa: F401, I100
+
+import discord.ext.commands.view  # noqa: I100
+from discord.state import ConnectionState
+
+from bot.arguments import parse_arguments
+from bot.constants import (
+    INVOCATION_CACHE_MAX_LENGTH, INVOCATION_CACHE_SIZE, LOG_FILE_BACKUPS, LOG_FILE_MAX_BYTES, LOG_QUEUE_SIZE
+)
+from bot.decorators import invalidate_member_roles, member_roles
+from bot.logs import setup_logging
+from bot.utils import LRUCache
 
 
 logging.TRACE = 5
@@ -26,14 +39,13 @@ def monkeypatch_trace(self, msg, *args, **kwargs):
 
 Logger.trace = monkeypatch_trace
 
-# Set up logging
-logging_handlers = [StreamHandler(stream=sys.stderr)]
+# Set up logging - LOG_LEVEL can be any level name, including TRACE. Records are written by a background thread,
+# to stderr and optionally LOG_FILE, as text or as JSON with LOG_FORMAT=json
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
 
-logging.basicConfig(
-    format="%(asctime)s Bot: | %(name)30s | %(levelname)8s | %(message)s",
-    datefmt="%b %d %H:%M:%S",
-    level=logging.TRACE,
-    handlers=logging_handlers
+log_listener = setup_logging(
+    LOG_LEVEL, log_format=os.environ.get("LOG_FORMAT", "text"), path=os.environ.get("LOG_FILE"),
+    queue_size=LOG_QUEUE_SIZE, max_bytes=LOG_FILE_MAX_BYTES, backups=LOG_FILE_BACKUPS
 )
 
 log = logging.getLogger(__name__)
@@ -52,16 +64,77 @@ def _skip_string(self, string: str) -> bool:
     discord.ext.commands.view; used to find
     the prefix in a message, but allowing prefix
     to ignore case sensitivity
+
+    Only the window being compared is lowered, rather
+    than the whole message for every prefix we try
     """
 
     strlen = len(string)
-    if self.buffer.lower()[self.index:self.index + strlen] == string:
+    if self.buffer[self.index:self.index + strlen].lower() == string:
         self.previous = self.index
         self.index += strlen
         return True
     return False
 
 
+def _parse_word(text: str) -> Tuple[int, str, Optional[str]]:
+    """
+    Parse the command part of a message, starting
+    right after the prefix.
+
+    This only depends on the text it's given, so the
+    result can be cached and replayed onto a StringView.
+
+    :param text: The rest of the message buffer
+    :return: How far to move the view's index, the
+             command name, and the new rest of the
+             buffer (or None to leave the buffer as it is)
+    """
+
+    pos = 0
+    current = None
+    while pos < len(text):
+        current = text[pos]
+        if current.isspace() or current == "(":
+            break
+        pos += 1
+
+    result = text[:pos]
+    next = None
+    tail = None
+
+    # Check what's after the '('
+    if len(text) > pos + 1:
+        next = text[pos + 1]
+
+    # Conditions for a parsable command - plain commands never reach the tokenizer
+    args = None
+    if current == "(" and next and next != ")":
+        log.trace("Parsing command arguments with the argument tokenizer.")
+        args = parse_arguments(text[pos:])
+
+        if args is None:
+            log.warning("The command cannot be parsed as a Python-style call because it raises a SyntaxError.")
+            # TODO: It would be nice if this actually made the bot return a SyntaxError. ClickUp #1b12z  # noqa: T000
+
+    if args is not None:
+        log.debug("A python-style command was used. Command text is %s. "
+                  "A step-by-step can be found in the trace log.", text)
+
+        # Every argument is already a string, so all that's left is to wrap them in double quotes for discord.py
+        new_args = " ".join(f'"{arg}"' for arg in args)
+        tail = f" {new_args}"
+        log.trace("Modified the buffer. New command text is now %s%s", result, tail)
+
+    elif current == "(" and next == ")":
+        # Move the cursor to capture the ()'s
+        log.debug("User called command without providing arguments.")
+        pos += 2
+        result = text[:pos]
+
+    return pos, result.lower(), tail  # Case insensitivity, baby
+
+
 def _get_word(self) -> str:
     """
     Invokes the get_word method from
@@ -70,6 +143,9 @@ def _get_word(self) -> str:
     allows the command to ignore case sensitivity,
     and allows commands to have Python syntax.
 
+    Parsed invocations are cached on the text after
+    the prefix, so repeated commands skip parsing.
+
     Example of valid Python syntax calls:
     ------------------------------
     bot.tags.set("test", 'a dark, dark night')
@@ -77,88 +153,74 @@ def _get_word(self) -> str:
     bot.hELP(tags.delete)
     """
 
-    pos = 0
-    while not self.eof:
-        try:
-            current = self.buffer[self.index + pos]
-            if current.isspace() or current == "(":
-                break
-            pos += 1
-        except IndexError:
-            break
+    text = self.buffer[self.index:]
+    parsed = invocation_cache.get(text)
+
+    if parsed is None:
+        parsed = _parse_word(text)
+
+        if len(text) <= INVOCATION_CACHE_MAX_LENGTH:
+            invocation_cache[text] = parsed
+    else:
+        log.trace("Invocation cache hit.")
+
+    pos, result, tail = parsed
 
     self.previous = self.index
-    result = self.buffer[self.index:self.index + pos]
     self.index += pos
-    next = None
 
-    # Check what's after the '('
-    if len(self.buffer) != self.index:
-        next = self.buffer[self.index + 1]
-
-    # Is it possible to parse this without syntax error?
-    syntax_valid = True
-    try:
-        ast.literal_eval(self.buffer[self.index:])
-    except SyntaxError:
-        log.warning("The command cannot be parsed by ast.literal_eval because it raises a SyntaxError.")
-        # TODO: It would be nice if this actually made the bot return a SyntaxError. ClickUp #1b12z  # noqa: T000
-        syntax_valid = False
-
-    # Conditions for a valid, parsable command.
-    python_parse_conditions = (
-        current == "("
-        and next
-        and next != ")"
-        and syntax_valid
-    )
-
-    if python_parse_conditions:
-        log.debug(f"A python-style command was used. Attempting to parse. Buffer is {self.buffer}. "
-                  "A step-by-step can be found in the trace log.")
-
-        # Parse the args
-        log.trace("Parsing command with ast.literal_eval.")
-        args = self.buffer[self.index:]
-        args = ast.literal_eval(args)
-
-        # Force args into container
-        if isinstance(args, str):
-            args = (args,)
-
-        # Type validate and format
-        new_args = []
-        for arg in args:
-
-            # Other types get converted to strings
-            if not isinstance(arg, str):
-                log.trace(f"{arg} is not a str, casting to str.")
-                arg = str(arg)
-
-            # Adding double quotes to every argument
-            log.trace(f"Wrapping all args in double quotes.")
-            new_args.append(f'"{arg}"')
-
-        # Add the result to the buffer
-        new_args = " ".join(new_args)
-        self.buffer = f"{self.buffer[:self.index]} {new_args}"
-        log.trace(f"Modified the buffer. New buffer is now {self.buffer}")
+    if tail is not None:
+        self.buffer = f"{self.buffer[:self.index]}{tail}"
 
         # Recalibrate the end since we've removed commas
         self.end = len(self.buffer)
 
-    elif current == "(" and next == ")":
-        # Move the cursor to capture the ()'s
-        log.debug("User called command without providing arguments.")
-        pos += 2
-        result = self.buffer[self.previous:self.index + (pos+2)]
-        self.index += 2
-
-    if isinstance(result, str):
-        return result.lower()  # Case insensitivity, baby
     return result
 
 
+# Parsed invocations, shared by every StringView - see _get_word
+invocation_cache = LRUCache(maxsize=INVOCATION_CACHE_SIZE)
+
 # Monkey patch the methods
 discord.ext.commands.view.StringView.skip_string = _skip_string
 discord.ext.commands.view.StringView.get_word = _get_word
+
+
+def _invalidating_member_roles(parse: Callable) -> Callable:
+    """
+    Wrap the parser of a member event, so the cached role IDs that the role checks
+    use are dropped before the event is handled.
+
+    This works from the raw event rather than a listener, since discord.py only
+    dispatches member events for members it has cached, and the cache policy
+    might have left the member out.
+    """
+
+    @functools.wraps(parse)
+    def parse_and_invalidate(self, data):
+        invalidate_member_roles(int(data["guild_id"]), int(data["user"]["id"]))
+        return parse(self, data)
+
+    return parse_and_invalidate
+
+
+def _clearing_member_roles(parse: Callable) -> Callable:
+    """
+    Wrap the parser of the role delete event, to drop every cached set of role IDs -
+    members losing a deleted role don't get an update event, and this is rare enough
+    to just start over
+    """
+
+    @functools.wraps(parse)
+    def parse_and_clear(self, data):
+        log.debug("Role %s was deleted, clearing the member role cache", data["role_id"])
+        member_roles.clear()
+        return parse(self, data)
+
+    return parse_and_clear
+
+
+# Keep the role ID sets used by the role check decorators up to date
+ConnectionState.parse_guild_member_update = _invalidating_member_roles(ConnectionState.parse_guild_member_update)
+ConnectionState.parse_guild_member_remove = _invalidating_member_roles(ConnectionState.parse_guild_member_remove)
+ConnectionState.parse_guild_role_delete = _clearing_member_roles(ConnectionState.parse_guild_role_delete)
@@ -0,0 +1,168 @@
+# coding=utf-8
+import ast
+import logging
+import re
+from typing import Any, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+QUOTES = "\"'"
+DELIMITERS = frozenset(" \t\r\n,()[]{}" + QUOTES)
+NAMES = frozenset(("True", "False", "None"))
+SIMPLE_INT = re.compile(r"-?(?:0|[1-9][0-9]*)\Z")
+
+
+class _Fallback(Exception):
+    """
+    Raised when the tokenizer sees something it doesn't handle itself, e.g. a container or a string with escapes
+    """
+
+
+def _literal_to_arguments(value: Any) -> Tuple[str, ...]:
+    """
+    Turn the result of an `ast.literal_eval` over the whole argument list into a tuple of strings, the same way
+    our `_get_word` always has: a lone string is one argument, and containers are unpacked
+    """
+
+    if isinstance(value, str):
+        return (value,)
+
+    try:
+        return tuple(str(item) for item in value)
+    except TypeError:  # A single non-string, non-container value, e.g. `bot.cmd(3)`
+        return (str(value),)
+
+
+def _skip_whitespace(text: str, index: int) -> int:
+    while index < len(text) and text[index].isspace():
+        index += 1
+    return index
+
+
+def _read_string(text: str, index: int) -> Tuple[str, int]:
+    """
+    Read a single or double quoted string starting at `index`, returning its value and the index after it
+    """
+
+    quote = text[index]
+
+    if text.startswith(quote * 3, index):
+        raise _Fallback  # Triple-quoted strings are rare enough to leave to ast
+
+    end = index + 1
+    escaped = False
+
+    while end < len(text):
+        char = text[end]
+
+        if char == "\\":
+            escaped = True
+            end += 2
+            continue
+
+        if char == quote:
+            break
+
+        if char == "\n":
+            raise SyntaxError("EOL while scanning string literal")
+
+        end += 1
+    else:
+        raise SyntaxError("EOL while scanning string literal")
+
+    if escaped:
+        return ast.literal_eval(text[index:end + 1]), end + 1
+
+    return text[index + 1:end], end + 1
+
+
+def _read_bare(text: str, index: int) -> Tuple[str, int]:
+    """
+    Read a bare token, such as a number or True/False/None, returning its string form and the index after it
+    """
+
+    end = index
+    while end < len(text) and text[end] not in DELIMITERS:
+        end += 1
+
+    token = text[index:end]
+
+    if not token:
+        raise _Fallback  # Brackets, braces or a stray delimiter
+
+    if end < len(text) and text[end] in QUOTES:
+        raise _Fallback  # A string prefix, such as r"..." or b"..."
+
+    if token in NAMES:
+        return token, end
+
+    if SIMPLE_INT.match(token):
+        return str(int(token)), end
+
+    # Floats, hex, complex and so on - ast raises ValueError for anything that isn't a literal, like `tags.delete`
+    return str(ast.literal_eval(token)), end
+
+
+def _tokenize(text: str) -> Tuple[str, ...]:
+    index = _skip_whitespace(text, 0)
+
+    if index >= len(text) or text[index] != "(":
+        raise SyntaxError("Expected '('")
+
+    index = _skip_whitespace(text, index + 1)
+    arguments = []
+
+    while index < len(text) and text[index] != ")":
+        if text[index] in QUOTES:
+            argument, index = _read_string(text, index)
+            index = _skip_whitespace(text, index)
+
+            # Adjacent string literals are concatenated, just like in Python
+            while index < len(text) and text[index] in QUOTES:
+                more, index = _read_string(text, index)
+                argument += more
+                index = _skip_whitespace(text, index)
+        else:
+            argument, index = _read_bare(text, index)
+            index = _skip_whitespace(text, index)
+
+        arguments.append(argument)
+
+        if index < len(text) and text[index] == ",":
+            index = _skip_whitespace(text, index + 1)
+        elif index < len(text) and text[index] != ")":
+            raise SyntaxError("Expected ',' or ')'")
+
+    if index >= len(text):
+        raise SyntaxError("Unexpected EOF while parsing")
+
+    if _skip_whitespace(text, index + 1) != len(text):
+        raise _Fallback  # Almost always a syntax error, but `(1), 2` is a valid tuple
+
+    return tuple(arguments)
+
+
+def parse_arguments(text: str) -> Optional[Tuple[str, ...]]:
+    """
+    Parse the arguments of a Python-style command call, such as `("test", 'a dark, dark night', 3)`
+
+    This is a single linear pass over the text, which handles the common cases (plain strings, integers, True, False
+    and None) itself. Single tokens it can't decode on its own, like floats or strings with escape sequences, are
+    handed to `ast.literal_eval` one at a time. Anything else, like containers or invalid calls, falls back to running
+    `ast.literal_eval` once over the whole text, so the result always matches what Python would make of the call.
+
+    :param text: The remainder of the message, starting at the opening bracket
+    :return: A tuple of every argument as a string, or None if the text isn't a valid call of literals
+    """
+
+    try:
+        return _tokenize(text)
+    except (_Fallback, SyntaxError, ValueError):
+        # Invalid calls are rare, so we let ast have the final say on them too - Python's grammar has corners,
+        # like line continuations, that aren't worth reimplementing here
+        log.trace("Argument tokenizer fell back to ast.literal_eval.")
+
+    try:
+        return _literal_to_arguments(ast.literal_eval(text.strip()))
+    except (SyntaxError, ValueError):
+        return None
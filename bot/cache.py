@@ -0,0 +1,434 @@
+# coding=utf-8
+import asyncio
+import collections
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from bot.utils import LRUCache
+
+log = logging.getLogger(__name__)
+
+CacheEntry = collections.namedtuple("CacheEntry", ("value", "expires", "stale_until"))
+
+# SQLite can't take the table name as a parameter, so it's checked against this before it goes into any SQL
+TABLE_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*\Z")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one shared call.
+
+    The first caller for a key starts the call as a task, and everyone else who asks for that key while it's running
+    awaits the same task instead of starting their own. The result, or the exception, is handed to all of them.
+
+    Waiters are shielded from each other, so cancelling one of them doesn't cancel the call for the rest.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop = None):
+        self.loop = loop or asyncio.get_event_loop()
+        self.calls = 0
+        self.coalesced = 0
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `call`, unless a call for this key is already in flight, in which case wait for that one instead
+
+        :param key: The key to coalesce calls on
+        :param call: A coroutine function, taking no arguments
+        :return: Whatever the shared call returned
+        """
+
+        task = self._in_flight.get(key)
+
+        if task is None:
+            self.calls += 1
+            task = self.loop.create_task(call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+            log.trace("Coalescing call for '%s' with the one already in flight", key)
+
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+        # If every waiter was cancelled, nobody is left to see the exception - retrieve it so asyncio doesn't complain
+        if not task.cancelled() and task.exception() is not None:
+            log.debug("Shared call for '%s' failed: %r", key, task.exception())
+
+    def cancel(self):
+        """
+        Cancel every call in flight - their waiters get a CancelledError
+        """
+
+        for task in self._in_flight.values():
+            task.cancel()
+
+    def __len__(self):
+        return len(self._in_flight)
+
+
+class PersistentCache:
+    """
+    A two-tier TTL cache: an in-memory LRU in front of a SQLite table on disk, so entries survive a restart.
+
+    Every entry has a time-to-live, after which it's stale. Stale entries are still served for `stale_ttl` more
+    seconds while a fresh copy is fetched in the background (stale-while-revalidate). A fetch that returns None is
+    cached too, but only for `negative_ttl` seconds and never served stale, so unknown keys don't go online every time
+    either, and a key that starts existing is found soon after.
+
+    Entries past their stale time are deleted from disk at startup, and every `purge_interval` seconds after that
+    while the cache is being written to, so keys that are never asked for again don't pile up.
+
+    Values must be JSON-serializable. Disk access happens on a single worker thread, so it never blocks the event
+    loop, and a hit in the memory tier never leaves it.
+
+    When several processes share the database, `on_change` is called with every key that's set or invalidated, so
+    the change can be passed on to the other processes - which should `forget` it, so their memory tier re-reads it.
+    """
+
+    def __init__(self, path: str, table: str = "cache", maxsize: int = 1024, ttl: float = 86400,
+                 negative_ttl: float = 3600, stale_ttl: float = 86400, purge_interval: float = 3600,
+                 loop: asyncio.AbstractEventLoop = None, on_change: Callable[[str], None] = None):
+        if not TABLE_NAME.match(table):
+            raise ValueError(f"{table!r} isn't a valid table name")
+
+        self.table = table
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self.purge_interval = purge_interval
+        self.loop = loop or asyncio.get_event_loop()
+        self.on_change = on_change
+
+        self._memory = LRUCache(maxsize=maxsize)
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._flights = SingleFlight(loop=self.loop)
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._closed = False
+
+        # The table name has been checked against TABLE_NAME, so it's safe to put into the queries
+        self._select = f"SELECT value, expires, stale_until FROM {table} WHERE key = ?"  # nosec
+        self._insert = f"INSERT OR REPLACE INTO {table} (key, value, expires, stale_until) VALUES (?, ?, ?, ?)"  # nosec
+        self._delete_key = f"DELETE FROM {table} WHERE key = ?"  # nosec
+        self._delete_expired = f"DELETE FROM {table} WHERE stale_until < ?"  # nosec
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Only ever used from the executor's single thread after this point
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "  # nosec
+            "(key TEXT PRIMARY KEY, value TEXT, expires REAL, stale_until REAL)"
+        )
+        self._purge()
+        self._purge_at = time.time() + purge_interval
+
+    def _read(self, key: str) -> Optional[CacheEntry]:
+        row = self._db.execute(self._select, (key,)).fetchone()
+
+        if row is None:
+            return None
+
+        value, expires, stale_until = row
+        return CacheEntry(json.loads(value), expires, stale_until)
+
+    def _write(self, key: str, entry: CacheEntry, purge: bool = False):
+        self._db.execute(self._insert, (key, json.dumps(entry.value), entry.expires, entry.stale_until))
+        self._db.commit()
+
+        if purge:
+            self._purge()
+
+    def _delete(self, key: str):
+        self._db.execute(self._delete_key, (key,))
+        self._db.commit()
+
+    def _purge(self):
+        deleted = self._db.execute(self._delete_expired, (time.time(),)).rowcount
+        self._db.commit()
+        log.debug("Purged %d expired entries from the %s disk cache", deleted, self.table)
+
+    async def lookup(self, key: str) -> Optional[CacheEntry]:
+        """
+        Find the entry for a key, whether or not it has expired - checking memory first, then disk
+
+        :param key: The key to look up
+        :return: The cache entry, or None if the key isn't cached at all - only memory is checked once it's closed
+        """
+
+        entry = self._memory.get(key)
+
+        if entry is None and not self._closed:
+            entry = await self.loop.run_in_executor(self._executor, self._read, key)
+
+            if entry is not None:
+                log.trace("Promoting '%s' from the %s disk cache to memory", key, self.table)
+                self._memory[key] = entry
+
+        return entry
+
+    async def set(self, key: str, value: Any, ttl: float = None):
+        """
+        Store a value in both tiers
+
+        :param key: The key to store the value under
+        :param value: The value, which must be JSON-serializable - None is cached as a negative entry
+        :param ttl: Optional, how long the value is fresh for - defaults to `ttl`, or `negative_ttl` for None
+        """
+
+        if ttl is None:
+            ttl = self.ttl if value is not None else self.negative_ttl
+
+        now = time.time()
+        stale_ttl = self.stale_ttl if value is not None else 0
+        entry = CacheEntry(value, now + ttl, now + ttl + stale_ttl)
+
+        self._memory[key] = entry
+
+        if self._closed:
+            return
+
+        purge = now >= self._purge_at
+        if purge:
+            self._purge_at = now + self.purge_interval
+
+        await self.loop.run_in_executor(self._executor, self._write, key, entry, purge)
+
+        if self.on_change is not None:
+            self.on_change(key)
+
+    async def invalidate(self, key: str):
+        """
+        Remove a key from both tiers - or just from memory, once the cache is closed
+        """
+
+        self._memory.pop(key, None)
+
+        if self._closed:
+            return
+
+        await self.loop.run_in_executor(self._executor, self._delete, key)
+
+        if self.on_change is not None:
+            self.on_change(key)
+
+    def forget(self, key: str):
+        """
+        Drop a key from the memory tier only, so the next lookup reads it from disk - for changes made elsewhere
+        """
+
+        self._memory.pop(key, None)
+
+    async def fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Call `fetch` and store what it returns, skipping the cache lookup
+
+        Concurrent fetches for the same key are coalesced into a single call.
+        """
+
+        async def fetch_and_set():
+            value = await fetch()
+            await self.set(key, value)
+            return value
+
+        return await self._flights.do(key, fetch_and_set)
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Get a value from the cache, calling `fetch` to fill it in if it's missing or too old
+
+        :param key: The key to look up
+        :param fetch: A coroutine function, taking no arguments, which returns the value for this key
+        :return: The cached or freshly-fetched value, which is None for keys that `fetch` couldn't find
+        """
+
+        entry = await self.lookup(key)
+        now = time.time()
+
+        if entry is not None:
+            if now < entry.expires:
+                return entry.value
+
+            if now < entry.stale_until:
+                self._refresh(key, fetch)
+                return entry.value
+
+        return await self.fetch(key, fetch)
+
+    def _refresh(self, key: str, fetch: Callable[[], Awaitable[Any]]):
+        """
+        Fetch a fresh value for a stale key in the background, unless we're already doing so
+        """
+
+        if self._closed or key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                await self.fetch(key, fetch)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception(f"Failed to refresh stale {self.table} cache entry '{key}'")
+            finally:
+                self._refreshing.pop(key, None)
+
+        log.trace("Serving stale %s cache entry '%s' and refreshing it in the background", self.table, key)
+        self._refreshing[key] = self.loop.create_task(refresh())
+
+    def close(self):
+        """
+        Cancel background refreshes and fetches, stop the disk worker and close the database - writes that have
+        already started are finished first
+        """
+
+        self._closed = True
+
+        for task in self._refreshing.values():
+            task.cancel()
+
+        self._flights.cancel()
+        self._executor.shutdown(wait=True)
+        self._db.close()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "size": len(self._memory),
+            "hits": self._memory.hits,
+            "misses": self._memory.misses,
+            "refreshing": len(self._refreshing),
+            "in_flight": len(self._flights),
+            "fetches": self._flights.calls,
+            "coalesced": self._flights.coalesced
+        }
+
+
+class PrefetchPool:
+    """
+    Keeps a small pool of ready-made items topped up in the background, so they can be handed out straight away.
+
+    `concurrency` workers call `factory` whenever the pool has a free slot. When a call fails, that worker backs off
+    exponentially, with some jitter, from `backoff` up to `max_backoff` seconds. If the pool is empty when an item is
+    asked for, `factory` is called directly instead.
+
+    A `factory` that returns None has nothing to give, so the workers stop instead of retrying - they're started again
+    once an item made on demand comes back.
+    """
+
+    def __init__(self, factory: Callable[[], Awaitable[Any]], size: int = 5, concurrency: int = 2,
+                 backoff: float = 1, max_backoff: float = 300, name: str = "prefetch",
+                 loop: asyncio.AbstractEventLoop = None):
+        self.factory = factory
+        self.size = size
+        self.concurrency = concurrency
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.name = name
+        self.loop = loop or asyncio.get_event_loop()
+
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+
+        self._items = collections.deque()
+        self._free_slots = asyncio.Semaphore(size)
+        self._workers = []
+        self.idle = False  # Whether the workers stopped because `factory` returned None
+
+    def start(self):
+        if any(not worker.done() for worker in self._workers):
+            return
+
+        self.idle = False
+
+        log.debug("Starting %d workers for the %s pool", self.concurrency, self.name)
+        self._workers = [self.loop.create_task(self._work()) for _ in range(self.concurrency)]
+
+    def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+
+        self._workers = []
+
+    async def _work(self):
+        delay = self.backoff
+
+        while True:
+            await self._free_slots.acquire()
+
+            try:
+                item = await self.factory()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._free_slots.release()
+                self.failures += 1
+
+                # Only the first failure in a row is worth a warning
+                level = logging.WARNING if delay == self.backoff else logging.DEBUG
+                log.log(level, "Failed to prefetch an item for the %s pool, retrying in %.1fs: %r", self.name, delay, e)
+
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+                delay = min(delay * 2, self.max_backoff)
+                continue
+
+            if item is None:
+                self._free_slots.release()
+
+                if not self.idle:
+                    log.debug("Nothing to prefetch for the %s pool, stopping its workers", self.name)
+                    self.idle = True
+
+                return
+
+            delay = self.backoff
+            self._items.append(item)
+
+    async def get(self) -> Any:
+        """
+        Take a prefetched item from the pool, or make one on the spot if it's empty
+
+        :return: The item, or None if the pool is empty and `factory` had nothing to give
+        """
+
+        if self._items:
+            self.hits += 1
+            item = self._items.popleft()
+            self._free_slots.release()
+            return item
+
+        self.misses += 1
+        log.debug("The %s pool is empty, making an item on demand", self.name)
+        item = await self.factory()
+
+        if item is not None and self.idle:
+            log.debug("The %s pool's factory works again, restarting its workers", self.name)
+            self.start()
+
+        return item
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "depth": len(self._items),
+            "size": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "failures": self.failures,
+            "idle": self.idle
+        }
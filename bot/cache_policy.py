@@ -0,0 +1,103 @@
+# coding=utf-8
+import logging
+from typing import Iterable
+
+from discord import Guild, Member
+from discord.state import ConnectionState
+
+from bot.decorators import REFERENCED_ROLES
+
+log = logging.getLogger(__name__)
+
+_add_member = Guild._add_member
+_parse_message_create = ConnectionState.parse_message_create
+
+
+class CachePolicy:
+    """
+    How much of what Discord sends us the bot holds on to.
+
+    By default discord.py keeps every member of every guild, chunks the offline ones in as soon as it connects, and
+    keeps the last 5000 messages. None of our cogs need most of that.
+
+    :param max_messages: How many messages to keep. discord.py keeps at least 100. Paginated messages only respond to
+                         reactions while they're in this cache, so keep it large enough for them to stay there while
+                         they're active
+    :param fetch_offline_members: Whether to chunk in every offline member on connecting - if not, they're only added
+                                  as they show up
+    :param members: "all" to keep every member, or "roles" to only keep the bot itself, members with a role that a
+                    `with_role` or `without_role` check refers to, and members who send a message. Roles referred to
+                    by extensions that aren't loaded yet don't count, and the role checks fetch the roles of anyone
+                    who isn't cached. Reactions from members who aren't cached never reach the paginator, which is
+                    why the authors of messages - and so of commands - are always kept
+    :param guilds: Optional, with "roles", the only guilds to keep those members for
+    """
+
+    def __init__(self, max_messages: int = 5000, fetch_offline_members: bool = True, members: str = "all",
+                 guilds: Iterable[int] = None):
+        if members not in ("all", "roles"):
+            raise ValueError(f"members must be 'all' or 'roles', not {members!r}")
+
+        self.max_messages = max_messages
+        self.fetch_offline_members = fetch_offline_members
+        self.members = members
+        self.guilds = frozenset(guilds) if guilds is not None else None
+
+    @property
+    def options(self) -> dict:
+        """
+        The options to pass to the bot's constructor
+        """
+
+        return {"max_messages": self.max_messages, "fetch_offline_members": self.fetch_offline_members}
+
+    def keep(self, guild: Guild, member: Member) -> bool:
+        if self.members == "all" or member.id == guild._state.self_id:
+            return True
+
+        if self.guilds is not None and guild.id not in self.guilds:
+            return False
+
+        return not REFERENCED_ROLES.isdisjoint(member._roles)
+
+    @staticmethod
+    def remember_author(state: ConnectionState, data: dict):
+        """
+        Add the author of a guild message to the member cache, if they aren't in it yet
+        """
+
+        member = data.get("member")
+
+        if member is None:  # A DM or a webhook
+            return
+
+        _, guild = state._get_guild_channel(data)
+
+        if guild is None or guild.get_member(int(data["author"]["id"])) is not None:
+            return
+
+        _add_member(guild, Member(data={**member, "user": data["author"]}, guild=guild, state=state))
+
+    def install(self):
+        """
+        Filter the members that guilds add to their cache - this applies to every guild, so only one policy can be
+        installed at a time
+        """
+
+        if self.members == "all":
+            Guild._add_member = _add_member
+            ConnectionState.parse_message_create = _parse_message_create
+            return
+
+        log.debug("Only caching members with one of the roles %s, and members who send messages", REFERENCED_ROLES)
+
+        def add_member(guild: Guild, member: Member):
+            if self.keep(guild, member):
+                _add_member(guild, member)
+
+        def parse_message_create(state: ConnectionState, data: dict):
+            self.remember_author(state, data)
+            _parse_message_create(state, data)
+
+        Guild._add_member = add_member
+        ConnectionState.parse_message_create = parse_message_create
@@ -0,0 +1,450 @@
+# coding=utf-8
+"""
+Running the bot's shards across several processes.
+
+The launcher (`Cluster`) starts one worker process per contiguous range of shard IDs, and talks to each of them over a
+multiprocessing pipe. Workers push their stats to the launcher every so often and can ask for the whole cluster's, and
+anything a worker broadcasts is passed on to every other worker, where it's dispatched as an `on_cluster_message`
+event. A worker that crashes is restarted on its own, with a growing delay if it keeps crashing.
+
+Messages are small dicts, with an "op" key saying what they are.
+"""
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import queue
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection, wait
+from multiprocessing.reduction import ForkingPickler
+from typing import Any, Callable, Dict, List
+
+from discord.ext.commands import AutoShardedBot
+
+from bot.metrics import Histogram
+
+log = logging.getLogger(__name__)
+
+
+def shard_ranges(shard_count: int, workers: int) -> List[List[int]]:
+    """
+    Split the shard IDs into `workers` contiguous ranges, as evenly as possible
+    """
+
+    size, extra = divmod(shard_count, workers)
+    ranges = []
+    start = 0
+
+    for index in range(workers):
+        end = start + size + (index < extra)
+        ranges.append(list(range(start, end)))
+        start = end
+
+    return ranges
+
+
+def aggregate_stats(stats: Dict[int, dict]) -> dict:
+    """
+    Combine the stats pushed by each worker into totals for the whole cluster
+
+    :param stats: The latest stats from each worker, by worker index
+    :return: A dict of merged command latency histograms, invocation and error counts, and a summary of each worker
+    """
+
+    latencies: Dict[str, Histogram] = {}
+    invocations = Counter()
+    errors = Counter()
+    workers = {}
+
+    for index, worker in sorted(stats.items()):
+        workers[index] = {key: worker[key] for key in ("shards", "guilds", "latency", "restarts") if key in worker}
+
+        for name, histogram in worker.get("latencies", {}).items():
+            if name not in latencies:
+                latencies[name] = Histogram(histogram.bounds)
+
+            latencies[name].merge(histogram)
+
+        invocations.update(worker.get("invocations", {}))
+        errors.update(worker.get("errors", {}))
+
+    return {"workers": workers, "latencies": latencies, "invocations": invocations, "errors": errors}
+
+
+class _Worker:
+    __slots__ = (
+        "index", "shard_ids", "process", "conn", "outbox", "sender", "dropped", "dropping", "started_at", "restarts",
+        "restart_at", "stats"
+    )
+
+    def __init__(self, index: int, shard_ids: List[int]):
+        self.index = index
+        self.shard_ids = shard_ids
+        self.process = None
+        self.conn = None
+        self.outbox = None
+        self.sender = None
+        self.dropped = 0
+        self.dropping = False  # Whether the last message for it was dropped
+        self.started_at = 0.0
+        self.restarts = 0
+        self.restart_at = None
+        self.stats = None
+
+
+class Cluster:
+    """
+    Starts and looks after the worker processes, and passes messages between them
+
+    :param target: The function each worker runs, called as `target(conn, index, shard_ids, shard_count)` - it must
+                   be importable, since workers are spawned rather than forked
+    :param shard_count: The total number of shards
+    :param workers: How many worker processes to split the shards between
+    :param restart_backoff: Seconds to wait before restarting a worker that crashed soon after starting, doubling each
+                            time it happens again
+    :param max_restart_backoff: The longest to wait before restarting a worker
+    :param stable_uptime: How long a worker has to stay up for its crashes to stop counting against it
+    :param outbox_size: How many messages can be waiting to be sent to a worker before more are dropped
+
+    Every worker has its own outbox and sender thread, so a worker that stops reading its pipe only holds up its own
+    messages - the launcher's loop never blocks on a send.
+    """
+
+    def __init__(self, target: Callable, shard_count: int, workers: int, restart_backoff: float = 1,
+                 max_restart_backoff: float = 60, stable_uptime: float = 60, outbox_size: int = 100):
+        self.target = target
+        self.shard_count = shard_count
+        self.restart_backoff = restart_backoff
+        self.max_restart_backoff = max_restart_backoff
+        self.stable_uptime = stable_uptime
+        self.outbox_size = outbox_size
+
+        # Spawned, so workers don't inherit the launcher's logging thread or anything else that doesn't survive a fork
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = [
+            _Worker(index, shard_ids) for index, shard_ids in enumerate(shard_ranges(shard_count, workers))
+        ]
+        self._stopping = False
+
+    def _start(self, worker: _Worker):
+        conn, child_conn = self._context.Pipe()
+
+        worker.process = self._context.Process(
+            target=self.target, args=(child_conn, worker.index, worker.shard_ids, self.shard_count),
+            name=f"cluster-worker-{worker.index}"
+        )
+        worker.process.start()
+        worker.started_at = time.monotonic()
+        worker.restart_at = None
+        self._open(worker, conn)
+
+        child_conn.close()  # The worker has its own copy now
+        log.info(f"Started worker {worker.index} (pid {worker.process.pid}) for shards {worker.shard_ids}")
+
+    def _open(self, worker: _Worker, conn: Connection):
+        """
+        Attach a worker's end of its pipe, and start the thread that sends its messages
+        """
+
+        worker.conn = conn
+        worker.outbox = queue.Queue(self.outbox_size)
+        worker.sender = threading.Thread(
+            target=self._send_loop, args=(conn, worker.outbox), name=f"cluster-sender-{worker.index}", daemon=True
+        )
+        worker.sender.start()
+
+    @staticmethod
+    def _send_loop(conn: Connection, outbox: queue.Queue):
+        """
+        Send a worker's messages, already pickled, until it's told to stop with None or the pipe breaks
+        """
+
+        while True:
+            data = outbox.get()
+
+            if data is None:
+                return
+
+            try:
+                conn.send_bytes(data)
+            except OSError:
+                return  # It's on its way down, which we'll notice when its process exits
+
+    def _send(self, worker: _Worker, message: Dict[str, Any]):
+        """
+        Queue a message for a worker, dropping it if the worker has stopped reading them
+        """
+
+        if worker.outbox is None:
+            return
+
+        try:
+            worker.outbox.put_nowait(ForkingPickler.dumps(message))
+        except queue.Full:
+            # Only the first drop in a row is worth a warning
+            level = logging.DEBUG if worker.dropping else logging.WARNING
+            worker.dropped += 1
+            worker.dropping = True
+
+            log.log(
+                level, "Worker %d isn't reading its messages, dropping a '%s' message (%d dropped so far)",
+                worker.index, message.get("op"), worker.dropped
+            )
+        else:
+            worker.dropping = False
+
+    def _close(self, worker: _Worker, timeout: float = None):
+        """
+        Stop a worker's sender and close its pipe - once the process has exited, a blocked send fails straight away
+        """
+
+        try:
+            worker.outbox.put_nowait(None)
+        except queue.Full:
+            pass  # The sender gives up on its own once a send fails
+
+        worker.sender.join(timeout)
+        worker.conn.close()
+        worker.outbox = worker.sender = worker.conn = None
+
+    def _exited(self, worker: _Worker):
+        worker.process.join()
+        self._close(worker)
+
+        uptime = time.monotonic() - worker.started_at
+        if uptime >= self.stable_uptime:
+            worker.restarts = 0
+
+        delay = min(self.restart_backoff * 2 ** worker.restarts, self.max_restart_backoff)
+        worker.restarts += 1
+        worker.restart_at = time.monotonic() + delay
+
+        log.warning(
+            f"Worker {worker.index} exited with code {worker.process.exitcode} after {uptime:.0f}s, "
+            f"restarting it in {delay:.1f}s"
+        )
+        worker.process = None
+
+    def _handle(self, worker: _Worker, message: Dict[str, Any]):
+        op = message.get("op")
+
+        if op == "stats":
+            worker.stats = message["stats"]
+
+        elif op == "stats_request":
+            stats = {}
+
+            for other in self._workers:
+                if other.stats is not None:
+                    stats[other.index] = {
+                        **other.stats, "shards": other.shard_ids, "restarts": other.restarts
+                    }
+
+            self._send(worker, {"op": "stats", "nonce": message["nonce"], "stats": aggregate_stats(stats)})
+
+        elif op == "broadcast":
+            log.debug("Worker %d broadcast '%s'", worker.index, message["event"])
+            forward = {"op": "message", "event": message["event"], "data": message.get("data")}
+
+            for other in self._workers:
+                if other is not worker:
+                    self._send(other, forward)
+
+        else:
+            log.warning(f"Worker {worker.index} sent a message we don't understand: {message!r}")
+
+    def _poll(self, timeout: float = 1):
+        waitables = {}
+
+        for worker in self._workers:
+            if worker.process is not None:
+                waitables[worker.conn] = worker
+                waitables[worker.process.sentinel] = worker
+
+        for ready in wait(list(waitables), timeout):
+            worker = waitables[ready]
+
+            if worker.process is None:
+                continue  # Already handled its exit in this round
+
+            if ready is worker.conn:
+                try:
+                    while worker.conn.poll():
+                        self._handle(worker, worker.conn.recv())
+                except (EOFError, OSError):
+                    pass  # The process has gone too, and its sentinel deals with that
+            else:
+                self._exited(worker)
+
+        now = time.monotonic()
+
+        for worker in self._workers:
+            if worker.process is None and worker.restart_at is not None and now >= worker.restart_at:
+                self._start(worker)
+
+    def run(self):
+        """
+        Start every worker, and look after them until we're interrupted or terminated
+        """
+
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+        for worker in self._workers:
+            self._start(worker)
+
+        try:
+            while not self._stopping:
+                self._poll()
+        except (KeyboardInterrupt, SystemExit):
+            log.info("Shutting down the cluster")
+        finally:
+            self.stop()
+
+    def stop(self, timeout: float = 30):
+        self._stopping = True
+
+        for worker in self._workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.process.terminate()
+
+        for worker in self._workers:
+            if worker.process is not None:
+                worker.process.join(timeout)
+                self._close(worker, timeout)
+                worker.process = None
+
+
+class ClusterClient:
+    """
+    A worker's end of the pipe to the launcher, available to cogs as `bot.cluster`
+
+    The pipe's `send` and `recv` block until a whole message has gone through, which can take a while if the other end
+    is busy, so neither runs on the event loop. Messages are pickled on the loop, so nothing changes under the pickler,
+    and written by a single sender thread, which keeps them in order. Incoming messages are read by a receiver thread
+    whenever the pipe is readable, and every message another worker broadcasts is dispatched as
+    `on_cluster_message(event, data)`.
+    """
+
+    def __init__(self, bot: AutoShardedBot, conn: Connection, index: int, shard_ids: List[int],
+                 stats_interval: float = 10):
+        self.bot = bot
+        self.conn = conn
+        self.index = index
+        self.shard_ids = shard_ids
+        self.stats_interval = stats_interval
+
+        self._nonces = itertools.count()
+        self._waiting: Dict[int, asyncio.Future] = {}
+        self._stats_task = None
+        self._receive_task = None
+
+        # Separate threads, so a send that's waiting for the launcher to make room never holds up what it sends us
+        self._sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cluster-send")
+        self._receiver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cluster-receive")
+
+    def start(self):
+        self.bot.loop.add_reader(self.conn.fileno(), self._readable)
+        self._stats_task = self.bot.loop.create_task(self._push_stats())
+
+    def close(self):
+        self.bot.loop.remove_reader(self.conn.fileno())
+
+        for task in (self._stats_task, self._receive_task):
+            if task is not None:
+                task.cancel()
+
+        self._sender.shutdown(wait=False)
+        self._receiver.shutdown(wait=False)
+        self.conn.close()
+
+    def _send(self, message: Dict[str, Any]) -> asyncio.Future:
+        return self.bot.loop.run_in_executor(self._sender, self.conn.send_bytes, ForkingPickler.dumps(message))
+
+    def _readable(self):
+        # Stop watching the pipe until the receiver has read everything that's waiting
+        self.bot.loop.remove_reader(self.conn.fileno())
+        self._receive_task = self.bot.loop.create_task(self._receive())
+
+    async def _receive(self):
+        try:
+            while True:
+                self._handle(await self.bot.loop.run_in_executor(self._receiver, self.conn.recv))
+
+                if not self.conn.poll():
+                    break
+        except (EOFError, OSError):
+            log.error("Lost the connection to the cluster launcher, shutting down")
+            self.bot.loop.create_task(self.bot.logout())
+            return
+
+        self.bot.loop.add_reader(self.conn.fileno(), self._readable)
+
+    def _handle(self, message: Dict[str, Any]):
+        op = message.get("op")
+
+        if op == "message":
+            self.bot.dispatch("cluster_message", message["event"], message["data"])
+
+        elif op == "stats":
+            future = self._waiting.pop(message["nonce"], None)
+
+            if future is not None and not future.done():
+                future.set_result(message["stats"])
+
+    def broadcast(self, event: str, data: Any = None) -> asyncio.Future:
+        """
+        Send an event to every other worker, where it's dispatched as `on_cluster_message(event, data)`
+
+        The message is sent in the background - await the returned future to wait until it has been.
+
+        :param event: What the message is about, e.g. "cache_invalidate"
+        :param data: Anything picklable
+        """
+
+        future = self._send({"op": "broadcast", "event": event, "data": data})
+        future.add_done_callback(self._sent)
+        return future
+
+    @staticmethod
+    def _sent(future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            log.warning("Failed to send a message to the cluster launcher: %r", future.exception())
+
+    async def stats(self, timeout: float = 5) -> dict:
+        """
+        Get the stats of the whole cluster, as last pushed by each worker - see `aggregate_stats`
+        """
+
+        nonce = next(self._nonces)
+        future = self._waiting[nonce] = self.bot.loop.create_future()
+
+        try:
+            await self._send({"op": "stats_request", "nonce": nonce})
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._waiting.pop(nonce, None)
+
+    def local_stats(self) -> dict:
+        stats = {"guilds": len(self.bot.guilds), "latency": self.bot.latency}
+        cog = self.bot.get_cog("Stats")
+
+        if cog is not None:
+            stats["latencies"] = cog.latencies
+            stats["invocations"] = dict(cog.invocations)
+            stats["errors"] = dict(cog.errors)
+
+        return stats
+
+    async def _push_stats(self):
+        while True:
+            try:
+                await self._send({"op": "stats", "stats": self.local_stats()})
+            except OSError:
+                return  # _receive notices the launcher has gone and shuts us down
+
+            await asyncio.sleep(self.stats_interval)
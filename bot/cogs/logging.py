@@ -3,6 +3,8 @@ import logging
 
 from discord.ext.commands import AutoShardedBot
 
+from bot.profiling import profiler
+
 log = logging.getLogger(__name__)
 
 
@@ -13,10 +15,19 @@ class Logging:
 
     def __init__(self, bot: AutoShardedBot):
         self.bot = bot
+        self.reported_startup = False
 
     async def on_ready(self):
         log.info("Bot connected!")
 
+        # on_ready fires again after reconnecting, but only the first one is part of starting up
+        if not self.reported_startup:
+            self.reported_startup = True
+            profiler.uninstall()
+
+            for line in profiler.report():
+                log.info(line)
+
 
 def setup(bot):
     bot.add_cog(Logging(bot))
@@ -1,8 +1,13 @@
 # coding=utf-8
+import asyncio
 import logging
+import os
 
 from discord.ext.commands import AutoShardedBot, Context
 
+from bot.constants import RATE_LIMIT_CHANNEL, RATE_LIMIT_COMMAND, RATE_LIMIT_SWEEP_INTERVAL, RATE_LIMIT_USER
+from bot.ratelimit import RateLimiter, worker_share
+
 log = logging.getLogger(__name__)
 
 
@@ -15,9 +20,34 @@ class Security:
         self.bot = bot
         self.bot.check(self.check_not_bot)  # Global commands check - no bots can run any commands at all
 
+        # Every cluster worker has its own buckets, so each gets a share of the limit that protects the APIs
+        workers = int(os.environ.get("CLUSTER_WORKERS", 1))
+        self.rate_limiter = RateLimiter(RATE_LIMIT_USER, RATE_LIMIT_CHANNEL, worker_share(RATE_LIMIT_COMMAND, workers))
+        self.bot.check(self.check_rate_limit)  # Global commands check - nobody can use commands faster than this
+        self.sweeper = self.bot.loop.create_task(self.sweep_rate_limits())
+
+    def __unload(self):
+        self.sweeper.cancel()
+
     def check_not_bot(self, ctx: Context):
         return not ctx.author.bot
 
+    def check_rate_limit(self, ctx: Context):
+        # Global checks run again for every command the help command considers, so only count each context once.
+        # Lazy extension stand-ins re-invoke the real command, which is counted instead
+        if getattr(ctx, "rate_limit_checked", False) or getattr(ctx.command, "lazy_extension", None) is not None:
+            return True
+
+        ctx.rate_limit_checked = True
+        self.rate_limiter.check(ctx.author.id, ctx.channel.id, ctx.command.qualified_name, self.bot.loop.time())
+        return True
+
+    async def sweep_rate_limits(self):
+        # Buckets refill on their own when they're next used, so this only stops idle users from piling up
+        while True:
+            await asyncio.sleep(RATE_LIMIT_SWEEP_INTERVAL)
+            self.rate_limiter.sweep(self.bot.loop.time())
+
 
 def setup(bot):
     bot.add_cog(Security(bot))
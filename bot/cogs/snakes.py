@@ -1,12 +1,100 @@
 # coding=utf-8
+import itertools
+import json
 import logging
-from typing import Any, Dict
+import random
+from typing import Any, Dict, List, Optional, Tuple
 
+from discord import Embed, File
 from discord.ext.commands import AutoShardedBot, Context, command
 
+from bot.cache import PersistentCache, PrefetchPool
+from bot.constants import (
+    SNAKE_CACHE_NEGATIVE_TTL, SNAKE_CACHE_PATH, SNAKE_CACHE_SIZE, SNAKE_CACHE_STALE_TTL, SNAKE_CACHE_TTL,
+    SNAKE_IMAGE_CACHE_BYTES, SNAKE_IMAGE_PATH, SNAKE_IMAGE_QUALITY, SNAKE_IMAGE_SIZE, SNAKE_IMAGE_WORKERS,
+    SNAKE_INDEX_PATH, SNAKE_POOL_ATTEMPTS, SNAKE_POOL_BACKOFF, SNAKE_POOL_CONCURRENCY, SNAKE_POOL_MAX_BACKOFF,
+    SNAKE_POOL_SIZE
+)
+from bot.fuzzy import TrigramIndex, normalize
+from bot.images import ImageCache
+
 log = logging.getLogger(__name__)
 
 
+class SnakeIndex:
+    """
+    An offline index of snake species, used to resolve names and pick random snakes without going online
+
+    Common names, scientific names and aliases are all normalized and indexed, so "King-Cobra", "king cobra" and
+    "Ophiophagus hannah" all resolve to the same species, and misspellings like "cobar" are matched fuzzily.
+    """
+
+    def __init__(self, species: List[Dict[str, Any]]):
+        self.names = [entry["name"] for entry in species]
+        self._index = TrigramIndex()
+        self._lookup: Dict[str, int] = {}  # Normalized key -> species number
+
+        for number, entry in enumerate(species):
+            for key in (entry["name"], entry["scientific_name"], *entry["aliases"]):
+                key = normalize(key)
+
+                if key not in self._lookup:
+                    self._index.add(key)
+                    self._lookup[key] = number
+
+    @classmethod
+    def from_file(cls, path: str) -> "SnakeIndex":
+        with open(path, encoding="utf-8") as file:
+            return cls(json.load(file))
+
+    def resolve(self, name: str) -> Optional[str]:
+        """
+        Find the species a name refers to, allowing for misspellings
+
+        :param name: A common name, scientific name or alias
+        :return: The species' common name, or None if nothing is close enough
+        """
+
+        key = normalize(name)
+        number = self._lookup.get(key)
+
+        if number is None:
+            matches = self._index.search(key, limit=1)
+
+            if not matches:
+                return None
+
+            number = self._lookup[matches[0][0]]
+            log.trace("Resolved snake name '%s' to '%s' fuzzily", name, self.names[number])
+
+        return self.names[number]
+
+    def suggest(self, name: str, limit: int = 5) -> List[str]:
+        """
+        Get the species that a name most likely refers to, closest first
+        """
+
+        suggestions = []
+
+        for key, _ in self._index.search(normalize(name), limit=limit * 2):
+            species = self.names[self._lookup[key]]
+
+            if species not in suggestions:
+                suggestions.append(species)
+
+        return suggestions[:limit]
+
+    def random(self) -> str:
+        return random.choice(self.names)
+
+    def sample(self, count: int) -> List[str]:
+        """
+        Pick up to `count` different species at random
+        """
+
+        return random.sample(self.names, min(count, len(self.names)))
+
+
 class Snakes:
     """
     Snake-related commands
@@ -14,8 +102,63 @@ class Snakes:
 
     def __init__(self, bot: AutoShardedBot):
         self.bot = bot
+        self.cache = PersistentCache(
+            SNAKE_CACHE_PATH, table="snakes", maxsize=SNAKE_CACHE_SIZE, ttl=SNAKE_CACHE_TTL,
+            negative_ttl=SNAKE_CACHE_NEGATIVE_TTL, stale_ttl=SNAKE_CACHE_STALE_TTL, loop=bot.loop,
+            on_change=self._cache_changed
+        )
+        self.index = SnakeIndex.from_file(SNAKE_INDEX_PATH)
+
+        # Thumbnails of snake pictures, so Discord isn't sent multi-megabyte originals
+        self.images = ImageCache(
+            SNAKE_IMAGE_PATH, bot.http_client, max_bytes=SNAKE_IMAGE_CACHE_BYTES, max_size=SNAKE_IMAGE_SIZE,
+            quality=SNAKE_IMAGE_QUALITY, workers=SNAKE_IMAGE_WORKERS, loop=bot.loop
+        )
+
+        # Random snakes, fetched and rendered ahead of time so `get` can answer right away
+        self.random_pool = PrefetchPool(
+            self._random_snek_with_embed, size=SNAKE_POOL_SIZE, concurrency=SNAKE_POOL_CONCURRENCY,
+            backoff=SNAKE_POOL_BACKOFF, max_backoff=SNAKE_POOL_MAX_BACKOFF, name="random snake", loop=bot.loop
+        )
+        self.random_pool.start()
+
+    def __unload(self):
+        self.random_pool.stop()
+        self.cache.close()
+        self.images.close()
+
+    def _cache_changed(self, key: str):
+        # The other cluster workers share the cache's database, but not its memory tier
+        if self.bot.cluster is not None:
+            self.bot.cluster.broadcast("cache_invalidate", {"cache": "snakes", "key": key})
 
-    async def get_snek(self, name: str = None) -> Dict[str, Any]:
+    async def on_cluster_message(self, event: str, data: Any):
+        if event == "cache_invalidate" and data["cache"] == "snakes":
+            self.cache.forget(data["key"])
+
+    async def get_snek(self, name: str = None) -> Optional[Dict[str, Any]]:
+        """
+        Get information about a snake, going online only when we don't have it cached
+
+        Names are resolved against our offline `SnakeIndex` first, which handles aliases and misspellings, and random
+        snakes are picked from it too. Names it doesn't know about are passed on to `fetch_snek` as they are.
+
+        Lookups are cached by case-folded name, both in memory and on disk, so they survive a restart. Stale
+        information is returned straight away while it's refreshed in the background, and names that `fetch_snek`
+        couldn't find are remembered for a while as well. Concurrent lookups for the same snake share a single fetch.
+
+        :param name: Optional, the name of the snake to get information for - omit for a random snake
+        :return: A dict containing information on a snake, or None if there's no such snake
+        """
+
+        if name is None:
+            name = self.index.random()
+        else:
+            name = self.index.resolve(name) or name
+
+        return await self.cache.get_or_fetch(name.casefold(), lambda: self.fetch_snek(name))
+
+    async def fetch_snek(self, name: str = None) -> Optional[Dict[str, Any]]:
         """
         Go online and fetch information about a snake
 
@@ -25,10 +168,88 @@ class Snakes:
         If "python" is given as the snake name, you should return information about the programming language, but with
         all the information you'd provide for a real snake. Try to have some fun with this!
 
+        Use `self.bot.http_client` to go online - it pools connections and handles timeouts and retries for you. The
+        dict must be JSON-serializable, since `get_snek` caches it on disk. Return None if there's no snake by the
+        given name.
+
         :param name: Optional, the name of the snake to get information for - omit for a random snake
-        :return: A dict containing information on a snake
+        :return: A dict containing information on a snake, or None if there's no such snake
+        """
+
+    def snek_embed(self, snek: Dict[str, Any]) -> Embed:
+        """
+        Render the information about a snake as an embed
+
+        "name", "description" and "image_url" are used for the title, description and picture, and any other simple
+        values are added as fields.
         """
 
+        embed = Embed(title=snek.get("name", "Unknown snake"), description=snek.get("description", ""))
+
+        if snek.get("image_url"):
+            embed.set_image(url=snek["image_url"])
+
+        fields = (
+            (key, value) for key, value in snek.items()
+            if key not in ("name", "description", "image_url") and isinstance(value, (str, int, float))
+        )
+
+        for key, value in itertools.islice(fields, 25):  # Discord allows 25 fields per embed
+            embed.add_field(name=key.replace("_", " ").title(), value=str(value))
+
+        return embed
+
+    async def _random_snek_with_embed(self) -> Optional[Tuple[Dict[str, Any], Embed]]:
+        # A species that can't be found is skipped, so one gap in the data doesn't stop the pool
+        for name in self.index.sample(SNAKE_POOL_ATTEMPTS):
+            snek = await self.get_snek(name)
+
+            if snek is not None:
+                break
+        else:  # Nothing to prefetch, e.g. while `fetch_snek` isn't written yet
+            return None
+
+        if snek.get("image_url"):
+            try:
+                await self.images.get(snek["image_url"])
+            except Exception as e:
+                log.warning("Failed to prefetch the picture of %s: %r", snek.get("name"), e)
+
+        return snek, self.snek_embed(snek)
+
+    async def send_snek(self, ctx: Context, snek: Dict[str, Any], embed: Embed):
+        """
+        Send a snake's embed, with a thumbnail of its picture instead of the original
+
+        The first time, the thumbnail is uploaded with the message, and after that the uploaded copy is linked. If we
+        can't make a thumbnail, the embed links to the original picture instead.
+        """
+
+        url = snek.get("image_url")
+
+        if not url:
+            return await ctx.send(embed=embed)
+
+        link = self.images.link(url)
+
+        if link is not None:
+            embed.set_image(url=link)
+            return await ctx.send(embed=embed)
+
+        try:
+            file = File(await self.images.get(url), filename="snake.jpg")
+        except Exception as e:
+            log.warning("Failed to make a thumbnail of %s, linking the original: %r", url, e)
+            return await ctx.send(embed=embed)
+
+        embed.set_image(url="attachment://snake.jpg")
+        message = await ctx.send(embed=embed, file=file)
+
+        if message.embeds and message.embeds[0].image.url:
+            self.images.remember_link(url, message.embeds[0].image.url)
+
+        return message
+
     @command()
     async def get(self, ctx: Context, name: str = None):
         """
@@ -41,6 +262,29 @@ class Snakes:
         :param name: Optional, the name of the snake to get information for - omit for a random snake
         """
 
+        if name is None:
+            random_snek = await self.random_pool.get()
+            log.trace("Random snake pool stats: %s", self.random_pool.stats)
+
+            if random_snek is None:
+                return await ctx.send("I couldn't find a random snake right now. Try asking for one by name!")
+
+            snek, embed = random_snek
+            return await self.send_snek(ctx, snek, embed)
+
+        snek = await self.get_snek(name)
+
+        if snek is None:
+            suggestions = self.index.suggest(name, limit=3)
+            message = f"I couldn't find a snake called `{name}`."
+
+            if suggestions:
+                message += f" Did you mean {', '.join(f'`{suggestion}`' for suggestion in suggestions)}?"
+
+            return await ctx.send(message)
+
+        await self.send_snek(ctx, snek, self.snek_embed(snek))
+
     # Any additional commands can be placed here. Be creative, but keep it to a reasonable amount!
 
 
@@ -0,0 +1,229 @@
+# coding=utf-8
+import asyncio
+import logging
+import os
+from collections import Counter
+from typing import Dict, List
+
+from aiohttp import web
+
+from discord import Embed
+from discord.ext.commands import AutoShardedBot, Context, command
+
+from bot import invocation_cache, log_listener
+from bot.constants import ADMIN_ROLE, DEVOPS_ROLE, OWNER_ROLE, STATS_HOST, STATS_LAG_INTERVAL
+from bot.decorators import with_role
+from bot.metrics import Histogram, prometheus_counter, prometheus_histogram
+from bot.pagination import LinePaginator
+
+log = logging.getLogger(__name__)
+
+
+class Stats:
+    """
+    Command latency, throughput and event loop lag, so we can see what's eating the loop's time
+
+    Set STATS_PORT to also serve the numbers in the Prometheus text format, at /metrics on localhost.
+    """
+
+    def __init__(self, bot: AutoShardedBot):
+        self.bot = bot
+
+        self.latencies: Dict[str, Histogram] = {}
+        self.invocations = Counter()
+        self.errors = Counter()
+        self.cog_names: Dict[str, str] = {}
+        self.loop_lag = Histogram()
+
+        self._lag_task = bot.loop.create_task(self._measure_lag())
+
+        self._app = None
+        self._handler = None
+        self._server = None
+
+        port = os.environ.get("STATS_PORT")
+        if port:
+            bot.loop.create_task(self._start_server(int(port)))
+
+    def __unload(self):
+        self._lag_task.cancel()
+
+        if self._server is not None:
+            self.bot.loop.create_task(self._stop_server())
+
+    async def _measure_lag(self):
+        """
+        Sleep for a fixed interval, over and over - anything past that interval is time the loop was busy elsewhere
+        """
+
+        while True:
+            expected = self.bot.loop.time() + STATS_LAG_INTERVAL
+            await asyncio.sleep(STATS_LAG_INTERVAL)
+            self.loop_lag.record(max(0.0, self.bot.loop.time() - expected))
+
+    async def on_command(self, ctx: Context):
+        if getattr(ctx.command, "lazy_extension", None) is not None:
+            return  # A stand-in that loads its extension, which invokes the real command - that's counted instead
+
+        ctx.stats_started = self.bot.loop.time()
+        self.invocations[ctx.command.qualified_name] += 1
+
+    def _record(self, ctx: Context):
+        started = getattr(ctx, "stats_started", None)
+
+        if started is None:
+            return
+
+        name = ctx.command.qualified_name
+        histogram = self.latencies.get(name)
+
+        if histogram is None:
+            histogram = self.latencies[name] = Histogram()
+            self.cog_names[name] = ctx.command.cog_name or "NoCategory"
+
+        histogram.record(self.bot.loop.time() - started)
+
+    async def on_command_completion(self, ctx: Context):
+        self._record(ctx)
+
+    async def on_command_error(self, ctx: Context, error: Exception):
+        if ctx.command is None:  # Unknown commands, which the Suggestions cog deals with
+            return
+
+        self.errors[ctx.command.qualified_name] += 1
+        self._record(ctx)
+
+    def cog_times(self) -> Dict[str, float]:
+        """
+        Get the total time spent in each cog's commands, in seconds
+        """
+
+        totals = Counter()
+
+        for name, histogram in self.latencies.items():
+            totals[self.cog_names[name]] += histogram.total
+
+        return totals
+
+    def lines(self) -> List[str]:
+        lines = ["# Commands, slowest in total first - times in ms", ""]
+        lines.append(f"{'command':<20} {'calls':>6} {'errors':>6} {'mean':>8} {'p50':>8} {'p99':>8}")
+
+        for name, histogram in sorted(self.latencies.items(), key=lambda item: -item[1].total):
+            summary = histogram.summary()
+            lines.append(
+                f"{name:<20} {self.invocations[name]:>6} {self.errors[name]:>6} {summary['mean'] * 1000:>8.1f} "
+                f"{summary['p50'] * 1000:>8.1f} {summary['p99'] * 1000:>8.1f}"
+            )
+
+        lines += ["", "# Total time by cog, in ms", ""]
+
+        for cog, total in self.cog_times().most_common():
+            lines.append(f"{cog:<20} {total * 1000:>10.1f}")
+
+        lag = self.loop_lag.summary()
+        lines += [
+            "", "# Event loop lag, in ms", "",
+            f"p50 {lag['p50'] * 1000:.1f}, p99 {lag['p99'] * 1000:.1f}, max {lag['max'] * 1000:.1f}"
+        ]
+
+        lines += [
+            "", "# Invocation cache", "",
+            f"{invocation_cache.hits} hits, {invocation_cache.misses} misses ({invocation_cache.hit_rate:.1%}), "
+            f"{len(invocation_cache)}/{invocation_cache.maxsize} entries"
+        ]
+
+        lines += ["", f"# Log records dropped: {log_listener.queue.dropped}"]
+
+        return lines
+
+    def prometheus(self) -> str:
+        lines = prometheus_histogram(
+            "bot_command_latency_seconds", "How long commands took to run", self.latencies, "command"
+        )
+        lines += prometheus_counter(
+            "bot_command_invocations_total", "How many times each command was invoked", self.invocations, "command"
+        )
+        lines += prometheus_counter(
+            "bot_command_errors_total", "How many times each command failed", self.errors, "command"
+        )
+        lines += prometheus_counter(
+            "bot_cog_seconds_total", "Time spent running each cog's commands", self.cog_times(), "cog"
+        )
+        lines += prometheus_histogram(
+            "bot_event_loop_lag_seconds", "How late the event loop ran a timed callback", {"main": self.loop_lag},
+            "loop"
+        )
+
+        lines += prometheus_counter(
+            "bot_log_records_dropped_total", "Log records dropped because the log queue was full",
+            {"main": log_listener.queue.dropped}, "queue"
+        )
+        lines += prometheus_counter(
+            "bot_invocation_cache_lookups_total", "Lookups in the parsed command invocation cache",
+            {"hit": invocation_cache.hits, "miss": invocation_cache.misses}, "result"
+        )
+
+        http_client = getattr(self.bot, "http_client", None)
+        if http_client is not None:
+            lines += prometheus_histogram(
+                "bot_http_latency_seconds", "How long HTTP requests took", http_client.latencies, "host"
+            )
+
+        return "\n".join(lines) + "\n"
+
+    async def _serve_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.prometheus(), content_type="text/plain")
+
+    async def _start_server(self, port: int):
+        self._app = web.Application(loop=self.bot.loop)
+        self._app.router.add_get("/metrics", self._serve_metrics)
+        self._handler = self._app.make_handler()
+
+        try:
+            self._server = await self.bot.loop.create_server(self._handler, STATS_HOST, port)
+        except OSError:
+            log.exception("Failed to start the metrics endpoint on %s:%s", STATS_HOST, port)
+            return
+
+        log.info(f"Serving metrics at http://{STATS_HOST}:{port}/metrics")
+
+    async def _stop_server(self):
+        self._server.close()
+        await self._server.wait_closed()
+        await self._app.shutdown()
+        await self._handler.shutdown(5)
+        await self._app.cleanup()
+
+    @command(name="stats", aliases=["stats()"])
+    @with_role(ADMIN_ROLE, OWNER_ROLE, DEVOPS_ROLE)
+    async def stats(self, ctx: Context):
+        """
+        Show how long commands take, how often they fail, and how far behind the event loop is running
+        """
+
+        lines = self.lines()
+
+        if self.bot.cluster is not None:
+            lines += ["", "# Cluster workers", ""]
+            cluster = await self.bot.cluster.stats()
+
+            for index, worker in cluster["workers"].items():
+                shards = worker.get("shards")
+                shard_range = f"{shards[0]}-{shards[-1]}" if shards else "-"
+                lines.append(
+                    f"worker {index:<3} shards {shard_range:<8} guilds {worker.get('guilds', 0):<7} "
+                    f"latency {worker.get('latency', 0) * 1000:.0f}ms, restarts {worker.get('restarts', 0)}"
+                )
+
+            total = sum(cluster["invocations"].values())
+            lines.append(f"{total} commands run across the cluster, {sum(cluster['errors'].values())} failed")
+
+        await LinePaginator.paginate(
+            lines, ctx, Embed(title="Stats"), prefix="```py", suffix="```", max_size=1800, empty=False
+        )
+
+
+def setup(bot):
+    bot.add_cog(Stats(bot))
+    log.info("Cog loaded: Stats")
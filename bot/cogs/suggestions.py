@@ -0,0 +1,122 @@
+# coding=utf-8
+import logging
+from typing import Dict, List, Set
+
+from discord.ext.commands import AutoShardedBot, CheckFailure, CommandNotFound, Context
+
+from bot.constants import HELP_PREFIX
+from bot.fuzzy import TrigramIndex, normalize
+from bot.ratelimit import RateLimited
+
+log = logging.getLogger(__name__)
+
+
+def _command_key(name: str) -> str:
+    # "hlep()" and "hlep" should find the same commands
+    return normalize(name[:-2] if name.endswith("()") else name)
+
+
+class CommandIndex:
+    """
+    A fuzzy index over the names and aliases of the bot's commands.
+
+    The index follows `bot.all_commands`, which holds every name and alias as a key - it's brought up to date with a
+    set difference, so when a cog is added or removed only the names that changed are indexed or dropped.
+    """
+
+    def __init__(self, bot: AutoShardedBot):
+        self.bot = bot
+        self._index = TrigramIndex()
+        self._keys: Dict[str, str] = {}  # Name or alias in all_commands -> index key
+        self._names: Dict[str, Set[str]] = {}  # Index key -> names and aliases in all_commands
+
+    def sync(self):
+        commands = self.bot.all_commands
+
+        added = commands.keys() - self._keys.keys()
+        removed = self._keys.keys() - commands.keys()
+
+        if not added and not removed:
+            return
+
+        log.debug("Updating the command index: %d names added, %d removed", len(added), len(removed))
+
+        for name in removed:
+            key = self._keys.pop(name)
+            names = self._names[key]
+            names.discard(name)
+
+            if not names:
+                del self._names[key]
+                self._index.remove(key)
+
+        for name in added:
+            key = self._keys[name] = _command_key(name)
+            self._names.setdefault(key, set()).add(name)
+            self._index.add(key)
+
+    def suggest(self, name: str, limit: int = 3) -> List[str]:
+        """
+        Get the qualified names of the visible commands that a mistyped name most likely refers to, closest first
+        """
+
+        self.sync()
+        suggestions = []
+
+        for key, _ in self._index.search(_command_key(name), limit=limit * 2):
+            for command_name in sorted(self._names[key]):
+                command = self.bot.all_commands[command_name]
+
+                if not command.hidden and command.qualified_name not in suggestions:
+                    suggestions.append(command.qualified_name)
+
+        return suggestions[:limit]
+
+
+class Suggestions:
+    """
+    Suggests commands when someone mistypes one
+    """
+
+    def __init__(self, bot: AutoShardedBot):
+        self.bot = bot
+        self.index = CommandIndex(bot)
+        self.index.sync()
+
+    async def on_command_error(self, ctx: Context, error: Exception):
+        if isinstance(error, RateLimited):
+            # Replying would only add to the spam
+            log.debug("%s was rate limited using '%s': %s", ctx.author.id, ctx.command, error)
+            return
+
+        if isinstance(error, CheckFailure):
+            # Someone used a command they aren't allowed to - that's not a bug
+            log.debug("%s failed the checks for '%s': %r", ctx.author.id, ctx.command, error)
+            return
+
+        if not isinstance(error, CommandNotFound):
+            # Having any on_command_error listener stops discord.py from printing errors itself, so do it here
+            log.error(
+                f"Error in command '{ctx.command}'", exc_info=(type(error), error, error.__traceback__)
+            )
+            return
+
+        # Bare ">" prefixes are also how Discord quotes, so only suggest when it was clearly meant for us
+        if not ctx.prefix.strip(" >") or not ctx.invoked_with:
+            return
+
+        suggestions = self.index.suggest(ctx.invoked_with)
+
+        if not suggestions:
+            log.debug("No suggestions for unknown command '%s'", ctx.invoked_with)
+        else:
+            log.debug("Suggesting %s for unknown command '%s'", suggestions, ctx.invoked_with)
+            await ctx.send(
+                f"AttributeError: 'Bot' object has no attribute '{ctx.invoked_with.replace('()', '')}'. Did you mean "
+                f"{', '.join(f'`{HELP_PREFIX}{suggestion}()`' for suggestion in suggestions)}?"
+            )
+
+
+def setup(bot):
+    bot.add_cog(Suggestions(bot))
+    log.info("Cog loaded: Suggestions")
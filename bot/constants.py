@@ -25,3 +25,86 @@ BOT_AVATAR_URL = "https://raw.githubusercontent.com/discord-python/branding/mast
 
 # Bot internals
 HELP_PREFIX = "bot."
+
+# Extensions to load at startup - internal/debug first, then commands
+EXTENSIONS = (
+    "bot.cogs.logging",
+    "bot.cogs.security",
+    "bot.cogs.stats",
+    "bot.cogs.suggestions"
+)
+
+# Extensions to load the first time one of their commands is used, with the names and aliases of those commands
+LAZY_EXTENSIONS = {
+    "bot.cogs.snakes": ("get",)
+}
+
+# What the bot keeps of what Discord sends it, see bot.cache_policy
+CACHE_MAX_MESSAGES = 1000  # Paginated messages need to stay in here while people are reacting to them
+CACHE_FETCH_OFFLINE_MEMBERS = False
+CACHE_MEMBERS = "all"  # Or "roles", to only keep members with a role that a role check refers to, and authors
+
+# Logging, see bot.logs
+LOG_QUEUE_SIZE = 10000  # Records waiting to be written before the oldest are dropped
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUPS = 5
+
+# Multi-process cluster, see bot.cluster - set CLUSTER_WORKERS and SHARD_COUNT to use it
+CLUSTER_STATS_INTERVAL = 10  # Seconds between each worker pushing its stats to the launcher
+CLUSTER_RESTART_BACKOFF = 1  # Seconds before restarting a crashed worker, doubling if it keeps crashing
+CLUSTER_RESTART_MAX_BACKOFF = 60
+CLUSTER_STABLE_UPTIME = 60  # Seconds a worker has to stay up before its earlier crashes are forgotten
+CLUSTER_OUTBOX_SIZE = 100  # Messages waiting for a worker that isn't reading them, before more are dropped
+
+# Command and event loop statistics, see bot.cogs.stats
+STATS_HOST = "127.0.0.1"  # The metrics endpoint is only served locally, on STATS_PORT if it's set
+STATS_LAG_INTERVAL = 1  # Seconds between event loop lag measurements
+
+# Parsed command invocations, keyed on the message text after the prefix
+INVOCATION_CACHE_SIZE = 1024
+INVOCATION_CACHE_MAX_LENGTH = 256  # Longer messages are parsed every time rather than cached
+
+# Role IDs of members, used by the role check decorators
+MEMBER_ROLE_CACHE_SIZE = 4096
+
+# Command rate limits, see bot.ratelimit - (tokens added per second, most tokens held) for each scope. Under a cluster,
+# the user limit applies in each worker process, and the command limit is split evenly between the workers
+RATE_LIMIT_USER = (0.5, 5)  # Per user: five in a burst, then one every two seconds
+RATE_LIMIT_CHANNEL = (1, 10)  # Per channel
+RATE_LIMIT_COMMAND = (5, 30)  # Per command, across everyone - these protect the APIs behind the commands
+RATE_LIMIT_SWEEP_INTERVAL = 60  # How often idle buckets are forgotten, in seconds
+
+# Snake information cache
+SNAKE_CACHE_PATH = "cache/snakes.sqlite3"
+SNAKE_CACHE_SIZE = 512
+SNAKE_CACHE_TTL = 60 * 60 * 24  # How long snake information is fresh for
+SNAKE_CACHE_STALE_TTL = 60 * 60 * 24 * 7  # How long after that we'll serve it while refreshing in the background
+SNAKE_CACHE_NEGATIVE_TTL = 60 * 60  # How long to remember that a snake doesn't exist
+SNAKE_INDEX_PATH = "bot/resources/snakes.json"
+
+# Snake picture thumbnails, see bot.images
+SNAKE_IMAGE_PATH = "cache/images"
+SNAKE_IMAGE_CACHE_BYTES = 256 * 1024 * 1024  # Least recently used thumbnails are deleted past this
+SNAKE_IMAGE_SIZE = 512  # Largest width or height, in pixels
+SNAKE_IMAGE_QUALITY = 85  # JPEG quality
+SNAKE_IMAGE_WORKERS = 2  # Processes doing the resizing
+
+# Pool of pre-fetched random snakes, used by `get` when no name is given
+SNAKE_POOL_SIZE = 5
+SNAKE_POOL_CONCURRENCY = 2
+SNAKE_POOL_BACKOFF = 1  # Seconds to wait after the first failure, doubling each time after that
+SNAKE_POOL_MAX_BACKOFF = 60 * 5
+SNAKE_POOL_ATTEMPTS = 5  # Species tried for each random snake, in case some of them can't be found
+
+# Shared HTTP client, see bot.http_client
+HTTP_CONNECTION_LIMIT = 100
+HTTP_CONNECTION_LIMIT_PER_HOST = 10
+HTTP_KEEPALIVE_TIMEOUT = 30
+HTTP_DNS_TTL = 300
+HTTP_CONNECT_TIMEOUT = 5
+HTTP_READ_TIMEOUT = 30
+HTTP_TOTAL_TIMEOUT = 60  # Seconds for a whole request, including its retries and the waits between them
+HTTP_RETRIES = 2
+HTTP_RETRY_BACKOFF = 0.5  # Seconds before the first retry, doubling for each one after that
+HTTP_BREAKER_THRESHOLD = 5  # Failures in a row before we stop talking to a host for a while
+HTTP_BREAKER_COOLDOWN = 30
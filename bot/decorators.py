@@ -1,41 +1,106 @@
 # coding=utf-8
 import logging
+from typing import FrozenSet, Set
 
+from discord import HTTPException, Member
 from discord.ext import commands
 from discord.ext.commands import Context
 
+from bot.constants import MEMBER_ROLE_CACHE_SIZE
+from bot.utils import LRUCache
+
 log = logging.getLogger(__name__)
 
+# Every role ID that a with_role or without_role check looks for
+REFERENCED_ROLES: Set[int] = set()
+
+# (guild ID, member ID) -> frozenset of the member's role IDs, kept up to date from gateway events in bot/__init__.py
+member_roles = LRUCache(maxsize=MEMBER_ROLE_CACHE_SIZE)
+
+
+def get_role_ids(member: Member) -> FrozenSet[int]:
+    """
+    Get the IDs of a member's roles, building the set only once until the member is updated
+    """
+
+    key = (member.guild.id, member.id)
+    role_ids = member_roles.get(key)
+
+    if role_ids is None:
+        role_ids = member_roles[key] = frozenset(role.id for role in member.roles)
+
+    return role_ids
+
+
+def invalidate_member_roles(guild_id: int, member_id: int):
+    member_roles.pop((guild_id, member_id), None)
+
+
+async def get_author_role_ids(ctx: Context) -> FrozenSet[int]:
+    """
+    Get the IDs of the roles of whoever invoked a command in a guild
+
+    If they aren't in the member cache - which the cache policy might have left them out of - the author is a plain
+    User, so their roles are fetched from Discord instead. Those are cached too, since the member events that
+    invalidate the cache are handled whether or not the member is cached. If they can't be fetched - say the author
+    has just left - they count as having no roles, and nothing is cached.
+    """
+
+    if isinstance(ctx.author, Member):
+        return get_role_ids(ctx.author)
+
+    key = (ctx.guild.id, ctx.author.id)
+    role_ids = member_roles.get(key)
+
+    if role_ids is None:
+        log.debug("%s isn't in the member cache, fetching their roles", ctx.author)
+
+        try:
+            data = await ctx.bot.http.get_member(ctx.guild.id, ctx.author.id)
+        except HTTPException as e:
+            log.debug("Failed to fetch the roles of %s, so they have none: %r", ctx.author, e)
+            return frozenset()
+
+        role_ids = member_roles[key] = frozenset(int(role_id) for role_id in data["roles"])
+
+    return role_ids
+
 
 def with_role(*role_ids: int):
+    required = frozenset(role_ids)
+    REFERENCED_ROLES.update(required)
+
     async def predicate(ctx: Context):
         if not ctx.guild:  # Return False in a DM
-            log.debug(f"{ctx.author} tried to use the '{ctx.command.name}'command from a DM. "
-                      "This command is restricted by the with_role decorator. Rejecting request.")
+            log.debug("%s tried to use the '%s' command from a DM. "
+                      "This command is restricted by the with_role decorator. Rejecting request.",
+                      ctx.author, ctx.command.name)
             return False
 
-        for role in ctx.author.roles:
-            if role.id in role_ids:
-                log.debug(f"{ctx.author} has the '{role.name}' role, and passes the check.")
-                return True
+        if required.isdisjoint(await get_author_role_ids(ctx)):
+            log.debug("%s does not have the required role to use the '%s' command, so the request is rejected.",
+                      ctx.author, ctx.command.name)
+            return False
 
-        log.debug(f"{ctx.author} does not have the required role to use "
-                  f"the '{ctx.command.name}' command, so the request is rejected.")
-        return False
+        log.debug("%s has one of the roles %s, and passes the check.", ctx.author, required)
+        return True
     return commands.check(predicate)
 
 
 def without_role(*role_ids: int):
+    forbidden = frozenset(role_ids)
+    REFERENCED_ROLES.update(forbidden)
+
     async def predicate(ctx: Context):
         if not ctx.guild:  # Return False in a DM
-            log.debug(f"{ctx.author} tried to use the '{ctx.command.name}' command from a DM. "
-                      "This command is restricted by the without_role decorator. Rejecting request.")
+            log.debug("%s tried to use the '%s' command from a DM. "
+                      "This command is restricted by the without_role decorator. Rejecting request.",
+                      ctx.author, ctx.command.name)
             return False
 
-        author_roles = [role.id for role in ctx.author.roles]
-        check = all(role not in author_roles for role in role_ids)
-        log.debug(f"{ctx.author} tried to call the '{ctx.command.name}' command. "
-                  f"The result of the without_role check was {check}.")
+        check = forbidden.isdisjoint(await get_author_role_ids(ctx))
+        log.debug("%s tried to call the '%s' command. The result of the without_role check was %s.",
+                  ctx.author, ctx.command.name, check)
         return check
     return commands.check(predicate)
 
@@ -43,7 +108,7 @@ def without_role(*role_ids: int):
 def in_channel(channel_id):
     async def predicate(ctx: Context):
         check = ctx.channel.id == channel_id
-        log.debug(f"{ctx.author} tried to call the '{ctx.command.name}' command. "
-                  f"The result of the in_channel check was {check}.")
+        log.debug("%s tried to call the '%s' command. The result of the in_channel check was %s.",
+                  ctx.author, ctx.command.name, check)
         return check
     return commands.check(predicate)
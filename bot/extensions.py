@@ -0,0 +1,242 @@
+# coding=utf-8
+import ast
+import builtins
+import functools
+import importlib.util
+import inspect
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from discord.ext import commands
+from discord.ext.commands import AutoShardedBot, Command, Context, command
+
+from bot.profiling import profiler
+
+log = logging.getLogger(__name__)
+
+
+def invalidate_help(bot: AutoShardedBot):
+    """
+    Throw away the help output cached by the bot's formatter, if it caches any
+    """
+
+    invalidate = getattr(getattr(bot, "formatter", None), "invalidate", None)
+
+    if invalidate is not None:
+        invalidate()
+
+
+def track_command_changes(bot: AutoShardedBot):
+    """
+    Invalidate the cached help output whenever a command is added to or removed from the bot
+
+    Loading, unloading and reloading extensions all add and remove commands through these, and so do the stand-ins
+    for lazy extensions.
+    """
+
+    add_command, remove_command = bot.add_command, bot.remove_command
+
+    @functools.wraps(add_command)
+    def add(command: Command):
+        add_command(command)
+        invalidate_help(bot)
+
+    @functools.wraps(remove_command)
+    def remove(name: str) -> Optional[Command]:
+        removed = remove_command(name)
+
+        if removed is not None:
+            invalidate_help(bot)
+
+        return removed
+
+    bot.add_command, bot.remove_command = add, remove
+
+
+def load_extension(bot: AutoShardedBot, name: str):
+    """
+    Load an extension, recording how long it took to import and set up for the startup report
+    """
+
+    started = time.perf_counter()
+    bot.load_extension(name)
+    profiler.extensions[name] = time.perf_counter() - started
+
+
+def _parameters(arguments: ast.arguments) -> List[inspect.Parameter]:
+    """
+    Rebuild a function's parameters from its syntax tree, as far as that's possible without importing its module
+
+    Annotations are kept if they're builtins or from discord.ext.commands, and defaults if they're literals - any
+    other default is replaced with None, so the parameter stays optional.
+    """
+
+    namespace = {**vars(builtins), **vars(commands)}
+
+    def annotation(node: Optional[ast.AST]):
+        if isinstance(node, ast.Name) and node.id in namespace:
+            return namespace[node.id]
+
+        return inspect.Parameter.empty
+
+    def default(node: Optional[ast.AST]):
+        if node is None:
+            return inspect.Parameter.empty
+
+        try:
+            return ast.literal_eval(node)
+        except ValueError:
+            return None
+
+    positional = arguments.args
+    defaults = [None] * (len(positional) - len(arguments.defaults)) + arguments.defaults
+    parameters = [
+        inspect.Parameter(arg.arg, inspect.Parameter.POSITIONAL_OR_KEYWORD, default=default(value),
+                          annotation=annotation(arg.annotation))
+        for arg, value in zip(positional, defaults)
+    ]
+
+    if arguments.vararg is not None:
+        parameters.append(inspect.Parameter(
+            arguments.vararg.arg, inspect.Parameter.VAR_POSITIONAL, annotation=annotation(arguments.vararg.annotation)
+        ))
+
+    for arg, value in zip(arguments.kwonlyargs, arguments.kw_defaults):
+        parameters.append(inspect.Parameter(
+            arg.arg, inspect.Parameter.KEYWORD_ONLY, default=default(value), annotation=annotation(arg.annotation)
+        ))
+
+    if parameters and parameters[0].name == "self":  # Stand-ins aren't methods
+        del parameters[0]
+
+    return parameters
+
+
+def read_commands(name: str) -> Dict[str, Tuple[inspect.Signature, Optional[str]]]:
+    """
+    Find the commands that an extension defines by parsing its source, rather than importing it
+
+    :param name: The extension, e.g. "bot.cogs.snakes"
+    :return: The signature and help text of every command, by each of its names and aliases
+    """
+
+    spec = importlib.util.find_spec(name)
+
+    if spec is None or not spec.has_location:
+        return {}
+
+    with open(spec.origin, encoding="utf-8") as file:
+        tree = ast.parse(file.read(), spec.origin)
+
+    found = {}
+
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.AsyncFunctionDef):
+            continue
+
+        for decorator in node.decorator_list:
+            call = decorator if isinstance(decorator, ast.Call) else None
+            function = call.func if call is not None else decorator
+            decorator_name = function.attr if isinstance(function, ast.Attribute) else getattr(function, "id", None)
+
+            if decorator_name not in ("command", "group"):
+                continue
+
+            names = [node.name]
+
+            for keyword in call.keywords if call is not None else ():
+                if keyword.arg == "name":
+                    names[0] = ast.literal_eval(keyword.value)
+                elif keyword.arg == "aliases":
+                    names.extend(ast.literal_eval(keyword.value))
+
+            signature = inspect.Signature(_parameters(node.args))
+
+            for command_name in names:
+                found[command_name] = (signature, ast.get_docstring(node))
+
+    return found
+
+
+def add_lazy_extension(bot: AutoShardedBot, name: str, command_names: Iterable[str]):
+    """
+    Register stand-in commands for an extension, which load it the first time one of them is used
+
+    The stand-ins are removed and the extension loaded in their place, then the message is processed again so that it
+    reaches the real command. Anything else the extension does - listeners, background tasks - only starts then.
+
+    Each stand-in has the signature and help text of the command it stands in for, read from the extension's source,
+    so the help command shows them as they'll be.
+
+    :param bot: The bot to add the commands to
+    :param name: The extension, e.g. "bot.cogs.snakes"
+    :param command_names: The names and aliases of the extension's commands
+    """
+
+    command_names = tuple(command_names)
+
+    try:
+        found = read_commands(name)
+    except (OSError, SyntaxError, ValueError) as e:
+        log.warning("Couldn't read the commands of the %s extension, its stand-ins won't have their help: %r", name, e)
+        found = {}
+
+    def stub(command_name: str) -> Command:
+        async def callback(ctx: Context, *args, **kwargs):
+            await load_and_invoke(ctx)
+
+        signature, help_text = found.get(command_name, (None, None))
+
+        if signature is not None:
+            callback.__signature__ = signature
+
+        return command(name=command_name, help=help_text or f"Loaded from {name} the first time it's used.")(callback)
+
+    def add_stubs():
+        for command_name in command_names:
+            stand_in = stub(command_name)
+            stand_in.lazy_extension = name
+            bot.add_command(stand_in)
+
+    def remove_stubs():
+        for command_name in command_names:
+            existing = bot.get_command(command_name)
+
+            if getattr(existing, "lazy_extension", None) == name:
+                bot.remove_command(command_name)
+
+    async def load_and_invoke(ctx: Context):
+        if name not in bot.extensions:
+            log.info("Loading the %s extension on first use", name)
+            remove_stubs()
+
+            try:
+                load_extension(bot, name)
+            except Exception:
+                add_stubs()  # So the next attempt can try again
+                raise
+
+        ctx = await bot.get_context(ctx.message)
+
+        if ctx.command is None or getattr(ctx.command, "lazy_extension", None) is not None:
+            log.error("Loading the %s extension didn't replace its stand-in commands %s", name, command_names)
+            return
+
+        await bot.invoke(ctx)
+
+    add_stubs()
+
+
+def load_extensions(bot: AutoShardedBot, eager: Iterable[str], lazy: Dict[str, Iterable[str]]):
+    """
+    Load the `eager` extensions now, and set up the `lazy` ones - a mapping of extension name to the names of its
+    commands - to load the first time one of their commands is used
+    """
+
+    for name in eager:
+        load_extension(bot, name)
+
+    for name, command_names in lazy.items():
+        log.debug("Deferring the %s extension until one of %s is used", name, command_names)
+        add_lazy_extension(bot, name, command_names)
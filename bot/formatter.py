@@ -9,8 +9,9 @@ Which falls under The MIT License.
 import itertools
 import logging
 from inspect import formatargspec, getfullargspec
+from typing import Dict, List, Optional, Tuple
 
-from discord.ext.commands import Command, HelpFormatter, Paginator
+from discord.ext.commands import Command, CommandError, HelpFormatter, Paginator
 
 from bot.constants import HELP_PREFIX
 
@@ -18,24 +19,151 @@ log = logging.getLogger(__name__)
 
 
 class Formatter(HelpFormatter):
+    """
+    Help output is worked out once per command, and once per cog for the overview pages, then reused until the
+    commands change - `bot.extensions.track_command_changes` calls `invalidate` whenever a command is added or removed.
+
+    The only per-call work is the permission filter, and that only runs the checks of commands that have any.
+    """
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-    def _add_subcommands_to_page(self, max_width: int, commands: list):
+        # Command qualified name -> pages
+        self._command_cache: Dict[str, List[str]] = {}
+
+        # Cog ID, or None for the bot -> entries
+        self._overview_cache: Dict[Optional[int], list] = {}
+
+    def invalidate(self):
+        """
+        Throw away all of the cached help output
+        """
+
+        self._command_cache.clear()
+        self._overview_cache.clear()
+
+    @staticmethod
+    def _needs_check(command: Command) -> bool:
+        """
+        Whether there's more to running this command than the global checks, which the help caller already passed
+        """
+
+        if command.checks or not getattr(command, "enabled", True):
+            return True
+
+        cog = command.instance
+        return cog is not None and hasattr(cog, f"_{type(cog).__name__}__local_check")
+
+    async def _can_run(self, command: Command) -> bool:
+        try:
+            return await command.can_run(self.context)
+        except CommandError:
+            return False
+
+    def _command_pages(self, command: Command) -> List[str]:
+        cached = self._command_cache.get(command.qualified_name)
+
+        if cached is not None:
+            return cached
+
+        log.trace("Building help output for the '%s' command", command.qualified_name)
+        paginator = Paginator(prefix="```py")
+
+        # strip the command off bot. and ()
+        stripped_command = command.name.replace(HELP_PREFIX, "").replace("()", "")
+
+        # get the args using the handy inspect module
+        argspec = getfullargspec(command.callback)
+        arguments = formatargspec(*argspec)
+        for arg, annotation in argspec.annotations.items():
+            # remove module name to only show class name
+            # discord.ext.commands.context.Context -> Context
+            arguments = arguments.replace(f"{annotation.__module__}.", "")
+
+        # manipulate the argspec to make it valid python when 'calling' the do_<command>
+        args_no_type_hints = argspec.args
+        for kwarg in argspec.kwonlyargs:
+            args_no_type_hints.append("{0}={0}".format(kwarg))
+        args_no_type_hints = "({0})".format(", ".join(args_no_type_hints))
+
+        # remove self from the args
+        arguments = arguments.replace("self, ", "")
+        args_no_type_hints = args_no_type_hints.replace("self, ", "")
+
+        # indent every line in the help message
+        helptext = "\n    ".join(command.help.split("\n"))
+
+        # prepare the different sections of the help output, and add them to the paginator
+        definition = f"async def {stripped_command}{arguments}:"
+        doc_elems = [
+            '"""',
+            helptext,
+            '"""'
+        ]
+
+        docstring = ""
+        for elem in doc_elems:
+            docstring += f'    {elem}\n'
+
+        invocation = f"    await do_{stripped_command}{args_no_type_hints}"
+        paginator.add_line(definition)
+        paginator.add_line(docstring)
+        paginator.add_line(invocation)
+
+        self._command_cache[command.qualified_name] = paginator.pages
+        return paginator.pages
+
+    def _overview_entries(self) -> List[Tuple[str, List[Tuple[Command, bool, str]]]]:
         """
-        basically the same function from d.py but changed:
-        - to make the helptext appear as a comment
-        - to change the indentation to the PEP8 standard: 4 spaces
+        Get the overview lines for the bot or cog being formatted, grouped by category
+
+        Each entry is a (command, whether it has checks to run, line) tuple, and the list is kept until the bot's
+        commands change.
         """
 
-        for name, command in commands:
-            if name in command.aliases:
-                # skip aliases
-                continue
+        key = id(self.command) if self.is_cog() else None
 
-            entry = "    {0}{1:<{width}} # {2}".format(HELP_PREFIX, name, command.short_doc, width=max_width)
-            shortened = self.shorten(entry)
-            self._paginator.add_line(shortened)
+        cached = self._overview_cache.get(key)
+        if cached is not None:
+            return cached
+
+        log.trace("Building help overview")
+        max_width = self.max_name_size
+
+        def category_check(tup):
+            cog = tup[1].cog_name
+            # zero width character to make it appear last when put in alphabetical order
+            return cog if cog is not None else "\u200bNoCategory"
+
+        def visible(tup):
+            name, command = tup
+
+            if self.is_cog() and command.instance is not self.command:
+                return False
+
+            if command.hidden and not self.show_hidden:
+                return False
+
+            # skip aliases
+            return name not in command.aliases
+
+        data = sorted(filter(visible, self.context.bot.all_commands.items()), key=category_check)
+        entries = []
+
+        for category, commands in itertools.groupby(data, key=category_check):
+            lines = []
+
+            for name, command in sorted(commands):
+                entry = "    {0}{1:<{width}} # {2}".format(HELP_PREFIX, name, command.short_doc, width=max_width)
+                needs_check = not self.show_check_failure and self._needs_check(command)
+                lines.append((command, needs_check, self.shorten(entry)))
+
+            if lines:
+                entries.append((category, lines))
+
+        self._overview_cache[key] = entries
+        return entries
 
     async def format(self):
         """
@@ -57,67 +185,19 @@ class Formatter(HelpFormatter):
         # <ending help note>
         """
 
-        self._paginator = Paginator(prefix="```py")
-
         if isinstance(self.command, Command):
-            # strip the command off bot. and ()
-            stripped_command = self.command.name.replace(HELP_PREFIX, "").replace("()", "")
-
-            # get the args using the handy inspect module
-            argspec = getfullargspec(self.command.callback)
-            arguments = formatargspec(*argspec)
-            for arg, annotation in argspec.annotations.items():
-                # remove module name to only show class name
-                # discord.ext.commands.context.Context -> Context
-                arguments = arguments.replace(f"{annotation.__module__}.", "")
-
-            # manipulate the argspec to make it valid python when 'calling' the do_<command>
-            args_no_type_hints = argspec.args
-            for kwarg in argspec.kwonlyargs:
-                args_no_type_hints.append("{0}={0}".format(kwarg))
-            args_no_type_hints = "({0})".format(", ".join(args_no_type_hints))
-
-            # remove self from the args
-            arguments = arguments.replace("self, ", "")
-            args_no_type_hints = args_no_type_hints.replace("self, ", "")
-
-            # indent every line in the help message
-            helptext = "\n    ".join(self.command.help.split("\n"))
-
-            # prepare the different sections of the help output, and add them to the paginator
-            definition = f"async def {stripped_command}{arguments}:"
-            doc_elems = [
-                '"""',
-                helptext,
-                '"""'
-            ]
-
-            docstring = ""
-            for elem in doc_elems:
-                docstring += f'    {elem}\n'
-
-            invocation = f"    await do_{stripped_command}{args_no_type_hints}"
-            self._paginator.add_line(definition)
-            self._paginator.add_line(docstring)
-            self._paginator.add_line(invocation)
-
-            return self._paginator.pages
+            return list(self._command_pages(self.command))
 
-        max_width = self.max_name_size
-
-        def category_check(tup):
-            cog = tup[1].cog_name
-            # zero width character to make it appear last when put in alphabetical order
-            return cog if cog is not None else "\u200bNoCategory"
+        self._paginator = Paginator(prefix="```py")
 
-        command_list = await self.filter_command_list()
-        data = sorted(command_list, key=category_check)
+        for category, entries in self._overview_entries():
+            lines = [line for command, needs_check, line in entries if not needs_check or await self._can_run(command)]
 
-        for category, commands in itertools.groupby(data, key=category_check):
-            commands = sorted(commands)
-            if len(commands) > 0:
+            if lines:
                 self._paginator.add_line(f"class {category}:")
-                self._add_subcommands_to_page(max_width, commands)
+
+                for line in lines:
+                    self._paginator.add_line(line)
 
         self._paginator.add_line()
         ending_note = self.get_ending_note()
@@ -0,0 +1,193 @@
+# coding=utf-8
+import logging
+import re
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+log = logging.getLogger(__name__)
+
+SEPARATORS = re.compile(r"[\s\-_.]+")
+
+
+def normalize(text: str) -> str:
+    """
+    Case-fold a name and collapse the ways people separate words, so "King-Cobra" and "king  cobra" are the same
+    """
+
+    return SEPARATORS.sub(" ", text.casefold()).strip()
+
+
+def trigrams(text: str) -> Set[str]:
+    """
+    Get the set of three-character chunks in a string, padded so that short strings and word starts still count
+    """
+
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def damerau_levenshtein(a: str, b: str, max_distance: int = None) -> int:
+    """
+    The edit distance between two strings, counting insertions, deletions, substitutions and swaps of two
+    neighbouring characters as one edit each ("cobar" is one edit away from "cobra")
+
+    :param a: The first string
+    :param b: The second string
+    :param max_distance: Optional, stop early and return `max_distance + 1` once the distance is known to exceed this
+    :return: The number of edits needed to turn one string into the other
+    """
+
+    if a == b:
+        return 0
+
+    len_a, len_b = len(a), len(b)
+
+    if max_distance is not None and abs(len_a - len_b) > max_distance:
+        return max_distance + 1
+
+    if not len_a or not len_b:
+        return len_a or len_b
+
+    # Without a maximum, every cell of the table is needed - with one, only a band around the diagonal is
+    band = max(len_a, len_b) if max_distance is None else max_distance
+    overflow = len_a + len_b + 1  # Stands in for cells outside the band, which can never be on the best path
+
+    two_ago = None
+    previous = [j if j <= band else overflow for j in range(len_b + 1)]
+
+    for i in range(1, len_a + 1):
+        current = [overflow] * (len_b + 1)
+        current[0] = i if i <= band else overflow
+        row_min = current[0]
+
+        for j in range(max(1, i - band), min(len_b, i + band) + 1):
+            cost = a[i - 1] != b[j - 1]
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, two_ago[j - 2] + 1)
+
+            current[j] = value
+            row_min = min(row_min, value)
+
+        if max_distance is not None and row_min > max_distance:
+            return max_distance + 1
+
+        two_ago, previous = previous, current
+
+    if max_distance is not None and previous[len_b] > max_distance:
+        return max_distance + 1
+
+    return previous[len_b]
+
+
+class TrigramIndex:
+    """
+    A fuzzy string index: trigram posting lists find the candidates, and Damerau-Levenshtein distance ranks them.
+
+    Posting lists are arrays of integer key ids rather than sets of strings, which keeps the index compact. Keys can be
+    added and removed one at a time; removed keys leave a gap that's cleaned up once there are enough of them.
+    """
+
+    def __init__(self, keys: Iterable[str] = ()):
+        self._keys: List[Optional[str]] = []
+        self._ids: Dict[str, int] = {}
+        self._postings: Dict[str, array] = {}
+
+        for key in keys:
+            self.add(key)
+
+    def add(self, key: str):
+        if key in self._ids:
+            return
+
+        key_id = len(self._keys)
+        self._keys.append(key)
+        self._ids[key] = key_id
+
+        for gram in trigrams(key):
+            self._postings.setdefault(gram, array("I")).append(key_id)
+
+    def remove(self, key: str):
+        key_id = self._ids.pop(key, None)
+
+        if key_id is None:
+            return
+
+        self._keys[key_id] = None
+
+        if len(self._keys) > 32 and len(self._ids) < len(self._keys) // 2:
+            self._compact()
+
+    def _compact(self):
+        log.trace("Compacting trigram index of %d keys", len(self._ids))
+        keys = [key for key in self._keys if key is not None]
+
+        self._keys = []
+        self._ids = {}
+        self._postings = {}
+
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def search(self, query: str, limit: int = 5, max_distance: int = None) -> List[Tuple[str, int]]:
+        """
+        Find the keys closest to a query
+
+        :param query: The string to search for, normalized the same way as the keys
+        :param limit: The maximum number of results
+        :param max_distance: Optional, the largest edit distance to accept - defaults to a third of the query's length
+        :return: A list of (key, distance) tuples, closest first
+        """
+
+        if max_distance is None:
+            max_distance = max(1, len(query) // 3)
+
+        if query in self._ids:
+            results = [(query, 0)]
+        else:
+            results = []
+
+        grams = trigrams(query)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+
+        def rank(result: Tuple[str, int]):
+            key, distance = result
+            return distance, -shared[self._ids[key]], key
+
+        # Candidates sharing the most trigrams are checked first, so the cutoff can tighten as soon as we have enough
+        # results. Each edit breaks at most four of the query's trigrams (a swap touches four), so once the candidates
+        # share fewer than that allows for, none of the rest can be close enough.
+        for key_id, count in shared.most_common():
+            if count < len(grams) - 4 * max_distance:
+                break
+
+            key = self._keys[key_id]
+
+            if key is None or key == query:
+                continue
+
+            distance = damerau_levenshtein(query, key, max_distance)
+
+            if distance <= max_distance:
+                results.append((key, distance))
+
+                if len(results) >= limit:
+                    results.sort(key=rank)
+                    del results[limit:]
+                    max_distance = results[-1][1]
+
+        results.sort(key=rank)
+        return results[:limit]
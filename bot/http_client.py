@@ -0,0 +1,219 @@
+# coding=utf-8
+import asyncio
+import logging
+import random
+from typing import Any, Dict
+from urllib.parse import urlsplit
+
+from aiohttp import AsyncResolver, ClientError, ClientResponseError, ClientSession, TCPConnector
+
+from bot.metrics import Histogram
+
+log = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of making a request to a host that has been failing, until its cooldown is over
+    """
+
+    def __init__(self, host: str):
+        super().__init__(f"Too many recent failures talking to {host}, not trying again yet")
+        self.host = host
+
+
+class ServerError(Exception):
+    """
+    Raised when a host keeps answering with a status that's worth retrying, like 503, until we run out of retries
+    """
+
+    def __init__(self, host: str, status: int):
+        super().__init__(f"{host} responded with HTTP {status}")
+        self.host = host
+        self.status = status
+
+
+class CircuitBreaker:
+    """
+    Stops us from hammering a host that's down.
+
+    After `threshold` failures in a row, the circuit opens and requests fail straight away. Once `cooldown` seconds have
+    passed, one request is let through to try the host again - if it works, the circuit closes, and if it doesn't, the
+    cooldown starts over.
+    """
+
+    __slots__ = ("threshold", "cooldown", "failures", "opened_at")
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+
+    def allow(self, now: float) -> bool:
+        if self.opened_at is None:
+            return True
+
+        if now - self.opened_at >= self.cooldown:
+            self.opened_at = now  # Let this one request through, and hold the rest back for another cooldown
+            return True
+
+        return False
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def failure(self, now: float):
+        self.failures += 1
+
+        if self.failures >= self.threshold:
+            self.opened_at = now
+
+    @property
+    def open(self) -> bool:
+        return self.opened_at is not None
+
+
+class HTTPClient:
+    """
+    The bot's shared HTTP client, for cogs to talk to web APIs through.
+
+    This wraps a single aiohttp session, so connections are pooled and kept alive across every cog, with limits on the
+    total number of connections and the number per host. DNS lookups are done with aiodns and cached.
+
+    Requests have connect and read timeouts, and are retried with jittered exponential backoff when they fail in a way
+    that's worth retrying (connection errors, timeouts, 429 and 5xx responses). The total timeout covers the whole
+    request, including every retry and the waits between them. Every host has a circuit
+    breaker, so a host that's down fails fast instead of tying up the bot, and a latency histogram.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop = None, limit: int = 100, limit_per_host: int = 10,
+                 keepalive_timeout: float = 30, dns_ttl: int = 300, connect_timeout: float = 5,
+                 read_timeout: float = 30, total_timeout: float = 60, retries: int = 2, backoff: float = 0.5,
+                 breaker_threshold: int = 5, breaker_cooldown: float = 30):
+        self.loop = loop or asyncio.get_event_loop()
+        self.total_timeout = total_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+
+        self.latencies: Dict[str, Histogram] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+        # Uses asyncio for DNS resolution instead of threads, so we don't *spam threads*
+        connector = TCPConnector(
+            resolver=AsyncResolver(loop=self.loop), limit=limit, limit_per_host=limit_per_host,
+            keepalive_timeout=keepalive_timeout, use_dns_cache=True, ttl_dns_cache=dns_ttl, loop=self.loop
+        )
+        self.session = ClientSession(
+            connector=connector, conn_timeout=connect_timeout, read_timeout=read_timeout, loop=self.loop
+        )
+
+    def _breaker(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+
+        return breaker
+
+    def _histogram(self, host: str) -> Histogram:
+        histogram = self.latencies.get(host)
+
+        if histogram is None:
+            histogram = self.latencies[host] = Histogram()
+
+        return histogram
+
+    async def _attempt(self, method: str, url: str, host: str, read: str, **kwargs) -> Any:
+        async with self.session.request(method, url, **kwargs) as response:
+            if response.status in RETRY_STATUSES:
+                raise ServerError(host, response.status)
+
+            response.raise_for_status()
+
+            if read == "json":
+                return await response.json()
+            elif read == "text":
+                return await response.text()
+            else:
+                return await response.read()
+
+    async def request(self, method: str, url: str, *, read: str = "json", **kwargs) -> Any:
+        """
+        Make a request and read the response body, retrying if it fails in a way that's worth retrying
+
+        :param method: The HTTP method, e.g. "GET"
+        :param url: The URL to request
+        :param read: How to read the body - "json", "text" or "bytes"
+        :param kwargs: Passed on to `aiohttp.ClientSession.request`, e.g. `params` or `headers`
+        :return: The response body
+        :raises CircuitOpenError: The host has been failing, so no request was made
+        :raises ServerError: The host kept answering with a 429 or 5xx status
+        :raises asyncio.TimeoutError: The request, with its retries, took longer than the total timeout
+        :raises aiohttp.ClientResponseError: The host answered with any other error status, which isn't retried
+        """
+
+        host = urlsplit(url).hostname or ""
+        breaker = self._breaker(host)
+        histogram = self._histogram(host)
+        deadline = self.loop.time() + self.total_timeout
+
+        for attempt in range(self.retries + 1):
+            now = self.loop.time()
+
+            if not breaker.allow(now):
+                raise CircuitOpenError(host)
+
+            try:
+                result = await asyncio.wait_for(
+                    self._attempt(method, url, host, read, **kwargs), deadline - now
+                )
+            except ClientResponseError:
+                # The host is up and gave us a real answer, there's just no point in asking again
+                histogram.record(self.loop.time() - now)
+                breaker.success()
+                raise
+            except (ClientError, ServerError, asyncio.TimeoutError) as e:
+                histogram.record(self.loop.time() - now)
+                breaker.failure(self.loop.time())
+
+                delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+
+                if attempt >= self.retries or self.loop.time() + delay >= deadline:
+                    log.warning(f"{method} {url} failed after {attempt + 1} attempts: {e!r}")
+                    raise
+
+                log.debug("%s %s failed (%r), retrying in %.2fs", method, url, e, delay)
+                await asyncio.sleep(delay)
+            else:
+                histogram.record(self.loop.time() - now)
+                breaker.success()
+                return result
+
+    async def get_json(self, url: str, **kwargs) -> Any:
+        return await self.request("GET", url, read="json", **kwargs)
+
+    async def get_text(self, url: str, **kwargs) -> str:
+        return await self.request("GET", url, read="text", **kwargs)
+
+    async def get_bytes(self, url: str, **kwargs) -> bytes:
+        return await self.request("GET", url, read="bytes", **kwargs)
+
+    @property
+    def stats(self) -> Dict[str, dict]:
+        """
+        Latency summaries and circuit breaker states, by host
+        """
+
+        return {
+            host: {**histogram.summary(), "circuit_open": self._breaker(host).open}
+            for host, histogram in self.latencies.items()
+        }
+
+    def close(self):
+        return self.session.close()
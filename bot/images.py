@@ -0,0 +1,244 @@
+# coding=utf-8
+import asyncio
+import collections
+import hashlib
+import io
+import json
+import logging
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from PIL import Image
+
+try:
+    import fcntl
+except ImportError:  # Windows, where there's only ever one process using the cache in development
+    fcntl = None
+
+from bot.cache import SingleFlight
+from bot.http_client import HTTPClient
+from bot.utils import LRUCache
+
+log = logging.getLogger(__name__)
+
+
+def make_thumbnail(data: bytes, max_size: int, quality: int) -> bytes:
+    """
+    Shrink an image to fit in a `max_size` square and recompress it as a JPEG - this runs in a worker process
+
+    :param data: The original image
+    :param max_size: The largest the width or height can be, in pixels - smaller images aren't enlarged
+    :param quality: The JPEG quality, from 1 to 95
+    :return: The thumbnail
+    """
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        output = io.BytesIO()
+        image.save(output, "JPEG", quality=quality, optimize=True, progressive=True)
+
+    return output.getvalue()
+
+
+class ImageCache:
+    """
+    Downloads images, turns them into thumbnails and keeps them in a content-addressed cache on disk.
+
+    Resizing happens in a pool of worker processes, so the event loop never does any image work. Thumbnails are
+    stored under the SHA-256 of their contents, with an index from source URL to digest, so two URLs for the same
+    picture share a file. Once the cache is over `max_bytes`, the least recently used thumbnails are deleted.
+
+    After a thumbnail has been uploaded to Discord, the attachment's URL can be remembered with `remember_link`, so
+    later messages can link to it instead of uploading it again.
+
+    Cluster workers share the directory, so the index is rewritten under a file lock, merged with whatever the other
+    processes have added to it since.
+    """
+
+    def __init__(self, path: str, http_client: HTTPClient, max_bytes: int = 256 * 1024 * 1024, max_size: int = 512,
+                 quality: int = 85, workers: int = 2, links: int = 1024, loop: asyncio.AbstractEventLoop = None):
+        self.path = path
+        self.http_client = http_client
+        self.max_bytes = max_bytes
+        self.max_size = max_size
+        self.quality = quality
+        self.loop = loop or asyncio.get_event_loop()
+
+        self.links = LRUCache(maxsize=links)
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._writer = ThreadPoolExecutor(max_workers=1)  # One at a time, so index writes can't overlap
+        self._flights = SingleFlight(loop=self.loop)
+
+        self._index_path = os.path.join(path, "index.json")
+        self._lock_path = os.path.join(path, "index.lock")
+        self._urls: Dict[str, str] = {}  # Source URL -> digest
+        self._files = collections.OrderedDict()  # Digest -> size in bytes, least recently used first
+        self.size = 0
+
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    def _file(self, digest: str) -> str:
+        return os.path.join(self.path, digest[:2], f"{digest}.jpg")
+
+    def _load(self):
+        """
+        Find the thumbnails already on disk, oldest first, and read the URL index
+        """
+
+        files = []
+
+        for directory, _, names in os.walk(self.path):
+            for name in names:
+                if name.endswith(".jpg"):
+                    stat = os.stat(os.path.join(directory, name))
+                    files.append((stat.st_mtime, name[:-4], stat.st_size))
+
+        for _, digest, size in sorted(files):
+            self._files[digest] = size
+            self.size += size
+
+        try:
+            with open(self._index_path, encoding="utf-8") as index:
+                self._urls = {url: digest for url, digest in json.load(index).items() if digest in self._files}
+        except (OSError, ValueError):
+            self._urls = {}
+
+        log.debug("Found %d cached images, %d bytes in total", len(self._files), self.size)
+
+    def _store(self, digest: str, data: bytes, urls: Dict[str, str]):
+        """
+        Write a thumbnail, and the index with our entries merged into the one on disk - this runs on a thread
+
+        The index is written to a temporary file that's unique to this process first, so it's never left half-written,
+        and the whole read, merge and replace happens under a lock, so no other process's entries are lost.
+        """
+
+        path = self._file(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, "wb") as file:
+            file.write(data)
+
+        with open(self._lock_path, "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)  # Released when the file is closed
+
+            try:
+                with open(self._index_path, encoding="utf-8") as index:
+                    on_disk = json.load(index)
+            except (OSError, ValueError):
+                on_disk = {}
+
+            # Entries we don't know about are kept as long as their thumbnails haven't been evicted
+            merged = {
+                source: known for source, known in on_disk.items()
+                if source not in urls and os.path.exists(self._file(known))
+            }
+            merged.update(urls)
+
+            temporary = f"{self._index_path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+
+            with open(temporary, "w", encoding="utf-8") as index:
+                json.dump(merged, index)
+
+            os.replace(temporary, self._index_path)
+
+    def _evict(self):
+        # The newest thumbnail is never evicted, since it's about to be used
+        while self.size > self.max_bytes and len(self._files) > 1:
+            digest, size = self._files.popitem(last=False)
+            self.size -= size
+
+            try:
+                os.remove(self._file(digest))
+            except OSError:
+                log.warning("Failed to delete cached image %s", digest)
+
+        # Index entries for deleted files are skipped when it's written, and dropped from memory once they pile up
+        if len(self._urls) > len(self._files) * 2:
+            self._urls = {url: digest for url, digest in self._urls.items() if digest in self._files}
+
+    def cached(self, url: str) -> Optional[str]:
+        """
+        Get the path of the thumbnail for an image URL, if it's cached, without going online
+
+        :param url: The URL of the original image
+        :return: The path of the thumbnail, or None if we don't have it
+        """
+
+        digest = self._urls.get(url)
+
+        if digest is None or digest not in self._files:
+            return None
+
+        self._files.move_to_end(digest)
+        return self._file(digest)
+
+    async def get(self, url: str) -> str:
+        """
+        Get the path of the thumbnail for an image URL, downloading and resizing the image if it isn't cached
+
+        Concurrent calls for the same URL share a single download.
+
+        :param url: The URL of the original image
+        :return: The path of the thumbnail
+        """
+
+        path = self.cached(url)
+
+        if path is not None:
+            return path
+
+        return await self._flights.do(url, lambda: self._fetch(url))
+
+    async def _fetch(self, url: str) -> str:
+        data = await self.http_client.get_bytes(url)
+        thumbnail = await self.loop.run_in_executor(
+            self._executor, make_thumbnail, data, self.max_size, self.quality
+        )
+        digest = hashlib.sha256(thumbnail).hexdigest()
+        log.debug("Made a %d byte thumbnail of %s from %d bytes", len(thumbnail), url, len(data))
+
+        urls = {source: known for source, known in self._urls.items() if known in self._files}
+        urls[url] = digest
+        await self.loop.run_in_executor(self._writer, self._store, digest, thumbnail, urls)
+
+        # Only findable once it's on disk
+        self._urls[url] = digest
+
+        if digest not in self._files:
+            self._files[digest] = len(thumbnail)
+            self.size += len(thumbnail)
+
+        self._evict()
+        return self._file(digest)
+
+    def link(self, url: str) -> Optional[str]:
+        """
+        Get the Discord URL the thumbnail for an image was uploaded to, if we've uploaded it
+        """
+
+        return self.links.get(url)
+
+    def remember_link(self, url: str, link: str):
+        self.links[url] = link
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self._writer.shutdown(wait=True)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "images": len(self._files),
+            "bytes": self.size,
+            "links": len(self.links),
+            "in_flight": len(self._flights)
+        }
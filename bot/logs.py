@@ -0,0 +1,116 @@
+# coding=utf-8
+import atexit
+import json
+import logging
+import queue
+import sys
+from logging import Formatter, Handler, LogRecord, StreamHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import List
+
+TEXT_FORMAT = "%(asctime)s Bot: | %(name)30s | %(levelname)8s | %(message)s"
+DATE_FORMAT = "%b %d %H:%M:%S"
+
+
+class DropOldestQueue(queue.Queue):
+    """
+    A bounded queue that never blocks when it's full - the oldest item is thrown away to make room, and counted
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize)
+        self.dropped = 0
+
+    def put(self, item, block=True, timeout=None):
+        with self.not_full:
+            if 0 < self.maxsize <= self._qsize():
+                self._get()
+                self.dropped += 1
+            else:
+                self.unfinished_tasks += 1
+
+            self._put(item)
+            self.not_empty.notify()
+
+    def put_nowait(self, item):
+        self.put(item, block=False)
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread with as little work as possible on the event loop.
+
+    The message is resolved here, since its arguments could change before the listener gets to it, but the rest of the
+    formatting - timestamps, the exception traceback, JSON - happens on the listener thread.
+    """
+
+    def prepare(self, record: LogRecord) -> LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class JSONFormatter(Formatter):
+    """
+    Formats records as one JSON object per line, for log shippers
+    """
+
+    def format(self, record: LogRecord) -> str:
+        data = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(data)
+
+
+def setup_logging(level: str, log_format: str = "text", path: str = None, queue_size: int = 10000,
+                  max_bytes: int = 0, backups: int = 0) -> QueueListener:
+    """
+    Route all logging through a bounded queue to a background thread, which writes it to stderr and optionally a file
+
+    Whatever the sinks do - a slow terminal, a full pipe, a file rotating - the event loop only ever appends to the
+    queue. If the sinks can't keep up, the oldest records are dropped, and counted in `listener.queue.dropped`.
+
+    :param level: The root log level
+    :param log_format: "text" for the usual format, or "json" for one JSON object per line
+    :param path: Optional, a file to also write the logs to, rotated by size
+    :param queue_size: How many records can be waiting for the listener before the oldest are dropped
+    :param max_bytes: How large the log file can get before it's rotated - 0 never rotates
+    :param backups: How many rotated log files to keep
+    :return: The running listener, which is stopped when the interpreter exits
+    """
+
+    if log_format == "json":
+        formatter = JSONFormatter()
+    else:
+        formatter = Formatter(TEXT_FORMAT, datefmt=DATE_FORMAT)
+
+    handlers: List[Handler] = [StreamHandler(stream=sys.stderr)]
+
+    if path:
+        handlers.append(RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8"))
+
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = DropOldestQueue(queue_size)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+
+    root = logging.getLogger()
+
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+
+    root.addHandler(LazyQueueHandler(log_queue))
+    root.setLevel(level)
+
+    listener.start()
+    atexit.register(listener.stop)  # Flushes whatever is still queued
+
+    return listener
@@ -0,0 +1,160 @@
+# coding=utf-8
+import bisect
+from typing import Dict, List, Tuple
+
+
+def log_buckets(start: float = 0.0001, factor: float = 2, count: int = 24) -> List[float]:
+    """
+    Make a list of bucket upper bounds that grow by `factor` each time - the defaults go from 100µs to about 14 minutes
+    """
+
+    return [start * factor ** i for i in range(count)]
+
+
+DEFAULT_BUCKETS = log_buckets()
+
+
+class Histogram:
+    """
+    A log-bucketed histogram, used for latencies in seconds.
+
+    Recording a value is a binary search and an increment, and memory use is fixed no matter how many values are
+    recorded. Percentiles are only as precise as the buckets, so they're reported as the upper bound of the bucket
+    they fall in.
+    """
+
+    __slots__ = ("bounds", "counts", "count", "total", "min", "max")
+
+    def __init__(self, bounds: List[float] = DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # The last bucket catches everything above the highest bound
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+        if self.min is None or value < self.min:
+            self.min = value
+
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent: float) -> float:
+        """
+        Get the upper bound of the bucket that the given percentile falls in
+
+        :param percent: The percentile, from 0 to 100
+        :return: The bucket's upper bound, or the largest recorded value for the overflow bucket
+        """
+
+        if not self.count:
+            return 0.0
+
+        target = self.count * percent / 100
+        seen = 0
+
+        for index, count in enumerate(self.counts):
+            seen += count
+
+            if seen >= target and count:
+                return self.bounds[index] if index < len(self.bounds) else self.max
+
+        return self.max
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """
+        Get (upper bound, count of values at or below it) pairs, as used by Prometheus - the last bound is infinity
+        """
+
+        result = []
+        seen = 0
+
+        for bound, count in zip(self.bounds + [float("inf")], self.counts):
+            seen += count
+            result.append((bound, seen))
+
+        return result
+
+    def merge(self, other: "Histogram"):
+        """
+        Add the values recorded by another histogram with the same buckets into this one
+        """
+
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+
+        self.count += other.count
+        self.total += other.total
+
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max or 0.0
+        }
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+
+    escaped = (
+        '{0}="{1}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def prometheus_histogram(name: str, help_text: str, histograms: Dict[str, Histogram], label: str) -> List[str]:
+    """
+    Render a family of histograms in the Prometheus text format
+
+    :param name: The metric name, e.g. "bot_command_latency_seconds"
+    :param help_text: A description of the metric
+    :param histograms: The histograms, by the value of their label
+    :param label: The name of the label that tells them apart, e.g. "command"
+    :return: The lines of the metric family
+    """
+
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+
+    for value, histogram in sorted(histograms.items()):
+        for bound, count in histogram.cumulative():
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{_labels({label: value, 'le': le})} {count}")
+
+        lines.append(f"{name}_sum{_labels({label: value})} {histogram.total!r}")
+        lines.append(f"{name}_count{_labels({label: value})} {histogram.count}")
+
+    return lines
+
+
+def prometheus_counter(name: str, help_text: str, counts: Dict[str, int], label: str) -> List[str]:
+    """
+    Render a family of counters in the Prometheus text format, like `prometheus_histogram`
+    """
+
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+
+    for value, count in sorted(counts.items()):
+        lines.append(f"{name}{_labels({label: value})} {count}")
+
+    return lines
@@ -1,11 +1,11 @@
 # coding=utf-8
 import asyncio
 import logging
-from typing import Iterable, Optional
+from typing import AsyncIterable, Dict, Iterable, List, Optional, Set, Tuple, Union
 
-from discord import Embed, Member, Reaction
+from discord import Embed, Member, Message, Reaction
 from discord.abc import User
-from discord.ext.commands import Context, Paginator
+from discord.ext.commands import AutoShardedBot, Context, Paginator
 
 LEFT_EMOJI = "\u2B05"
 RIGHT_EMOJI = "\u27A1"
@@ -14,10 +14,433 @@ FIRST_EMOJI = "\u23EE"
 LAST_EMOJI = "\u23ED"
 
 PAGINATION_EMOJI = [FIRST_EMOJI, LEFT_EMOJI, RIGHT_EMOJI, LAST_EMOJI, DELETE_EMOJI]
+PAGINATION_DEBOUNCE = 0.5  # Seconds after editing a paginated message during which more navigation is batched
 
 log = logging.getLogger(__name__)
 
 
+class PageStream:
+    """
+    Builds the pages of a paginator lazily, from a sync or async iterable of lines.
+
+    Pages are only rendered when they're asked for, plus one page of lookahead so we always know whether there's a
+    next page. Lines are pulled from the iterable as they're needed, so large outputs don't have to be built up front.
+    Only one caller reads lines at a time - async generators can't be advanced concurrently.
+    """
+
+    def __init__(self, paginator: "LinePaginator", lines: Union[Iterable[str], AsyncIterable[str]], empty: bool = True):
+        self.paginator = paginator
+        self.empty = empty
+        self.exhausted = False
+        self._lock = asyncio.Lock()
+
+        if hasattr(lines, "__aiter__"):
+            self._lines = lines.__aiter__()
+            self._async = True
+        else:
+            self._lines = iter(lines)
+            self._async = False
+
+    def __len__(self):
+        """
+        The number of pages rendered so far - this is the total once the stream is exhausted
+        """
+
+        return len(self.paginator._pages)
+
+    @property
+    def total_text(self) -> str:
+        """
+        The total number of pages for display, which is only known once every line has been read
+        """
+
+        return str(len(self)) if self.exhausted else "?"
+
+    async def _next_line(self) -> str:
+        if self._async:
+            return await self._lines.__anext__()
+
+        try:
+            return next(self._lines)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def _fill(self, count: Optional[int] = None):
+        """
+        Read lines until at least `count` pages are rendered, or until we run out of lines if `count` is None
+        """
+
+        async with self._lock:
+            while not self.exhausted and (count is None or len(self) < count):
+                try:
+                    line = await self._next_line()
+                except StopAsyncIteration:
+                    self.exhausted = True
+
+                    if len(self.paginator._current_page) > 1:  # Close the last, partially filled page
+                        self.paginator.close_page()
+
+                    log.debug("Paginator created with %d pages", len(self))
+                    break
+
+                try:
+                    self.paginator.add_line(line, empty=self.empty)
+                except Exception:
+                    log.exception("Failed to add line to paginator: '%s'", line)
+                    raise  # Should propagate
+                else:
+                    log.trace("Added line to paginator: '%s'", line)
+
+    async def get(self, index: int) -> Optional[str]:
+        """
+        Get a page, rendering it (and the one after it) if we haven't yet
+
+        :param index: The zero-based page number
+        :return: The page's content, or None if there's no such page
+        """
+
+        await self._fill(index + 2)
+        return self.paginator._pages[index] if index < len(self) else None
+
+    async def drain(self):
+        """
+        Render every remaining page, e.g. to jump to the last page
+        """
+
+        await self._fill()
+
+
+class PaginationSession:
+    """
+    The state of a single paginated message, which is driven by the `PaginationManager`
+
+    Every page is rendered into its own embed once, and never changed after that. Navigation only moves the target
+    page; the first click edits the message straight away, and anything after it within `debounce` seconds is shown
+    in one edit at the end of that window, to whatever the target is by then, so fast clicking doesn't turn into a
+    burst of edits. Users' reactions are removed in the same batch, and only if we're allowed to - without Manage
+    Messages, they're left alone.
+
+    Every reaction is handled in its own task, so navigation and rendering hold the session's lock - otherwise two
+    quick clicks could both pass the check for a next page.
+    """
+
+    def __init__(self, pages: PageStream, embed: Embed, footer_text: str = None, restrict_to_user: User = None,
+                 timeout: float = 300, debounce: float = PAGINATION_DEBOUNCE):
+        self.pages = pages
+        self.template = embed.to_dict()
+        self.footer_text = footer_text
+        self.restrict_to_user = restrict_to_user
+        self.timeout = timeout
+        self.debounce = debounce
+
+        self.message: Optional[Message] = None
+        self.can_manage_messages = False
+        self.current_page = 0
+        self.shown_page = 0
+        self.deadline = 0.0
+        self.slot: Optional[int] = None
+
+        self._rendered: Dict[int, Embed] = {}
+        self._rendered_total = None
+        self._pending_removals: Dict[Tuple[str, int], User] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._seed_task: Optional[asyncio.Task] = None
+        self._finished = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    def start(self, message: Message):
+        """
+        Attach the session to the message that was sent with its first page
+        """
+
+        self.message = message
+        guild = getattr(message, "guild", None)
+        self.can_manage_messages = (
+            guild is not None and message.channel.permissions_for(guild.me).manage_messages
+        )
+
+    @property
+    def emoji(self) -> List[str]:
+        """
+        The pagination emoji that make sense for this message - first and last page are pointless with two pages
+        """
+
+        if self.pages.exhausted and len(self.pages) <= 2:
+            return [LEFT_EMOJI, RIGHT_EMOJI, DELETE_EMOJI]
+
+        return PAGINATION_EMOJI
+
+    def seed_reactions(self):
+        """
+        Start adding the pagination emoji to the message in the background
+
+        They're added one at a time, in order - reactions on a message share a rate limit bucket, so adding them all at
+        once would only have discord.py queue them up behind 429s.
+        """
+
+        self._seed_task = asyncio.ensure_future(self._seed())
+
+    async def _seed(self):
+        log.debug("Adding emoji reactions to message...")
+
+        for emoji in self.emoji:
+            # Add all the applicable emoji to the message
+            log.trace("Adding reaction: %r", emoji)
+
+            try:
+                await self.message.add_reaction(emoji)
+            except Exception as e:
+                log.warning("Failed to add reaction %r to paginated message %s: %r", emoji, self.message.id, e)
+                return
+
+    async def render(self, index: int) -> Embed:
+        """
+        Get the embed for a page, rendering it the first time it's needed
+        """
+
+        if self._rendered_total != self.pages.total_text:
+            # The footers we've rendered so far show an out of date page count
+            self._rendered.clear()
+            self._rendered_total = self.pages.total_text
+
+        embed = self._rendered.get(index)
+
+        if embed is None:
+            embed = Embed.from_data(self.template)
+            embed.description = await self.pages.get(index)
+
+            if self.footer_text:
+                embed.set_footer(text=f"{self.footer_text} (Page {index + 1}/{self.pages.total_text})")
+            else:
+                embed.set_footer(text=f"Page {index + 1}/{self.pages.total_text}")
+
+            self._rendered[index] = embed
+
+        return embed
+
+    def allows(self, user: User) -> bool:
+        """
+        Check whether a user may operate this paginator
+        """
+
+        return (
+            # Pagination is not restricted
+            not self.restrict_to_user
+            # The reaction was by a whitelisted user
+            or user.id == self.restrict_to_user.id
+        )
+
+    async def handle(self, emoji: str, user: User):
+        """
+        Change page, or finish, in response to a pagination reaction
+        """
+
+        if emoji == DELETE_EMOJI:
+            log.debug("Got delete reaction")
+            self.finish()
+            return
+
+        if self.can_manage_messages:
+            self._pending_removals[(emoji, user.id)] = user
+            self._schedule_flush()
+
+        async with self._lock:
+            if await self._navigate(emoji):
+                self._schedule_flush()
+
+    async def _navigate(self, emoji: str) -> bool:
+        """
+        Move the target page for a navigation emoji - this must only be called while holding the lock
+
+        :return: Whether the target page may have changed
+        """
+
+        if emoji == FIRST_EMOJI:
+            self.current_page = 0
+            log.debug("Got first page reaction - changing to page 1/%s", self.pages.total_text)
+
+        if emoji == LAST_EMOJI:
+            await self.pages.drain()
+            self.current_page = len(self.pages) - 1
+            log.debug("Got last page reaction - changing to page %d/%s", self.current_page + 1, self.pages.total_text)
+
+        if emoji == LEFT_EMOJI:
+            if self.current_page <= 0:
+                log.debug("Got previous page reaction, but we're on the first page - ignoring")
+                return False
+
+            self.current_page -= 1
+            log.debug("Got previous page reaction - changing to page %d/%s",
+                      self.current_page + 1, self.pages.total_text)
+
+        if emoji == RIGHT_EMOJI:
+            if await self.pages.get(self.current_page + 1) is None:
+                log.debug("Got next page reaction, but we're on the last page - ignoring")
+                return False
+
+            self.current_page += 1
+            log.debug("Got next page reaction - changing to page %d/%s", self.current_page + 1, self.pages.total_text)
+
+        return True
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._flush())
+
+    async def _flush(self):
+        """
+        Show the target page and remove the reactions users have added, then do it again at most once per debounce
+        window for as long as more navigation comes in
+        """
+
+        while not self.finished and (self.shown_page != self.current_page or self._pending_removals):
+            removals, self._pending_removals = self._pending_removals, {}
+            requests = [self.message.remove_reaction(emoji, user) for (emoji, _), user in removals.items()]
+
+            async with self._lock:
+                if self.shown_page != self.current_page:
+                    target = self.current_page
+                    log.trace("Showing page %d", target + 1)
+                    requests.append(self.message.edit(embed=await self.render(target)))
+                    self.shown_page = target
+
+            results = await asyncio.gather(*requests, return_exceptions=True)
+
+            for result in results:
+                if isinstance(result, Exception):
+                    log.warning("Failed to update paginated message %s: %r", self.message.id, result)
+
+            # Navigation during the window is left for the next pass, since this task is still running
+            await asyncio.sleep(self.debounce)
+
+    def finish(self):
+        for task in (self._flush_task, self._seed_task):
+            if task is not None:
+                task.cancel()
+
+        self._finished.set()
+
+    @property
+    def finished(self) -> bool:
+        return self._finished.is_set()
+
+    async def wait(self):
+        await self._finished.wait()
+
+
+class PaginationManager:
+    """
+    Dispatches reactions to every open paginated message from a single `on_reaction_add` listener.
+
+    Sessions are looked up by message ID, so the cost of a reaction doesn't grow with the number of open paginators.
+    Timeouts are kept on a hashed timer wheel: each tick only looks at the sessions in one slot, and a session whose
+    deadline has been pushed back since it was put there is simply left for a later pass.
+    """
+
+    def __init__(self, bot: AutoShardedBot, tick: float = 1, slots: int = 64):
+        self.bot = bot
+        self.tick = tick
+        self.sessions: Dict[int, PaginationSession] = {}
+
+        self._wheel: List[Set[int]] = [set() for _ in range(slots)]
+        self._ticker = None
+
+        bot.add_listener(self.on_reaction_add)
+
+    @classmethod
+    def for_bot(cls, bot: AutoShardedBot) -> "PaginationManager":
+        """
+        Get the bot's pagination manager, creating it the first time it's needed
+        """
+
+        manager = getattr(bot, "pagination_manager", None)
+
+        if manager is None:
+            manager = bot.pagination_manager = cls(bot)
+
+        return manager
+
+    def _slot(self, deadline: float) -> int:
+        # The first tick that starts after the deadline, so the session has always expired by the time it's checked
+        return (int(deadline // self.tick) + 1) % len(self._wheel)
+
+    def schedule(self, session: PaginationSession):
+        """
+        Push a session's timeout back, from now
+        """
+
+        session.deadline = self.bot.loop.time() + session.timeout
+        slot = self._slot(session.deadline)
+
+        if slot != session.slot:
+            if session.slot is not None:
+                self._wheel[session.slot].discard(session.message.id)
+
+            self._wheel[slot].add(session.message.id)
+            session.slot = slot
+
+    def add(self, session: PaginationSession):
+        self.sessions[session.message.id] = session
+        self.schedule(session)
+
+        if self._ticker is None or self._ticker.done():
+            self._ticker = self.bot.loop.create_task(self._run_wheel())
+
+    def remove(self, session: PaginationSession):
+        self.sessions.pop(session.message.id, None)
+
+        if session.slot is not None:
+            self._wheel[session.slot].discard(session.message.id)
+            session.slot = None
+
+    async def _run_wheel(self):
+        last_tick = int(self.bot.loop.time() // self.tick)
+
+        while self.sessions:
+            await asyncio.sleep(self.tick)
+
+            now = self.bot.loop.time()
+            current_tick = int(now // self.tick)
+
+            # If the loop was busy and we slept for more than one tick, catch up on every slot we skipped
+            for tick in range(max(last_tick + 1, current_tick - len(self._wheel) + 1), current_tick + 1):
+                slot = self._wheel[tick % len(self._wheel)]
+
+                for message_id in list(slot):
+                    session = self.sessions.get(message_id)
+
+                    if session is None:
+                        slot.discard(message_id)
+                    elif session.deadline <= now:
+                        log.debug("Timed out waiting for a reaction")
+                        self.remove(session)
+                        session.finish()  # We're done, no reactions for the whole timeout
+
+            last_tick = current_tick
+
+    async def on_reaction_add(self, reaction: Reaction, user: Member):
+        session = self.sessions.get(reaction.message.id)
+
+        if (
+            # Conditions for a successful pagination:
+            session is None
+            # Reaction is one of the pagination emotes
+            or reaction.emoji not in PAGINATION_EMOJI
+            # Reaction was not made by the Bot
+            or user.id == self.bot.user.id
+            # There were no restrictions
+            or not session.allows(user)
+        ):
+            return
+
+        log.trace("Got reaction: %s", reaction)
+        self.schedule(session)
+        await session.handle(reaction.emoji, user)
+
+        if session.finished:
+            self.remove(session)
+
+
 class LinePaginator(Paginator):
     """
     A class that aids in paginating code blocks for Discord messages.
@@ -94,7 +517,7 @@ class LinePaginator(Paginator):
             self._count += 1
 
     @classmethod
-    async def paginate(cls, lines: Iterable[str], ctx: Context, embed: Embed,
+    async def paginate(cls, lines: Union[Iterable[str], AsyncIterable[str]], ctx: Context, embed: Embed,
                        prefix: str = "", suffix: str = "", max_lines: Optional[int] = None, max_size: int = 500,
                        empty: bool = True, restrict_to_user: User = None, timeout: int=300,
                        footer_text: str = None):
@@ -104,13 +527,15 @@ class LinePaginator(Paginator):
         When used, this will send a message using `ctx.send()` and apply a set of reactions to it. These reactions may
         be used to change page, or to remove pagination from the message. Pagination will also be removed automatically
         if no reaction is added for five minutes (300 seconds).
+        Pages are built lazily as they're visited, so the first page is sent as soon as it's full, and `lines` may be
+        an async iterable too. The total page count is shown as "?" until every line has been read.
         >>> embed = Embed()
         >>> embed.set_author(name="Some Operation", url=url, icon_url=icon)
         >>> await LinePaginator.paginate(
         ...     (line for line in lines),
         ...     ctx, embed
         ... )
-        :param lines: The lines to be paginated
+        :param lines: The lines to be paginated, as a sync or async iterable
         :param ctx: Current context object
         :param embed: A pre-configured embed to be used as a template for each page
         :param prefix: Text to place before each page
@@ -123,148 +548,41 @@ class LinePaginator(Paginator):
         :param footer_text: Text to prefix the page number in the footer with
         """
 
-        def event_check(reaction_: Reaction, user_: Member):
-            """
-            Make sure that this reaction is what we want to operate on
-            """
-
-            no_restrictions = (
-                # Pagination is not restricted
-                not restrict_to_user or
-                # The reaction was by a whitelisted user
-                user_.id == restrict_to_user.id
-            )
-
-            return (
-                # Conditions for a successful pagination:
-                all((
-                    # Reaction is on this message
-                    reaction_.message.id == message.id,
-                    # Reaction is one of the pagination emotes
-                    reaction_.emoji in PAGINATION_EMOJI,
-                    # Reaction was not made by the Bot
-                    user_.id != ctx.bot.user.id,
-                    # There were no restrictions
-                    no_restrictions
-                ))
-            )
-
         paginator = cls(prefix=prefix, suffix=suffix, max_size=max_size, max_lines=max_lines)
-        current_page = 0
-
-        for line in lines:
-            try:
-                paginator.add_line(line, empty=empty)
-            except Exception:
-                log.exception(f"Failed to add line to paginator: '{line}'")
-                raise  # Should propagate
-            else:
-                log.trace(f"Added line to paginator: '{line}'")
+        pages = PageStream(paginator, lines, empty=empty)
 
-        log.debug(f"Paginator created with {len(paginator.pages)} pages")
+        # Rendering page 1 also renders page 2, so we know straight away whether we need to paginate at all
+        first_page = await pages.get(0) or ""
 
-        embed.description = paginator.pages[current_page]
+        if len(pages) <= 1:
+            embed.description = first_page
 
-        if len(paginator.pages) <= 1:
             if footer_text:
                 embed.set_footer(text=footer_text)
-                log.trace(f"Setting embed footer to '{footer_text}'")
+                log.trace("Setting embed footer to '%s'", footer_text)
 
             log.debug("There's less than two pages, so we won't paginate - sending single page on its own")
             return await ctx.send(embed=embed)
-        else:
-            if footer_text:
-                embed.set_footer(text=f"{footer_text} (Page {current_page + 1}/{len(paginator.pages)})")
-            else:
-                embed.set_footer(text=f"Page {current_page + 1}/{len(paginator.pages)}")
-
-            log.trace(f"Setting embed footer to '{embed.footer.text}'")
-
-            log.debug("Sending first page to channel...")
-            message = await ctx.send(embed=embed)
-
-        log.debug("Adding emoji reactions to message...")
-
-        for emoji in PAGINATION_EMOJI:
-            # Add all the applicable emoji to the message
-            log.trace(f"Adding reaction: {repr(emoji)}")
-            await message.add_reaction(emoji)
-
-        while True:
-            try:
-                reaction, user = await ctx.bot.wait_for("reaction_add", timeout=timeout, check=event_check)
-                log.trace(f"Got reaction: {reaction}")
-            except asyncio.TimeoutError:
-                log.debug("Timed out waiting for a reaction")
-                break  # We're done, no reactions for the last 5 minutes
 
-            if reaction.emoji == DELETE_EMOJI:
-                log.debug("Got delete reaction")
-                break
+        session = PaginationSession(pages, embed, footer_text=footer_text, restrict_to_user=restrict_to_user,
+                                    timeout=timeout)
+        first_embed = await session.render(0)
+        log.trace("Setting embed footer to '%s'", first_embed.footer.text)
 
-            if reaction.emoji == FIRST_EMOJI:
-                await message.remove_reaction(reaction.emoji, user)
-                current_page = 0
+        log.debug("Sending first page to channel...")
+        session.start(await ctx.send(embed=first_embed))
+        PaginationManager.for_bot(ctx.bot).add(session)
 
-                log.debug(f"Got first page reaction - changing to page 1/{len(paginator.pages)}")
+        # Reactions are added in the background, and navigation works as soon as the first one is there
+        session.seed_reactions()
+        await session.wait()
 
-                embed.description = paginator.pages[current_page]
-                if footer_text:
-                    embed.set_footer(text=f"{footer_text} (Page {current_page + 1}/{len(paginator.pages)})")
-                else:
-                    embed.set_footer(text=f"Page {current_page + 1}/{len(paginator.pages)}")
-                await message.edit(embed=embed)
-
-            if reaction.emoji == LAST_EMOJI:
-                await message.remove_reaction(reaction.emoji, user)
-                current_page = len(paginator.pages) - 1
-
-                log.debug(f"Got last page reaction - changing to page {current_page + 1}/{len(paginator.pages)}")
-
-                embed.description = paginator.pages[current_page]
-                if footer_text:
-                    embed.set_footer(text=f"{footer_text} (Page {current_page + 1}/{len(paginator.pages)})")
-                else:
-                    embed.set_footer(text=f"Page {current_page + 1}/{len(paginator.pages)}")
-                await message.edit(embed=embed)
-
-            if reaction.emoji == LEFT_EMOJI:
-                await message.remove_reaction(reaction.emoji, user)
-
-                if current_page <= 0:
-                    log.debug("Got previous page reaction, but we're on the first page - ignoring")
-                    continue
-
-                current_page -= 1
-                log.debug(f"Got previous page reaction - changing to page {current_page + 1}/{len(paginator.pages)}")
-
-                embed.description = paginator.pages[current_page]
-
-                if footer_text:
-                    embed.set_footer(text=f"{footer_text} (Page {current_page + 1}/{len(paginator.pages)})")
-                else:
-                    embed.set_footer(text=f"Page {current_page + 1}/{len(paginator.pages)}")
-
-                await message.edit(embed=embed)
-
-            if reaction.emoji == RIGHT_EMOJI:
-                await message.remove_reaction(reaction.emoji, user)
-
-                if current_page >= len(paginator.pages) - 1:
-                    log.debug("Got next page reaction, but we're on the last page - ignoring")
-                    continue
-
-                current_page += 1
-                log.debug(f"Got next page reaction - changing to page {current_page + 1}/{len(paginator.pages)}")
-
-                embed.description = paginator.pages[current_page]
-
-                if footer_text:
-                    embed.set_footer(text=f"{footer_text} (Page {current_page + 1}/{len(paginator.pages)})")
-                else:
-                    embed.set_footer(text=f"Page {current_page + 1}/{len(paginator.pages)}")
-
-                await message.edit(embed=embed)
-
-        log.debug("Ending pagination and removing all reactions...")
-        await message.clear_reactions()
+        if session.can_manage_messages:
+            log.debug("Ending pagination and removing all reactions...")
+            await session.message.clear_reactions()
+        else:
+            log.debug("Ending pagination and removing our own reactions, since we can't remove anyone else's...")
+            await asyncio.gather(
+                *(session.message.remove_reaction(emoji, ctx.me) for emoji in session.emoji),
+                return_exceptions=True
+            )
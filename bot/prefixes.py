@@ -0,0 +1,88 @@
+# coding=utf-8
+import logging
+from typing import Callable, Dict, List, Optional
+
+from discord import Message
+from discord.ext.commands import AutoShardedBot, when_mentioned
+
+log = logging.getLogger(__name__)
+
+
+class _Node:
+    __slots__ = ("children", "prefix", "priority")
+
+    def __init__(self):
+        self.children: Dict[str, _Node] = {}
+        self.prefix: Optional[str] = None
+        self.priority: Optional[int] = None
+
+
+class PrefixTrie:
+    """
+    A trie over case-folded command prefixes, built once at startup.
+
+    Matching walks the message one character at a time and stops as soon as no prefix can match any more, so only
+    the first few characters of a message are ever looked at. When more than one prefix matches, the one that was
+    given first wins - this is the same "order matters" rule as `when_mentioned_or`.
+    """
+
+    def __init__(self, *prefixes: str):
+        self._root = _Node()
+        self.prefixes = tuple(prefixes)
+
+        for priority, prefix in enumerate(self.prefixes):
+            node = self._root
+
+            for char in prefix.lower():
+                node = node.children.setdefault(char, _Node())
+
+            if node.priority is None:  # Keep the earliest definition of a duplicate prefix
+                node.prefix = prefix.lower()
+                node.priority = priority
+
+    def match(self, content: str, start: int = 0) -> Optional[str]:
+        """
+        Find the prefix that the given message content starts with, ignoring case
+
+        :param content: The message content to check
+        :param start: The index in the content to start matching from
+        :return: The matched prefix, in the case-folded form expected by our `StringView.skip_string`, or None
+        """
+
+        node = self._root
+        best = None
+        best_priority = None
+
+        for index in range(start, len(content)):
+            node = node.children.get(content[index].lower())
+
+            if node is None:
+                break
+
+            if node.priority is not None and (best_priority is None or node.priority < best_priority):
+                best = node.prefix
+                best_priority = node.priority
+
+        return best
+
+
+def when_mentioned_or_trie(*prefixes: str) -> Callable[[AutoShardedBot, Message], List[str]]:
+    """
+    A drop-in replacement for `when_mentioned_or`, which resolves the prefix with a `PrefixTrie` instead of
+    having discord.py try every prefix against the message in turn.
+
+    The returned list only ever contains the mention prefixes and, at most, the single prefix that matched.
+    """
+
+    trie = PrefixTrie(*prefixes)
+
+    def inner(bot: AutoShardedBot, message: Message) -> List[str]:
+        result = when_mentioned(bot, message)
+        prefix = trie.match(message.content)
+
+        if prefix is not None:
+            result.append(prefix)
+
+        return result
+
+    return inner
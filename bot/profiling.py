@@ -0,0 +1,147 @@
+# coding=utf-8
+"""
+Startup profiling: how long every module took to import, and every extension to load.
+
+This is like `python -X importtime`, which Python 3.6 doesn't have. The profiler sits at the front of `sys.meta_path`,
+finds each module's spec using the finders behind it, and times the spec's loader.
+
+Importing this module installs the profiler, so it has to happen before anything worth measuring is imported - which
+is why `run.py` and `bot/__init__.py` import it first thing. It's uninstalled once the bot is ready.
+"""
+import sys
+import threading
+import time
+from importlib.abc import MetaPathFinder
+from typing import Dict, List
+
+
+class _TimedLoader:
+    """
+    Stands in for a module's loader just long enough to time it, then puts the real loader back on the module
+    """
+
+    def __init__(self, loader, profiler: "ImportProfiler"):
+        self.loader = loader
+        self.profiler = profiler
+
+    def create_module(self, spec):
+        create_module = getattr(self.loader, "create_module", None)
+
+        if create_module is None:
+            return None
+
+        # Extension modules do most of their work here
+        self.profiler._enter()
+        try:
+            return create_module(spec)
+        finally:
+            self.profiler._exit(spec.name)
+
+    def exec_module(self, module):
+        module.__loader__ = self.loader
+
+        if module.__spec__ is not None:
+            module.__spec__.loader = self.loader
+
+        self.profiler._enter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.profiler._exit(module.__name__)
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+class ImportProfiler(MetaPathFinder):
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0  # Time spent in top-level imports, so nested imports aren't counted twice
+
+        self.cumulative: Dict[str, float] = {}  # Module name -> seconds, including the modules it imported
+        self.own: Dict[str, float] = {}  # Module name -> seconds, not including the modules it imported
+        self.extensions: Dict[str, float] = {}  # Extension name -> seconds to import and set up
+
+        self._local = threading.local()
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            find_spec = getattr(finder, "find_spec", None)
+
+            if finder is self or find_spec is None:
+                continue
+
+            spec = find_spec(fullname, path, target)
+
+            if spec is not None:
+                break
+        else:
+            return None  # Let the import system carry on, in case a finder without find_spec knows about it
+
+        if hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, self)
+
+        return spec
+
+    def _stack(self) -> List[list]:
+        stack = getattr(self._local, "stack", None)
+
+        if stack is None:
+            stack = self._local.stack = []
+
+        return stack
+
+    def _enter(self):
+        # Each frame is [when this import started, time spent in the imports nested inside it]
+        self._stack().append([time.perf_counter(), 0.0])
+
+    def _exit(self, name: str):
+        stack = self._stack()
+        started, nested = stack.pop()
+        elapsed = time.perf_counter() - started
+
+        self.cumulative[name] = self.cumulative.get(name, 0.0) + elapsed
+        self.own[name] = self.own.get(name, 0.0) + elapsed - nested
+
+        if stack:
+            stack[-1][1] += elapsed
+        else:
+            self.total += elapsed
+
+    def report(self, limit: int = 10) -> List[str]:
+        """
+        Summarize startup: total import time, the slowest modules by their own import time, and every extension
+
+        :param limit: How many of the slowest modules to list
+        :return: The lines of the report
+        """
+
+        lines = [
+            f"Ready {time.perf_counter() - self.started:.2f}s after startup, "
+            f"{self.total:.2f}s of it importing {len(self.own)} modules"
+        ]
+
+        slowest = sorted(self.own.items(), key=lambda item: item[1], reverse=True)[:limit]
+        lines.append(f"Slowest {len(slowest)} imports (own time / including nested imports):")
+
+        for name, own in slowest:
+            lines.append(f"    {name:<50} {own * 1000:>8.1f}ms / {self.cumulative[name] * 1000:>8.1f}ms")
+
+        lines.append("Extensions (import and setup):")
+
+        for name, elapsed in self.extensions.items():
+            lines.append(f"    {name:<50} {elapsed * 1000:>8.1f}ms")
+
+        return lines
+
+
+profiler = ImportProfiler()
+profiler.install()
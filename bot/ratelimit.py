@@ -0,0 +1,174 @@
+# coding=utf-8
+import logging
+from array import array
+from typing import Dict, Hashable, Tuple
+
+from discord.ext.commands import CheckFailure
+
+log = logging.getLogger(__name__)
+
+
+class RateLimited(CheckFailure):
+    """
+    Raised by the rate limit check when a command is used too often
+    """
+
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(f"Rate limited by {scope}, try again in {retry_after:.1f}s")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class TokenBuckets:
+    """
+    A token bucket for every key, all stored in two flat arrays of floats.
+
+    Each key gets a slot in the arrays, holding its token count and when that was last worked out. Buckets are refilled
+    lazily, from the time that's passed, whenever they're looked at - so there are no timers. A bucket that has filled
+    back up is no different from a new one, so `sweep` frees those slots for reuse.
+
+    :param rate: Tokens added per second
+    :param capacity: The most tokens a bucket can hold, which is also how many uses can happen in a burst
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+
+        self._slots: Dict[Hashable, int] = {}
+        self._tokens = array("d")
+        self._updated = array("d")
+        self._free = array("L")
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _available(self, slot: int, now: float) -> float:
+        return min(self.capacity, self._tokens[slot] + (now - self._updated[slot]) * self.rate)
+
+    def wait_time(self, key: Hashable, now: float, cost: float = 1) -> float:
+        """
+        Get how long until `cost` tokens are available for a key, without taking them
+
+        :return: Seconds to wait, or 0 if there are enough now
+        """
+
+        slot = self._slots.get(key)
+
+        if slot is None:
+            available = self.capacity
+        else:
+            available = self._available(slot, now)
+
+        return 0.0 if available >= cost else (cost - available) / self.rate
+
+    def take(self, key: Hashable, now: float, cost: float = 1):
+        """
+        Take tokens from a key's bucket - check `wait_time` first, since this will take the bucket below zero
+        """
+
+        slot = self._slots.get(key)
+
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+                self._tokens[slot] = self.capacity - cost
+                self._updated[slot] = now
+            else:
+                slot = len(self._tokens)
+                self._tokens.append(self.capacity - cost)
+                self._updated.append(now)
+
+            self._slots[key] = slot
+            return
+
+        self._tokens[slot] = self._available(slot, now) - cost
+        self._updated[slot] = now
+
+    def sweep(self, now: float) -> int:
+        """
+        Forget every key whose bucket has filled back up, and compact the arrays if most of their slots are free
+
+        :return: How many keys were forgotten
+        """
+
+        full = [
+            key for key, slot in self._slots.items()
+            if self._tokens[slot] + (now - self._updated[slot]) * self.rate >= self.capacity
+        ]
+
+        for key in full:
+            self._free.append(self._slots.pop(key))
+
+        if len(self._free) > len(self._slots):
+            self._compact()
+
+        return len(full)
+
+    def _compact(self):
+        tokens = array("d")
+        updated = array("d")
+
+        for key, slot in self._slots.items():
+            self._slots[key] = len(tokens)
+            tokens.append(self._tokens[slot])
+            updated.append(self._updated[slot])
+
+        self._tokens = tokens
+        self._updated = updated
+        self._free = array("L")
+
+
+def worker_share(limit: Tuple[float, float], workers: int) -> Tuple[float, float]:
+    """
+    Split a (rate, capacity) limit evenly between cluster workers, so that together they stay within it
+
+    Every worker keeps at least one token of capacity, so a command can't be locked out of a worker altogether.
+    """
+
+    rate, capacity = limit
+    return rate / workers, max(1.0, capacity / workers)
+
+
+class RateLimiter:
+    """
+    Token buckets per user, per channel and per command - a use has to fit in all three to go ahead.
+
+    Each scope is a (rate, capacity) tuple, see `TokenBuckets`.
+
+    The buckets live in this process. Under a cluster, each worker only sees its own shards: a channel belongs to one
+    guild, so its limit holds as it is, but a user's limit applies separately in every worker they use commands in,
+    and a command's limit has to be split between the workers with `worker_share` to hold for the whole bot.
+    """
+
+    def __init__(self, user: Tuple[float, float], channel: Tuple[float, float], command: Tuple[float, float]):
+        self.users = TokenBuckets(*user)
+        self.channels = TokenBuckets(*channel)
+        self.commands = TokenBuckets(*command)
+
+    def check(self, user_id: int, channel_id: int, command: str, now: float):
+        """
+        Take a token from each of the buckets for a use, if they all have one to spare
+
+        :raises RateLimited: One of the buckets is empty - no tokens are taken from any of them
+        """
+
+        for scope, buckets, key in (
+            ("user", self.users, user_id), ("channel", self.channels, channel_id), ("command", self.commands, command)
+        ):
+            retry_after = buckets.wait_time(key, now)
+
+            if retry_after:
+                raise RateLimited(scope, retry_after)
+
+        self.users.take(user_id, now)
+        self.channels.take(channel_id, now)
+        self.commands.take(command, now)
+
+    def sweep(self, now: float) -> int:
+        forgotten = self.users.sweep(now) + self.channels.sweep(now) + self.commands.sweep(now)
+        log.debug("Swept %d idle rate limit buckets, %d left", forgotten, len(self))
+        return forgotten
+
+    def __len__(self):
+        return len(self.users) + len(self.channels) + len(self.commands)
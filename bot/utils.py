@@ -1,47 +1,154 @@
 # coding=utf-8
+from collections import OrderedDict
 
 
 class CaseInsensitiveDict(dict):
     """
-    We found this class on StackOverflow. Thanks to m000 for writing it!
+    A dict with case-insensitive string keys, which are case-folded so that Unicode names compare properly too.
 
-    https://stackoverflow.com/a/32888599/4022104
-    """
+    The original keys are remembered, for displaying - see `original_key` and `original_keys`. Keys are folded inline
+    and stored with direct `dict` calls, and `update` folds everything in one pass without building temporary dicts.
 
-    @classmethod
-    def _k(cls, key):
-        return key.lower() if isinstance(key, str) else key
+    Originally based on a StackOverflow answer by m000: https://stackoverflow.com/a/32888599/4022104
+    """
 
     def __init__(self, *args, **kwargs):
-        super(CaseInsensitiveDict, self).__init__(*args, **kwargs)
-        self._convert_keys()
+        super().__init__()
+        self._original = {}
+        self.update(*args, **kwargs)
 
     def __getitem__(self, key):
-        return super(CaseInsensitiveDict, self).__getitem__(self.__class__._k(key))
+        return dict.__getitem__(self, key.casefold() if isinstance(key, str) else key)
 
     def __setitem__(self, key, value):
-        super(CaseInsensitiveDict, self).__setitem__(self.__class__._k(key), value)
+        folded = key.casefold() if isinstance(key, str) else key
+        dict.__setitem__(self, folded, value)
+        self._original[folded] = key
 
     def __delitem__(self, key):
-        return super(CaseInsensitiveDict, self).__delitem__(self.__class__._k(key))
+        folded = key.casefold() if isinstance(key, str) else key
+        dict.__delitem__(self, folded)
+        del self._original[folded]
 
     def __contains__(self, key):
-        return super(CaseInsensitiveDict, self).__contains__(self.__class__._k(key))
+        return dict.__contains__(self, key.casefold() if isinstance(key, str) else key)
+
+    def get(self, key, default=None):
+        return dict.get(self, key.casefold() if isinstance(key, str) else key, default)
+
+    def pop(self, key, *args):
+        folded = key.casefold() if isinstance(key, str) else key
+        self._original.pop(folded, None)
+        return dict.pop(self, folded, *args)
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        return self._original.pop(key), value
+
+    def setdefault(self, key, default=None):
+        folded = key.casefold() if isinstance(key, str) else key
+
+        if not dict.__contains__(self, folded):
+            self._original[folded] = key
+
+        return dict.setdefault(self, folded, default)
+
+    def clear(self):
+        dict.clear(self)
+        self._original.clear()
+
+    def _fold_items(self, items):
+        original = self._original
+
+        for key, value in items:
+            folded = key.casefold() if isinstance(key, str) else key
+            original[folded] = key
+            yield folded, value
+
+    def update(self, other=(), **kwargs):
+        if isinstance(other, CaseInsensitiveDict):
+            dict.update(self, other)
+            self._original.update(other._original)
+        elif hasattr(other, "keys"):
+            dict.update(self, self._fold_items((key, other[key]) for key in other.keys()))
+        else:
+            dict.update(self, self._fold_items(other))
+
+        if kwargs:
+            dict.update(self, self._fold_items(kwargs.items()))
+
+    def copy(self):
+        return type(self)(self)
+
+    @classmethod
+    def fromkeys(cls, keys, value=None):
+        return cls((key, value) for key in keys)
+
+    def original_key(self, key):
+        """
+        Get a key the way it was written when it was stored
+        """
 
-    def pop(self, key, *args, **kwargs):
-        return super(CaseInsensitiveDict, self).pop(self.__class__._k(key), *args, **kwargs)
+        return self._original[key.casefold() if isinstance(key, str) else key]
+
+    def original_keys(self):
+        return self._original.values()
+
+    def __reduce__(self):
+        # Rebuilt from the original keys, since the default would set the items before _original exists
+        return type(self), ([(self._original[key], value) for key, value in dict.items(self)],)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict.__repr__(self)})"
+
+
+class LRUCache:
+    """
+    A bounded mapping that evicts the least recently used entry once it grows past `maxsize`
+
+    Hits and misses on `get` are counted, so callers can report how well the cache is doing.
+    """
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data
 
-    def get(self, key, *args, **kwargs):
-        return super(CaseInsensitiveDict, self).get(self.__class__._k(key), *args, **kwargs)
+    def __len__(self):
+        return len(self._data)
 
-    def setdefault(self, key, *args, **kwargs):
-        return super(CaseInsensitiveDict, self).setdefault(self.__class__._k(key), *args, **kwargs)
+    def pop(self, key, *args):
+        return self._data.pop(key, *args)
 
-    def update(self, E=None, **F):
-        super(CaseInsensitiveDict, self).update(self.__class__(E))
-        super(CaseInsensitiveDict, self).update(self.__class__(**F))
+    def clear(self):
+        self._data.clear()
 
-    def _convert_keys(self):
-        for k in list(self.keys()):
-            v = super(CaseInsensitiveDict, self).pop(k)
-            self.__setitem__(k, v)
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
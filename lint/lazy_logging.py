@@ -0,0 +1,43 @@
+# coding=utf-8
+"""
+A flake8 plugin that keeps trace and debug log calls lazy.
+
+Those levels are usually disabled, but an f-string, `.format()` or `%` in the message is built before the logger ever
+gets to check that - so pass the values as arguments instead, and let logging format them only when it needs to.
+"""
+import ast
+
+LAZY_LEVELS = frozenset(("trace", "debug"))
+
+MESSAGE = "L001 eager string formatting in a {0} log call, pass the values as arguments instead"
+
+
+def _is_eager(node: ast.AST) -> bool:
+    if isinstance(node, ast.JoinedStr):
+        return any(isinstance(value, ast.FormattedValue) for value in node.values)
+
+    if isinstance(node, ast.BinOp):
+        return isinstance(node.op, (ast.Mod, ast.Add))
+
+    if isinstance(node, ast.Call):
+        return isinstance(node.func, ast.Attribute) and node.func.attr == "format"
+
+    return False
+
+
+class LazyLoggingChecker:
+    name = "lazy-logging"
+    version = "1.0.0"
+
+    def __init__(self, tree: ast.AST):
+        self.tree = tree
+
+    def run(self):
+        for node in ast.walk(self.tree):
+            if not isinstance(node, ast.Call) or not isinstance(node.func, ast.Attribute) or not node.args:
+                continue
+
+            level = node.func.attr
+
+            if level in LAZY_LEVELS and _is_eager(node.args[0]):
+                yield node.lineno, node.col_offset, MESSAGE.format(level), type(self)
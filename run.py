@@ -1,40 +1,110 @@
 # coding=utf-8
-import os
+# Installs the import profiler, so this has to come before everything else - including discord.py and aiohttp
+from bot import profiling  # noqa: F401, I100
 
-from aiohttp import AsyncResolver, ClientSession, TCPConnector
+import os  # noqa: I100
 
 from discord import Game
-from discord.ext.commands import AutoShardedBot, when_mentioned_or
+from discord.ext.commands import AutoShardedBot
 
+from bot.cache_policy import CachePolicy
+from bot.cluster import Cluster, ClusterClient
+from bot.constants import (
+    CACHE_FETCH_OFFLINE_MEMBERS, CACHE_MAX_MESSAGES, CACHE_MEMBERS, CLUSTER_OUTBOX_SIZE, CLUSTER_RESTART_BACKOFF,
+    CLUSTER_RESTART_MAX_BACKOFF, CLUSTER_STABLE_UPTIME, CLUSTER_STATS_INTERVAL, EXTENSIONS, HTTP_BREAKER_COOLDOWN,
+    HTTP_BREAKER_THRESHOLD, HTTP_CONNECTION_LIMIT, HTTP_CONNECTION_LIMIT_PER_HOST, HTTP_CONNECT_TIMEOUT, HTTP_DNS_TTL,
+    HTTP_KEEPALIVE_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_RETRIES, HTTP_RETRY_BACKOFF, HTTP_TOTAL_TIMEOUT, LAZY_EXTENSIONS
+)
+from bot.extensions import load_extensions, track_command_changes
 from bot.formatter import Formatter
+from bot.http_client import HTTPClient
+from bot.prefixes import when_mentioned_or_trie
 from bot.utils import CaseInsensitiveDict
 
-bot = AutoShardedBot(
-    command_prefix=when_mentioned_or(
-        ">>> self.", ">> self.", "> self.", "self.",
-        ">>> bot.", ">> bot.", "> bot.", "bot.",
-        ">>> ", ">> ", "> ",
-        ">>>", ">>", ">"
-    ),  # Order matters (and so do commas)
-    activity=Game(name="Help: bot.help()"),
-    help_attrs={"aliases": ["help()"]},
-    formatter=Formatter()
-)
 
-# Make cog names case-insensitive
-bot.cogs = CaseInsensitiveDict()
+def create_bot(cache_policy: CachePolicy = None, **options) -> AutoShardedBot:
+    """
+    Set up the bot and load its extensions
+
+    :param cache_policy: Optional, what to cache of what Discord sends us - defaults to the policy in our constants
+    :param options: Passed on to `AutoShardedBot`, e.g. `shard_ids` and `shard_count` for a cluster worker
+    """
+
+    if cache_policy is None:
+        cache_policy = CachePolicy(
+            max_messages=CACHE_MAX_MESSAGES, fetch_offline_members=CACHE_FETCH_OFFLINE_MEMBERS, members=CACHE_MEMBERS
+        )
+
+    cache_policy.install()
+
+    bot = AutoShardedBot(
+        command_prefix=when_mentioned_or_trie(
+            ">>> self.", ">> self.", "> self.", "self.",
+            ">>> bot.", ">> bot.", "> bot.", "bot.",
+            ">>> ", ">> ", "> ",
+            ">>>", ">>", ">"
+        ),  # Order matters (and so do commas)
+        activity=Game(name="Help: bot.help()"),
+        help_attrs={"aliases": ["help()"]},
+        formatter=Formatter(),
+        **cache_policy.options,
+        **options
+    )
+
+    # Make cog names case-insensitive
+    bot.cogs = CaseInsensitiveDict()
+
+    # Global HTTP client for all cogs, with pooled connections, timeouts, retries and per-host circuit breakers
+    bot.http_client = HTTPClient(
+        loop=bot.loop, limit=HTTP_CONNECTION_LIMIT, limit_per_host=HTTP_CONNECTION_LIMIT_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT, dns_ttl=HTTP_DNS_TTL, connect_timeout=HTTP_CONNECT_TIMEOUT,
+        read_timeout=HTTP_READ_TIMEOUT, total_timeout=HTTP_TOTAL_TIMEOUT, retries=HTTP_RETRIES,
+        backoff=HTTP_RETRY_BACKOFF, breaker_threshold=HTTP_BREAKER_THRESHOLD, breaker_cooldown=HTTP_BREAKER_COOLDOWN
+    )
+    bot.http_session = bot.http_client.session  # The raw aiohttp session, for anything the client doesn't cover
+
+    # Set to a ClusterClient when this is one worker of several
+    bot.cluster = None
+
+    # Help output is cached, until a command is added or removed
+    track_command_changes(bot)
+
+    load_extensions(bot, EXTENSIONS, LAZY_EXTENSIONS)
+
+    return bot
+
+
+def run(bot: AutoShardedBot):
+    bot.run(os.environ.get("BOT_TOKEN"))
+
+    bot.http_client.close()  # Close the aiohttp session when the bot finishes running
+
+
+def run_worker(conn, index, shard_ids, shard_count):
+    """
+    The entry point of each cluster worker process
+    """
 
-# Global aiohttp session for all cogs - uses asyncio for DNS resolution instead of threads, so we don't *spam threads*
-bot.http_session = ClientSession(connector=TCPConnector(resolver=AsyncResolver()))
+    # Every worker serves its own metrics, so they can't all have the same port
+    if os.environ.get("STATS_PORT"):
+        os.environ["STATS_PORT"] = str(int(os.environ["STATS_PORT"]) + index)
 
-# Internal/debug
-bot.load_extension("bot.cogs.logging")
-bot.load_extension("bot.cogs.security")
+    bot = create_bot(shard_ids=shard_ids, shard_count=shard_count)
+    bot.cluster = ClusterClient(bot, conn, index, shard_ids, stats_interval=CLUSTER_STATS_INTERVAL)
+    bot.cluster.start()
 
+    run(bot)
 
-# Commands, etc
-bot.load_extension("bot.cogs.snakes")
 
-bot.run(os.environ.get("BOT_TOKEN"))
+if __name__ == "__main__":
+    # With CLUSTER_WORKERS set, the shards are split between that many processes - SHARD_COUNT defaults to one each
+    workers = int(os.environ.get("CLUSTER_WORKERS", 1))
 
-bot.http_session.close()  # Close the aiohttp session when the bot finishes running
+    if workers > 1:
+        Cluster(
+            run_worker, shard_count=int(os.environ.get("SHARD_COUNT", workers)), workers=workers,
+            restart_backoff=CLUSTER_RESTART_BACKOFF, max_restart_backoff=CLUSTER_RESTART_MAX_BACKOFF,
+            stable_uptime=CLUSTER_STABLE_UPTIME, outbox_size=CLUSTER_OUTBOX_SIZE
+        ).run()
+    else:
+        run(create_bot())
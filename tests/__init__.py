@@ -0,0 +1,27 @@
+# coding=utf-8
+import asyncio
+import functools
+
+import pytest
+
+# Everything in the bot package imports discord.py, through bot/__init__.py
+pytest.importorskip("discord")
+
+
+def async_test(test):
+    """
+    Run a coroutine test function on a new event loop, which is set as the current one while it runs
+    """
+
+    @functools.wraps(test)
+    def wrapper(*args, **kwargs):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        try:
+            return loop.run_until_complete(test(*args, **kwargs))
+        finally:
+            loop.close()
+            asyncio.set_event_loop(None)
+
+    return wrapper
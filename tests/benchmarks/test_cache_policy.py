@@ -0,0 +1,73 @@
+# coding=utf-8
+import asyncio
+import gc
+import os
+import tracemalloc
+
+from discord import Guild
+
+import pytest
+
+from bot.cache_policy import CachePolicy
+from bot.decorators import REFERENCED_ROLES
+
+from tests.test_cache_policy import ROLE_ID, connection, guild_create
+
+MEMBERS = 10000
+
+
+@pytest.fixture(params=["all", "roles"])
+def members(request):
+    REFERENCED_ROLES.add(ROLE_ID)
+    CachePolicy(members=request.param).install()
+
+    yield request.param
+
+    CachePolicy().install()
+    REFERENCED_ROLES.discard(ROLE_ID)
+
+
+def rss() -> int:
+    # Resident pages, on Linux
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def retained(payload: dict, measure) -> int:
+    """
+    How much more `measure` says is in use while a guild loaded from a GUILD_CREATE payload is alive
+    """
+
+    loop = asyncio.new_event_loop()
+    state = connection(loop)
+    gc.collect()
+
+    before = measure()
+    guild = Guild(data=payload, state=state)
+    gc.collect()
+    used = measure() - before
+
+    del guild
+    loop.close()
+    return used
+
+
+def traced() -> int:
+    return tracemalloc.get_traced_memory()[0]
+
+
+def test_guild_create_10k_members(benchmark, members):
+    # Payloads are built up front, since only what the guild keeps of them counts
+    payload = guild_create(MEMBERS)
+    if os.path.exists("/proc/self/statm"):
+        benchmark.extra_info["rss_kib_per_10k_members"] = round(retained(payload, rss) / 1024 * 10000 / MEMBERS)
+
+    tracemalloc.start()
+    try:
+        benchmark.extra_info["traced_kib_per_10k_members"] = round(retained(payload, traced) / 1024 * 10000 / MEMBERS)
+    finally:
+        tracemalloc.stop()
+
+    benchmark.pedantic(
+        lambda data: Guild(data=data, state=connection(None)), setup=lambda: ((guild_create(MEMBERS),), {}), rounds=5
+    )
@@ -0,0 +1,43 @@
+# coding=utf-8
+import logging
+import os
+
+import pytest
+
+from bot.pagination import LinePaginator, PageStream
+
+from tests import async_test
+
+LINES = [f"line {number}" for number in range(10000)]
+
+
+@pytest.fixture(params=["INFO", "TRACE"])
+def level(request):
+    """
+    Log the paginator at a level, formatting the records it lets through and writing them nowhere
+    """
+
+    logger = logging.getLogger("bot.pagination")
+    stream = open(os.devnull, "w")
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter("%(asctime)s | %(name)s | %(levelname)s | %(message)s"))
+
+    logger.addHandler(handler)
+    logger.setLevel(request.param)
+    logger.propagate = False
+
+    yield request.param
+
+    logger.propagate = True
+    logger.setLevel(logging.NOTSET)
+    logger.removeHandler(handler)
+    handler.close()
+    stream.close()
+
+
+async def paginate():
+    await PageStream(LinePaginator(max_lines=10), LINES).drain()
+
+
+def test_paginate_10k_lines(benchmark, level):
+    benchmark.pedantic(async_test(paginate), rounds=10)
@@ -0,0 +1,63 @@
+# coding=utf-8
+import asyncio
+from types import SimpleNamespace
+
+from discord import Embed
+
+from bot.pagination import LinePaginator, PageStream, PaginationManager, PaginationSession
+
+from tests import async_test
+from tests.test_pagination import StubMessage, embed_from_data  # noqa: F401
+
+LINES = [f"line {number}" for number in range(100)]  # Ten pages, so all five emoji are added
+ROUND_TRIP = 0.02
+
+
+class StubContext:
+    """
+    A context whose messages take a round trip to Discord to add each reaction
+    """
+
+    def __init__(self):
+        self.bot = SimpleNamespace(
+            loop=asyncio.get_event_loop(), user=SimpleNamespace(id=0), add_listener=lambda listener: None
+        )
+        self.me = self.bot.user
+
+    async def send(self, embed: Embed) -> StubMessage:
+        return StubMessage(reaction_delay=ROUND_TRIP)
+
+
+async def seed_then_listen():
+    # How pagination used to start - every reaction was added before we listened for any
+    ctx = StubContext()
+    pages = PageStream(LinePaginator(max_lines=10), LINES)
+    await pages.get(0)
+
+    session = PaginationSession(pages, Embed())
+    session.start(await ctx.send(embed=await session.render(0)))
+    await session._seed()
+
+
+async def listen_while_seeding():
+    ctx = StubContext()
+    task = asyncio.ensure_future(LinePaginator.paginate(LINES, ctx, Embed(), max_lines=10))
+    manager = PaginationManager.for_bot(ctx.bot)
+
+    while not manager.sessions:  # Navigation works as soon as the session is registered
+        await asyncio.sleep(0)
+
+    for session in list(manager.sessions.values()):
+        manager.remove(session)
+        session.finish()
+
+    await task
+    manager._ticker.cancel()
+
+
+def test_seed_then_listen(benchmark):
+    benchmark.pedantic(async_test(seed_then_listen), rounds=10)
+
+
+def test_listen_while_seeding(benchmark):
+    benchmark.pedantic(async_test(listen_while_seeding), rounds=10)
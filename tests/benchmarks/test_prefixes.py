@@ -0,0 +1,53 @@
+# coding=utf-8
+from types import SimpleNamespace
+
+from discord.ext.commands import when_mentioned_or
+from discord.ext.commands.view import StringView
+
+from bot.prefixes import when_mentioned_or_trie
+
+from tests.test_prefixes import BOT, PREFIXES
+
+# Mostly chat, as on a busy guild, with the odd command in between
+MESSAGES = [
+    SimpleNamespace(content=content) for content in (
+        "hey, does anyone know why my list comprehension is so slow?",
+        "you're creating a new list every time, try a generator",
+        "bot.snakes.get('python')",
+        "lol",
+        "> quoting someone here to reply to them",
+        "```py\n" + "for i in range(10):\n    print(i)\n" * 20 + "```",
+        ">>> self.help()",
+        "thanks!",
+        "BOT.HELP()",
+        "has anyone tried the new asyncio stuff in 3.7?",
+    )
+]
+
+
+def _skip_string(view: StringView, string: str) -> bool:
+    # The patched skip_string before the trie - the whole buffer is lowered for every prefix tried
+    strlen = len(string)
+    if view.buffer.lower()[view.index:view.index + strlen] == string:
+        view.previous = view.index
+        view.index += strlen
+        return True
+    return False
+
+
+def resolve(get_prefix):
+    # What Bot.get_context does with the prefix list, for every message
+    for message in MESSAGES:
+        view = StringView(message.content)
+
+        for prefix in get_prefix(BOT, message):
+            if _skip_string(view, prefix):
+                break
+
+
+def test_when_mentioned_or(benchmark):
+    benchmark(resolve, when_mentioned_or(*PREFIXES))
+
+
+def test_when_mentioned_or_trie(benchmark):
+    benchmark(resolve, when_mentioned_or_trie(*PREFIXES))
@@ -0,0 +1,35 @@
+# coding=utf-8
+from discord.ext.commands.view import StringView
+
+from bot import _skip_string
+
+from tests.test_prefixes import PREFIXES
+
+# Someone pasting a traceback, which is as long as messages get
+LONG_MESSAGE = "```py\n" + "Traceback (most recent call last):\n  File \"bot.py\", line 1, in <module>\n" * 25 + "```"
+
+
+def _lower_all_skip_string(view: StringView, string: str) -> bool:
+    # The patched skip_string before only the compared window was lowered
+    strlen = len(string)
+    if view.buffer.lower()[view.index:view.index + strlen] == string:
+        view.previous = view.index
+        view.index += strlen
+        return True
+    return False
+
+
+def try_prefixes(skip_string):
+    view = StringView(LONG_MESSAGE)
+
+    for prefix in PREFIXES:
+        if skip_string(view, prefix):
+            break
+
+
+def test_lower_whole_buffer(benchmark):
+    benchmark(try_prefixes, _lower_all_skip_string)
+
+
+def test_lower_window(benchmark):
+    benchmark(try_prefixes, _skip_string)
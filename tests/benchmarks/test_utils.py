@@ -0,0 +1,89 @@
+# coding=utf-8
+import pytest
+
+from bot.utils import CaseInsensitiveDict
+
+
+class OldCaseInsensitiveDict(dict):
+    """
+    CaseInsensitiveDict as it was before it was rewritten, for comparison
+    """
+
+    @classmethod
+    def _k(cls, key):
+        return key.lower() if isinstance(key, str) else key
+
+    def __init__(self, *args, **kwargs):
+        super(OldCaseInsensitiveDict, self).__init__(*args, **kwargs)
+        self._convert_keys()
+
+    def __getitem__(self, key):
+        return super(OldCaseInsensitiveDict, self).__getitem__(self.__class__._k(key))
+
+    def __setitem__(self, key, value):
+        super(OldCaseInsensitiveDict, self).__setitem__(self.__class__._k(key), value)
+
+    def __contains__(self, key):
+        return super(OldCaseInsensitiveDict, self).__contains__(self.__class__._k(key))
+
+    def get(self, key, *args, **kwargs):
+        return super(OldCaseInsensitiveDict, self).get(self.__class__._k(key), *args, **kwargs)
+
+    def update(self, E=None, **F):
+        super(OldCaseInsensitiveDict, self).update(self.__class__(E))
+        super(OldCaseInsensitiveDict, self).update(self.__class__(**F))
+
+    def _convert_keys(self):
+        for k in list(self.keys()):
+            v = super(OldCaseInsensitiveDict, self).pop(k)
+            self.__setitem__(k, v)
+
+
+# Cog names, as `bot.cogs` is looked up - a plain dict only finds them written exactly as they were stored
+KEYS = ["Snakes", "Security", "Suggestions", "Stats", "Eval", "Events", "Logging", "Bot", "Help", "Clean"]
+MAPPING_TYPES = pytest.mark.parametrize(
+    "mapping_type", [dict, OldCaseInsensitiveDict, CaseInsensitiveDict], ids=["dict", "old", "new"]
+)
+
+
+def filled(mapping_type):
+    return mapping_type((key, None) for key in KEYS)
+
+
+def get_all(mapping):
+    for key in KEYS:
+        mapping.get(key)
+
+
+def set_all(mapping):
+    for key in KEYS:
+        mapping[key] = None
+
+
+def contains_all(mapping):
+    for key in KEYS:
+        key in mapping  # noqa: B015
+
+
+def update(mapping, other):
+    mapping.update(other)
+
+
+@MAPPING_TYPES
+def test_get(benchmark, mapping_type):
+    benchmark(get_all, filled(mapping_type))
+
+
+@MAPPING_TYPES
+def test_set(benchmark, mapping_type):
+    benchmark(set_all, mapping_type())
+
+
+@MAPPING_TYPES
+def test_contains(benchmark, mapping_type):
+    benchmark(contains_all, filled(mapping_type))
+
+
+@MAPPING_TYPES
+def test_update(benchmark, mapping_type):
+    benchmark(update, mapping_type(), {key: None for key in KEYS})
@@ -0,0 +1,93 @@
+# coding=utf-8
+import ast
+import random
+
+import pytest
+
+from bot.arguments import parse_arguments
+
+# Calls people actually make, and the corners of Python's grammar around them
+CORPUS = [
+    '("test", \'a dark, dark night\')',
+    '("python")',
+    "('python')",
+    '("python",)',
+    '(3)',
+    '(3,)',
+    '(-3, 0, 007)',
+    '(1.5, 2e3, .5, 0x1f, 1j)',
+    '(True, False, None)',
+    '("a" "b", \'c\')',
+    '("with \\"escapes\\"", \'tab\\there\')',
+    '("""triple""")',
+    '(r"raw\\n", b"bytes")',
+    '([1, 2], (3, 4), {5: 6})',
+    '([1, 2])',
+    '({"a": 1})',
+    '((1), 2)',
+    '(tags.delete)',
+    '(python)',
+    '("unterminated)',
+    '("a",, "b")',
+    '(,)',
+    '("a" 3)',
+    '(',
+    '()',
+    '( "spaced" , 3 )',
+    '(\n"newline"\n)',
+    '("line\ncontinued")',
+    '("émojis \U0001f40d")',
+    '(1 + 2)',
+    '(-"a")',
+    '("a") trailing',
+    '("a"), ("b")',
+]
+
+FRAGMENTS = [
+    '"a"', "'b'", '"with space"', "'it''s'", '"\\n"', '"\\""', '"""x"""', 'r"y"', 'b"z"',
+    "0", "1", "-1", "42", "007", "1.5", "1e3", "0x10", "1j",
+    "True", "False", "None", "name", "tags.delete",
+    ",", ", ", " ", "(", ")", "[", "]", "{", "}", ":", '"', "'", "\\", "\n", "+",
+]
+
+
+def reference(text: str):
+    """
+    What _get_word made of the arguments before the tokenizer - one ast.literal_eval over the whole call
+    """
+
+    try:
+        value = ast.literal_eval(text.strip())
+    except (SyntaxError, ValueError):
+        return None
+
+    if isinstance(value, str):
+        return (value,)
+
+    try:
+        return tuple(str(item) for item in value)
+    except TypeError:
+        return (str(value),)
+
+
+@pytest.mark.parametrize("text", CORPUS)
+def test_corpus(text):
+    assert parse_arguments(text) == reference(text)
+
+
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")  # Stray backslashes in the generated strings
+def test_fuzz():
+    rng = random.Random(1234)
+
+    for _ in range(5000):
+        text = "(" + "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 8))) + rng.choice((")", ",)", ""))
+        assert parse_arguments(text) == reference(text), text
+
+
+def test_plain_strings_skip_ast(monkeypatch):
+    def literal_eval(text):
+        raise AssertionError(f"ast.literal_eval was called on {text!r}")
+
+    monkeypatch.setattr(ast, "literal_eval", literal_eval)
+
+    assert parse_arguments('("test", \'a dark, dark night\', 3, None)') == ("test", "a dark, dark night", "3", "None")
@@ -0,0 +1,189 @@
+# coding=utf-8
+import asyncio
+import logging
+
+import pytest
+
+from bot.cache import PersistentCache, PrefetchPool
+
+from tests import async_test
+
+
+@pytest.mark.parametrize("table", ["snakes; DROP TABLE snakes", "1snakes", "", "snakes cache"])
+def test_rejects_bad_table_names(tmpdir, table):
+    with pytest.raises(ValueError):
+        PersistentCache(str(tmpdir.join("cache.sqlite3")), table=table, loop=object())
+
+
+@async_test
+async def test_fetches_once_and_persists(tmpdir):
+    path = str(tmpdir.join("cache.sqlite3"))
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return {"name": "python"}
+
+    cache = PersistentCache(path)
+    assert await cache.get_or_fetch("python", fetch) == {"name": "python"}
+    assert await cache.get_or_fetch("python", fetch) == {"name": "python"}
+    cache.close()
+
+    cache = PersistentCache(path)
+    assert await cache.get_or_fetch("python", fetch) == {"name": "python"}
+    cache.close()
+
+    assert len(calls) == 1
+
+
+@async_test
+async def test_caches_misses(tmpdir):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+
+    cache = PersistentCache(str(tmpdir.join("cache.sqlite3")))
+    assert await cache.get_or_fetch("nope", fetch) is None
+    assert await cache.get_or_fetch("nope", fetch) is None
+    cache.close()
+
+    assert len(calls) == 1
+
+
+@async_test
+async def test_misses_arent_served_stale(tmpdir):
+    cache = PersistentCache(str(tmpdir.join("cache.sqlite3")), negative_ttl=0, stale_ttl=3600)
+    await cache.set("nope", None)
+
+    async def fetch():
+        return "found"
+
+    entry = await cache.lookup("nope")
+    assert entry.stale_until == entry.expires
+    assert await cache.get_or_fetch("nope", fetch) == "found"
+    cache.close()
+
+
+@async_test
+async def test_purges_expired_rows_while_writing(tmpdir):
+    path = str(tmpdir.join("cache.sqlite3"))
+    cache = PersistentCache(path, ttl=0, stale_ttl=0, purge_interval=0)
+
+    for number in range(10):
+        await cache.set(f"snake {number}", number)
+
+    await cache.set("python", "fresh", ttl=3600)
+    rows = cache._db.execute("SELECT key FROM cache").fetchall()
+    cache.close()
+
+    assert rows == [("python",)]
+
+
+@async_test
+async def test_lookups_and_invalidations_after_closing(tmpdir):
+    cache = PersistentCache(str(tmpdir.join("cache.sqlite3")), maxsize=1)
+    await cache.set("python", "evicted")
+    await cache.set("cobra", "in memory")
+    cache.close()
+
+    assert await cache.lookup("python") is None  # It's only on disk now
+    assert (await cache.lookup("cobra")).value == "in memory"
+    await cache.invalidate("cobra")
+    assert await cache.lookup("cobra") is None
+
+
+@async_test
+async def test_serves_stale_while_refreshing(tmpdir):
+    cache = PersistentCache(str(tmpdir.join("cache.sqlite3")), ttl=0)
+    await cache.set("python", "old")
+
+    async def fetch():
+        return "new"
+
+    assert await cache.get_or_fetch("python", fetch) == "old"
+    assert cache.stats["refreshing"] == 1
+
+    while cache.stats["refreshing"]:
+        await asyncio.sleep(0)
+
+    assert (await cache.lookup("python")).value == "new"
+    cache.close()
+
+
+@async_test
+async def test_close_cancels_refreshes(tmpdir, caplog):
+    path = str(tmpdir.join("cache.sqlite3"))
+    cache = PersistentCache(path, ttl=0)
+    await cache.set("python", "old")
+
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def fetch():
+        started.set()
+        await release.wait()
+        return "new"
+
+    assert await cache.get_or_fetch("python", fetch) == "old"
+    await started.wait()
+
+    cache.close()
+    release.set()
+
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+    assert cache.stats["in_flight"] == 0
+    assert cache.stats["refreshing"] == 0
+    assert not [record for record in caplog.records if record.levelno >= logging.ERROR]
+
+    cache = PersistentCache(path)
+    assert (await cache.lookup("python")).value == "old"
+    cache.close()
+
+
+@async_test
+async def test_prefetch_pool_fills_up():
+    count = 0
+
+    async def factory():
+        nonlocal count
+        count += 1
+        return count
+
+    pool = PrefetchPool(factory, size=3, concurrency=2)
+    pool.start()
+
+    while pool.stats["depth"] < 3:
+        await asyncio.sleep(0)
+
+    assert await pool.get() in (1, 2, 3)
+    assert pool.stats["hits"] == 1
+    pool.stop()
+
+
+@async_test
+async def test_prefetch_pool_stops_when_theres_nothing_to_prefetch():
+    items = []
+
+    async def factory():
+        return items.pop() if items else None
+
+    pool = PrefetchPool(factory, size=3, concurrency=2)
+    pool.start()
+
+    while not pool.idle:
+        await asyncio.sleep(0)
+
+    assert await pool.get() is None
+    assert pool.stats["failures"] == 0
+
+    items[:] = ["a", "b", "c", "d"]
+    assert await pool.get() == "d"
+    assert not pool.idle
+
+    while pool.stats["depth"] < 3:
+        await asyncio.sleep(0)
+
+    pool.stop()
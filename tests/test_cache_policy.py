@@ -0,0 +1,124 @@
+# coding=utf-8
+import asyncio
+from types import SimpleNamespace
+
+from discord import Guild, Member
+from discord.state import ConnectionState
+
+import pytest
+
+from bot.cache_policy import CachePolicy
+from bot.decorators import REFERENCED_ROLES, get_author_role_ids, member_roles
+
+from tests import async_test
+
+BOT_ID = 1
+GUILD_ID = 2
+ROLE_ID = 3  # Referred to by a role check
+OTHER_ROLE_ID = 4
+CHANNEL_ID = 5
+
+
+def member(user_id: int, *role_ids: int) -> dict:
+    return {
+        "user": {"id": str(user_id), "username": f"user{user_id}", "discriminator": "0001", "avatar": None},
+        "roles": [str(role_id) for role_id in role_ids], "joined_at": None, "nick": None, "deaf": False, "mute": False
+    }
+
+
+def guild_create(members: int, with_role_every: int = 100) -> dict:
+    """
+    A GUILD_CREATE payload, where one member in `with_role_every` has the role that a role check refers to
+    """
+
+    return {
+        "id": str(GUILD_ID), "name": "Python", "member_count": members + 1,
+        "roles": [
+            {"id": str(GUILD_ID), "name": "@everyone", "permissions": 0},
+            {"id": str(ROLE_ID), "name": "Admin", "permissions": 8},
+            {"id": str(OTHER_ROLE_ID), "name": "Helper", "permissions": 0},
+        ],
+        "channels": [{"id": str(CHANNEL_ID), "type": 0, "name": "python-general", "position": 0}],
+        "members": [member(BOT_ID)] + [
+            member(user_id, ROLE_ID if user_id % with_role_every == 0 else OTHER_ROLE_ID)
+            for user_id in range(100, 100 + members)
+        ],
+    }
+
+
+def connection(loop: asyncio.AbstractEventLoop) -> ConnectionState:
+    state = ConnectionState(dispatch=lambda *args: None, chunker=None, handlers={}, syncer=None, http=None, loop=loop)
+    state.user = SimpleNamespace(id=BOT_ID)
+    return state
+
+
+@pytest.fixture
+def policy():
+    """
+    Install a policy that only keeps members with a referenced role, putting everything back afterwards
+    """
+
+    REFERENCED_ROLES.add(ROLE_ID)
+    policy = CachePolicy(members="roles")
+    policy.install()
+
+    yield policy
+
+    CachePolicy().install()
+    REFERENCED_ROLES.discard(ROLE_ID)
+
+
+def test_keeps_members_with_referenced_roles(policy):
+    state = connection(asyncio.new_event_loop())
+    guild = Guild(data=guild_create(1000), state=state)
+
+    assert len(guild.members) == 11  # Ten with the role, and the bot
+    assert guild.get_member(BOT_ID) is not None
+    assert guild.get_member(200) is not None and guild.get_member(201) is None
+    state.loop.close()
+
+
+def test_keeps_message_authors(policy):
+    state = connection(asyncio.new_event_loop())
+    guild = Guild(data=guild_create(1000), state=state)
+    state._add_guild(guild)
+    author = member(201, OTHER_ROLE_ID)
+
+    state.parse_message_create({
+        "id": "6", "channel_id": str(CHANNEL_ID), "guild_id": str(GUILD_ID), "type": 0, "content": "bot.get()",
+        "author": author["user"], "member": {key: value for key, value in author.items() if key != "user"},
+        "timestamp": None, "edited_timestamp": None, "tts": False, "pinned": False, "mention_everyone": False,
+        "mentions": [], "mention_roles": [], "attachments": [], "embeds": []
+    })
+
+    kept = guild.get_member(201)
+    assert isinstance(kept, Member) and [role.id for role in kept.roles] == [GUILD_ID, OTHER_ROLE_ID]
+    assert state._messages[-1].author is kept
+    state.loop.close()
+
+
+def test_keeps_everyone_by_default():
+    state = connection(asyncio.new_event_loop())
+    guild = Guild(data=guild_create(1000), state=state)
+
+    assert len(guild.members) == 1001
+    state.loop.close()
+
+
+@async_test
+async def test_caches_fetched_roles():
+    member_roles.clear()
+    requests = []
+
+    async def get_member(guild_id, user_id):
+        requests.append(user_id)
+        return {"roles": [str(ROLE_ID)]}
+
+    ctx = SimpleNamespace(
+        author=SimpleNamespace(id=201), guild=SimpleNamespace(id=GUILD_ID),
+        bot=SimpleNamespace(http=SimpleNamespace(get_member=get_member))
+    )
+
+    assert await get_author_role_ids(ctx) == {ROLE_ID}
+    assert await get_author_role_ids(ctx) == {ROLE_ID}
+    assert requests == [201]
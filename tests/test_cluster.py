@@ -0,0 +1,146 @@
+# coding=utf-8
+import asyncio
+import multiprocessing
+import threading
+from types import SimpleNamespace
+
+from bot.cluster import Cluster, ClusterClient, aggregate_stats, shard_ranges
+
+from tests import async_test
+
+
+class StubBot(SimpleNamespace):
+    def __init__(self):
+        super().__init__(loop=asyncio.get_event_loop(), guilds=[], latency=0.1, dispatched=[], logged_out=False)
+
+    def dispatch(self, event: str, *args):
+        self.dispatched.append((event, *args))
+
+    def get_cog(self, name: str):
+        return None
+
+    async def logout(self):
+        self.logged_out = True
+
+
+def client() -> tuple:
+    conn, launcher = multiprocessing.Pipe()
+    cluster = ClusterClient(StubBot(), conn, 0, [0], stats_interval=60)
+    cluster.start()
+    return cluster, launcher
+
+
+async def receive(launcher) -> dict:
+    return await asyncio.get_event_loop().run_in_executor(None, launcher.recv)
+
+
+def test_shard_ranges():
+    assert shard_ranges(5, 2) == [[0, 1, 2], [3, 4]]
+    assert shard_ranges(2, 2) == [[0], [1]]
+
+
+def test_aggregate_stats():
+    stats = aggregate_stats({
+        0: {"guilds": 1, "invocations": {"get": 2}, "errors": {}},
+        1: {"guilds": 2, "invocations": {"get": 1, "help": 1}, "errors": {"get": 1}},
+    })
+
+    assert stats["invocations"] == {"get": 3, "help": 1}
+    assert stats["errors"] == {"get": 1}
+    assert stats["workers"] == {0: {"guilds": 1}, 1: {"guilds": 2}}
+
+
+@async_test
+async def test_large_broadcasts_dont_block_the_loop():
+    cluster, launcher = client()
+    assert (await receive(launcher))["op"] == "stats"
+
+    # Far more than the pipe holds, with nobody reading it yet
+    sent = cluster.broadcast("cache_invalidate", "x" * 10 ** 7)
+    ticks = 0
+
+    while ticks < 10:
+        await asyncio.sleep(0.001)
+        ticks += 1
+
+    assert not sent.done()
+
+    received = await receive(launcher)
+    await sent
+
+    assert received["op"] == "broadcast" and len(received["data"]) == 10 ** 7
+    cluster.close()
+
+
+@async_test
+async def test_dispatches_broadcasts_and_answers_stats():
+    cluster, launcher = client()
+    assert (await receive(launcher))["op"] == "stats"
+
+    def launcher_side():
+        request = launcher.recv()
+        launcher.send({"op": "message", "event": "cache_invalidate", "data": {"key": "python"}})
+        launcher.send({"op": "stats", "nonce": request["nonce"], "stats": {"workers": {}}})
+
+    thread = threading.Thread(target=launcher_side)
+    thread.start()
+
+    assert await cluster.stats(timeout=5) == {"workers": {}}
+    assert cluster.bot.dispatched == [("cluster_message", "cache_invalidate", {"key": "python"})]
+
+    thread.join()
+    cluster.close()
+
+
+@async_test
+async def test_shuts_down_when_the_launcher_goes():
+    cluster, launcher = client()
+    launcher.close()
+
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+
+        if cluster.bot.logged_out:
+            break
+
+    assert cluster.bot.logged_out
+    cluster.close()
+
+
+def test_a_stalled_worker_doesnt_block_the_launcher():
+    cluster = Cluster(None, shard_count=3, workers=3, outbox_size=3)
+    stalled, reading, broadcasting = cluster._workers
+    ends = {}
+
+    for worker in cluster._workers:
+        conn, ends[worker.index] = multiprocessing.Pipe()
+        cluster._open(worker, conn)
+
+    def broadcast():
+        # Each one is larger than a pipe holds, and nobody is reading yet
+        for number in range(10):
+            cluster._handle(broadcasting, {"op": "broadcast", "event": "big", "data": str(number) * 10 ** 6})
+
+    thread = threading.Thread(target=broadcast)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+
+    # Only the outbox, and the message already being sent, are kept - the rest are dropped rather than waited for
+    for worker in (stalled, reading):
+        assert worker.dropped in (6, 7)
+
+    received = [ends[reading.index].recv()["data"][0] for _ in range(10 - reading.dropped)]
+    assert received[:3] == ["0", "1", "2"] and received == sorted(received)
+    assert broadcasting.dropped == 0
+
+    # Now it's caught up, its messages go through again
+    cluster._handle(reading, {"op": "stats_request", "nonce": 1})
+    assert ends[reading.index].recv()["nonce"] == 1
+
+    for end in ends.values():
+        end.close()  # Like the worker processes exiting
+
+    for worker in cluster._workers:
+        cluster._close(worker)
+        assert worker.conn is None
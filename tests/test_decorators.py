@@ -0,0 +1,64 @@
+# coding=utf-8
+from types import SimpleNamespace
+
+from discord import NotFound
+from discord.state import ConnectionState
+
+from bot.decorators import get_author_role_ids, get_role_ids, member_roles, with_role
+
+from tests import async_test
+
+GUILD_ID = 1
+MEMBER = SimpleNamespace(id=42, guild=SimpleNamespace(id=GUILD_ID), roles=[SimpleNamespace(id=7)])
+
+# A connection that doesn't know any guilds - the member events still invalidate, from their raw data
+STATE = SimpleNamespace(_get_guild=lambda guild_id: None)
+
+
+def test_caches_role_ids():
+    member_roles.clear()
+
+    assert get_role_ids(MEMBER) == {7}
+    assert (GUILD_ID, MEMBER.id) in member_roles
+
+
+def test_member_events_invalidate_uncached_members():
+    for parse in (ConnectionState.parse_guild_member_update, ConnectionState.parse_guild_member_remove):
+        member_roles.clear()
+        get_role_ids(MEMBER)
+
+        parse(STATE, {"guild_id": str(GUILD_ID), "user": {"id": str(MEMBER.id)}, "roles": []})
+
+        assert (GUILD_ID, MEMBER.id) not in member_roles
+
+
+def test_role_delete_clears_everything():
+    member_roles.clear()
+    get_role_ids(MEMBER)
+
+    ConnectionState.parse_guild_role_delete(STATE, {"guild_id": str(GUILD_ID), "role_id": "7"})
+
+    assert len(member_roles) == 0
+
+
+@async_test
+async def test_authors_who_cant_be_fetched_have_no_roles():
+    member_roles.clear()
+
+    async def get_member(guild_id: int, member_id: int):
+        raise NotFound(SimpleNamespace(status=404, reason="Not Found"), "Unknown Member")
+
+    ctx = SimpleNamespace(
+        author=SimpleNamespace(id=MEMBER.id), guild=SimpleNamespace(id=GUILD_ID), command=SimpleNamespace(name="eval"),
+        bot=SimpleNamespace(http=SimpleNamespace(get_member=get_member))
+    )
+
+    @with_role(7)
+    async def eval_command(ctx):
+        pass
+
+    predicate, = eval_command.__commands_checks__
+
+    assert await get_author_role_ids(ctx) == frozenset()
+    assert await predicate(ctx) is False
+    assert (GUILD_ID, MEMBER.id) not in member_roles
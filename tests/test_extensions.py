@@ -0,0 +1,135 @@
+# coding=utf-8
+import sys
+from types import SimpleNamespace
+
+from discord.ext.commands import Bot, command
+
+from bot.cogs.stats import Stats
+from bot.extensions import add_lazy_extension, read_commands, track_command_changes
+
+from tests import async_test
+
+EXTENSION = '''
+from discord.ext.commands import command
+
+
+@command()
+async def hiss(ctx):
+    pass
+
+
+def setup(bot):
+    bot.add_command(hiss)
+'''
+
+LAZY_EXTENSION = '''
+from discord.ext.commands import Context, command
+
+
+class Hissing:
+    @command(name="hiss", aliases=["hiss()"])
+    async def hiss_at(self, ctx: Context, name: str = None, *, times: int = 3):
+        """
+        Hiss at someone
+
+        :param name: Who to hiss at
+        """
+
+
+def setup(bot):
+    bot.add_cog(Hissing())
+'''
+
+
+async def noop(ctx):
+    pass
+
+
+def tracked_bot() -> Bot:
+    bot = Bot(command_prefix="!")
+    bot.formatter = SimpleNamespace(invalidations=0)
+    bot.formatter.invalidate = lambda: setattr(bot.formatter, "invalidations", bot.formatter.invalidations + 1)
+
+    track_command_changes(bot)
+    return bot
+
+
+@async_test
+async def test_adding_and_removing_commands_invalidates_help():
+    bot = tracked_bot()
+
+    bot.add_command(command(name="spam")(noop))
+    assert bot.formatter.invalidations == 1
+
+    bot.remove_command("spam")
+    assert bot.formatter.invalidations == 2
+
+    bot.remove_command("spam")  # Nothing to remove
+    assert bot.formatter.invalidations == 2
+
+
+@async_test
+async def test_loading_and_unloading_extensions_invalidates_help(tmpdir, monkeypatch):
+    tmpdir.join("hissing.py").write(EXTENSION)
+    monkeypatch.syspath_prepend(str(tmpdir))
+    bot = tracked_bot()
+
+    bot.load_extension("hissing")
+    assert bot.get_command("hiss") is not None
+    assert bot.formatter.invalidations == 1
+
+    bot.unload_extension("hissing")
+    assert bot.get_command("hiss") is None
+    assert bot.formatter.invalidations == 2
+
+
+@async_test
+async def test_lazy_stand_ins_invalidate_help():
+    bot = tracked_bot()
+
+    add_lazy_extension(bot, "bot.cogs.snakes", ["get", "snakes.get"])
+
+    assert bot.formatter.invalidations == 2
+
+
+def test_reads_commands_without_importing(tmpdir, monkeypatch):
+    tmpdir.join("lazy_hissing.py").write(LAZY_EXTENSION)
+    monkeypatch.syspath_prepend(str(tmpdir))
+
+    found = read_commands("lazy_hissing")
+
+    assert sorted(found) == ["hiss", "hiss()"]
+    assert str(found["hiss"][0]) == "(ctx:discord.ext.commands.context.Context, name:str=None, *, times:int=3)"
+    assert found["hiss"][1].startswith("Hiss at someone")
+    assert "lazy_hissing" not in sys.modules
+
+
+@async_test
+async def test_stand_ins_look_like_the_real_commands(tmpdir, monkeypatch):
+    tmpdir.join("lazy_hissing.py").write(LAZY_EXTENSION)
+    monkeypatch.syspath_prepend(str(tmpdir))
+    bot = Bot(command_prefix="!")
+
+    add_lazy_extension(bot, "lazy_hissing", ["hiss"])
+    stand_in = bot.get_command("hiss")
+
+    assert stand_in.help.startswith("Hiss at someone")
+    assert list(stand_in.params) == ["ctx", "name", "times"]
+    assert stand_in.params["name"].annotation is str and stand_in.params["name"].default is None
+
+
+@async_test
+async def test_stand_ins_arent_counted_as_invocations():
+    bot = Bot(command_prefix="!")
+    stats = Stats(bot)
+    add_lazy_extension(bot, "bot.cogs.snakes", ["get"])
+    stand_in = bot.get_command("get")
+
+    await stats.on_command(SimpleNamespace(command=stand_in))
+    assert stats.invocations == {}
+
+    stand_in.lazy_extension = None  # Now it's the real command
+    await stats.on_command(SimpleNamespace(command=stand_in))
+    assert stats.invocations == {"get": 1}
+
+    stats._lag_task.cancel()
@@ -0,0 +1,137 @@
+# coding=utf-8
+from types import SimpleNamespace
+
+from discord.ext.commands import Bot, check, command
+
+import pytest
+
+from bot.extensions import track_command_changes
+
+from tests import async_test
+
+# The formatter extends the rewrite's HelpFormatter, which later versions of discord.py replaced
+Formatter = pytest.importorskip("bot.formatter").Formatter
+
+OWNER = SimpleNamespace(id=1)
+MEMBER = SimpleNamespace(id=2)
+
+
+def is_owner(ctx) -> bool:
+    return ctx.author.id == OWNER.id
+
+
+async def noop(ctx):
+    """
+    Do nothing
+    """
+
+
+class Admin:
+    """
+    Commands only the owner can see, through the cog's local check
+    """
+
+    @command()
+    async def shutdown(self, ctx):
+        """
+        Turn the bot off
+        """
+
+    def __local_check(self, ctx) -> bool:
+        return is_owner(ctx)
+
+
+class Fun:
+    @command()
+    async def joke(self, ctx):
+        """
+        Tell a joke
+        """
+
+
+def help_bot() -> Bot:
+    bot = Bot(command_prefix="bot.")
+    bot.formatter = Formatter()
+    bot._connection.user = SimpleNamespace(id=0, mention="<@0>", name="Bot", display_name="Bot")
+    track_command_changes(bot)
+
+    bot.add_command(command(name="get")(noop))
+    bot.add_command(check(is_owner)(command(name="reload")(noop)))
+    bot.add_cog(Admin())
+    bot.add_cog(Fun())
+    return bot
+
+
+def context(bot: Bot, author) -> SimpleNamespace:
+    return SimpleNamespace(
+        bot=bot, author=author, guild=None, prefix="bot.", invoked_with="help", command=None, message=None
+    )
+
+
+async def shown(bot: Bot, author, target=None):
+    pages = await bot.formatter.format_help_for(context(bot, author), target or bot)
+    lines = "\n".join(pages).splitlines()
+    return [line.split()[0][len("bot."):] for line in lines if line.startswith("    bot.")]
+
+
+async def filtered(bot: Bot, author, target=None):
+    # What the stock, uncached filter lets through
+    bot.formatter.context, bot.formatter.command = context(bot, author), target or bot
+    return sorted(name for name, command in await bot.formatter.filter_command_list() if name not in command.aliases)
+
+
+@async_test
+async def test_checks_run_for_every_caller():
+    bot = help_bot()
+
+    assert sorted(await shown(bot, OWNER)) == ["get", "help", "joke", "reload", "shutdown"]
+    assert sorted(await shown(bot, MEMBER)) == ["get", "help", "joke"]
+    assert sorted(await shown(bot, OWNER)) == ["get", "help", "joke", "reload", "shutdown"]
+
+
+@async_test
+async def test_matches_the_stock_filter():
+    bot = help_bot()
+
+    for author in (OWNER, MEMBER, OWNER):
+        assert sorted(await shown(bot, author)) == await filtered(bot, author)
+
+        for cog in (bot.get_cog("Admin"), bot.get_cog("Fun")):
+            assert sorted(await shown(bot, author, cog)) == await filtered(bot, author, cog)
+
+
+@async_test
+async def test_cogs_are_cached_separately():
+    bot = help_bot()
+
+    assert await shown(bot, OWNER, bot.get_cog("Admin")) == ["shutdown"]
+    assert await shown(bot, OWNER, bot.get_cog("Fun")) == ["joke"]
+    assert await shown(bot, MEMBER, bot.get_cog("Admin")) == []
+    assert len(bot.formatter._overview_cache) == 2
+
+
+@async_test
+async def test_help_is_rebuilt_when_commands_change():
+    bot = help_bot()
+    assert "spam" not in await shown(bot, MEMBER)
+
+    bot.add_command(command(name="spam")(noop))
+    assert "spam" in await shown(bot, MEMBER)
+
+    bot.remove_command("spam")
+    assert "spam" not in await shown(bot, MEMBER)
+
+
+@async_test
+async def test_command_pages():
+    bot = help_bot()
+    get = bot.get_command("get")
+
+    pages = await bot.formatter.format_help_for(context(bot, MEMBER), get)
+    assert pages == ['```py\nasync def get(ctx):\n    """\n    Do nothing\n    """\n\n    await do_get(ctx)\n```']
+
+    bot.remove_command("get")  # A reload removes the command and adds it again
+    bot.add_command(command(name="get", help="Do something")(noop))
+
+    pages = await bot.formatter.format_help_for(context(bot, MEMBER), bot.get_command("get"))
+    assert "Do something" in pages[0]
@@ -0,0 +1,58 @@
+# coding=utf-8
+import pytest
+
+from bot.cogs.snakes import SnakeIndex
+from bot.constants import SNAKE_INDEX_PATH
+from bot.fuzzy import TrigramIndex, damerau_levenshtein, normalize
+
+
+@pytest.mark.parametrize("a, b, distance", [
+    ("cobra", "cobra", 0),
+    ("cobar", "cobra", 1),
+    ("cobr", "cobra", 1),
+    ("cobbra", "cobra", 1),
+    ("kobra", "cobra", 1),
+    ("", "cobra", 5),
+    ("mamba", "cobra", 4),
+])
+def test_damerau_levenshtein(a, b, distance):
+    assert damerau_levenshtein(a, b) == distance
+    assert damerau_levenshtein(b, a) == distance
+
+
+def test_damerau_levenshtein_stops_past_max_distance():
+    assert damerau_levenshtein("python", "anaconda", max_distance=2) == 3
+
+
+def test_normalize():
+    assert normalize("King-Cobra") == normalize("king  cobra") == normalize("KING_COBRA") == "king cobra"
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("hlep", "help"),
+    ("cobar", "cobra"),
+    ("pyhton", "python"),
+    ("cobr", "cobra"),
+])
+def test_search_finds_one_edit_away(query, expected):
+    index = TrigramIndex(["help", "cobra", "python", "mamba", "anaconda"])
+
+    assert index.search(query, limit=1) == [(expected, 1)]
+
+
+def test_search_skips_removed_keys():
+    index = TrigramIndex(["cobra", "cobras"])
+    index.remove("cobras")
+
+    assert index.search("cobrs") == [("cobra", 1)]
+    assert "cobras" not in index
+
+
+def test_snake_index_resolves_names():
+    index = SnakeIndex.from_file(SNAKE_INDEX_PATH)
+
+    assert index.resolve("king-cobra") == "King Cobra"
+    assert index.resolve("Ophiophagus hannah") == "King Cobra"
+    assert index.resolve("king cobar") == "King Cobra"
+    assert index.resolve("royal python") == "Ball Python"
+    assert index.resolve("xyzzy") is None
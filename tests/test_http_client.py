@@ -0,0 +1,151 @@
+# coding=utf-8
+import asyncio
+from collections import Counter
+
+from aiohttp import ClientResponseError, test_utils, web
+
+import pytest
+
+from bot.http_client import CircuitBreaker, CircuitOpenError, HTTPClient, ServerError
+
+from tests import async_test
+
+
+class StubServer:
+    """
+    A local server that counts requests by path - "/flaky" fails with a 503 twice before it works, and "/slow" takes a
+    second to answer
+    """
+
+    def __init__(self):
+        self.requests = Counter()
+
+        app = web.Application()
+        app.router.add_get("/{path}", self.handle)
+        self.server = test_utils.TestServer(app)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        path = request.match_info["path"]
+        self.requests[path] += 1
+
+        if path == "slow":
+            await asyncio.sleep(1)
+
+        if path == "missing":
+            return web.Response(status=404)
+
+        if path == "down" or (path == "flaky" and self.requests[path] <= 2):
+            return web.Response(status=503)
+
+        return web.json_response({"path": path})
+
+    def url(self, path: str) -> str:
+        return str(self.server.make_url(f"/{path}"))
+
+
+async def start(**options):
+    loop = asyncio.get_event_loop()
+    server = StubServer()
+    await server.server.start_server(loop=loop)
+
+    client = HTTPClient(loop=loop, backoff=0.001, **options)
+    return server, client
+
+
+async def stop(server: StubServer, client: HTTPClient):
+    await client.close()
+    await server.server.close()
+
+
+@async_test
+async def test_get_json_records_latency():
+    server, client = await start()
+
+    assert await client.get_json(server.url("snakes")) == {"path": "snakes"}
+    assert await client.get_text(server.url("snakes")) == '{"path": "snakes"}'
+    await stop(server, client)
+
+    assert client.latencies["127.0.0.1"].count == 2
+    assert not client.stats["127.0.0.1"]["circuit_open"]
+
+
+@async_test
+async def test_retries_server_errors():
+    server, client = await start(retries=2)
+
+    assert await client.get_json(server.url("flaky")) == {"path": "flaky"}
+    await stop(server, client)
+
+    assert server.requests["flaky"] == 3
+
+
+@async_test
+async def test_gives_up_after_retries():
+    server, client = await start(retries=1, breaker_threshold=10)
+
+    with pytest.raises(ServerError):
+        await client.get_json(server.url("down"))
+
+    await stop(server, client)
+
+    assert server.requests["down"] == 2
+
+
+@async_test
+async def test_total_timeout_covers_every_attempt():
+    server, client = await start(retries=3, total_timeout=0.2, breaker_threshold=10)
+    started = asyncio.get_event_loop().time()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await client.get_json(server.url("slow"))
+
+    elapsed = asyncio.get_event_loop().time() - started
+    await stop(server, client)
+
+    assert elapsed < 0.4
+    assert server.requests["slow"] == 1
+
+
+@async_test
+async def test_client_errors_arent_retried():
+    server, client = await start(retries=2)
+
+    with pytest.raises(ClientResponseError):
+        await client.get_json(server.url("missing"))
+
+    await stop(server, client)
+
+    assert server.requests["missing"] == 1
+
+
+@async_test
+async def test_circuit_opens_after_failures():
+    server, client = await start(retries=0, breaker_threshold=2, breaker_cooldown=60)
+
+    for _ in range(2):
+        with pytest.raises(ServerError):
+            await client.get_json(server.url("down"))
+
+    with pytest.raises(CircuitOpenError):
+        await client.get_json(server.url("snakes"))
+
+    await stop(server, client)
+
+    assert server.requests == {"down": 2}
+    assert client.stats["127.0.0.1"]["circuit_open"]
+
+
+def test_circuit_breaker_lets_one_request_through_after_cooldown():
+    breaker = CircuitBreaker(threshold=2, cooldown=10)
+    breaker.failure(0)
+    assert breaker.allow(1)
+
+    breaker.failure(1)
+    assert breaker.open
+    assert not breaker.allow(5)
+
+    assert breaker.allow(11)
+    assert not breaker.allow(12)
+
+    breaker.success()
+    assert breaker.allow(12)
@@ -0,0 +1,90 @@
+# coding=utf-8
+import hashlib
+import io
+import json
+import os
+import threading
+from types import SimpleNamespace
+
+from PIL import Image
+
+from bot.images import ImageCache
+
+from tests import async_test
+
+
+def picture(colour: str, size: int = 1024) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", (size, size), colour).save(output, "PNG")
+    return output.getvalue()
+
+
+def image_cache(path: str) -> ImageCache:
+    async def get_bytes(url: str) -> bytes:
+        return picture(url.rsplit("/", 1)[-1])
+
+    return ImageCache(path, SimpleNamespace(get_bytes=get_bytes), max_size=64, workers=1)
+
+
+def index(path: str) -> dict:
+    with open(os.path.join(path, "index.json"), encoding="utf-8") as file:
+        return json.load(file)
+
+
+@async_test
+async def test_makes_and_reuses_thumbnails(tmpdir):
+    images = image_cache(str(tmpdir))
+
+    path = await images.get("https://example.com/green")
+
+    with Image.open(path) as thumbnail:
+        assert thumbnail.size == (64, 64) and thumbnail.format == "JPEG"
+
+    assert images.cached("https://example.com/green") == path
+    assert index(str(tmpdir)) == {"https://example.com/green": os.path.basename(path)[:-4]}
+    images.close()
+
+
+@async_test
+async def test_workers_sharing_a_directory_keep_each_others_entries(tmpdir):
+    first, second = image_cache(str(tmpdir)), image_cache(str(tmpdir))
+
+    await first.get("https://example.com/green")
+    await second.get("https://example.com/blue")
+    await first.get("https://example.com/red")
+
+    assert sorted(index(str(tmpdir))) == [
+        "https://example.com/blue", "https://example.com/green", "https://example.com/red"
+    ]
+    first.close()
+    second.close()
+
+
+@async_test
+async def test_concurrent_index_writes_lose_nothing(tmpdir):
+    caches = [image_cache(str(tmpdir)) for _ in range(8)]
+    errors = []
+
+    def store(number: int, images: ImageCache):
+        data = f"thumbnail {number}".encode()
+        digest = hashlib.sha256(data).hexdigest()
+
+        try:
+            images._store(digest, data, {f"https://example.com/{number}": digest})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=store, args=(number, images)) for number, images in enumerate(caches)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(index(str(tmpdir))) == 8
+    assert not [name for name in os.listdir(str(tmpdir)) if name.endswith(".tmp")]
+
+    for images in caches:
+        images.close()
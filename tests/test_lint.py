@@ -0,0 +1,38 @@
+# coding=utf-8
+import ast
+import importlib.util
+import os
+
+import pytest
+
+LAZY_LOGGING = os.path.join(os.path.dirname(os.path.dirname(__file__)), "lint", "lazy_logging.py")
+
+# lint/ isn't a package - flake8 loads the plugin from its path, see tox.ini
+spec = importlib.util.spec_from_file_location("lazy_logging", LAZY_LOGGING)
+lazy_logging = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(lazy_logging)
+
+
+def check(source: str) -> list:
+    return [message[:4] for _, _, message, _ in lazy_logging.LazyLoggingChecker(ast.parse(source)).run()]
+
+
+@pytest.mark.parametrize("source", [
+    "log.trace(f'Added line: {line}')",
+    "log.debug('Added line: {}'.format(line))",
+    "log.debug('Added line: %s' % line)",
+    "log.trace('Added line: ' + line)",
+])
+def test_flags_eager_formatting(source):
+    assert check(source) == ["L001"]
+
+
+@pytest.mark.parametrize("source", [
+    "log.trace('Added line: %s', line)",
+    "log.debug(f'Added a line')",
+    "log.info(f'Loaded {name}')",
+    "log.warning('Failed: {}'.format(error))",
+    "log.debug()",
+])
+def test_allows_lazy_formatting_and_other_levels(source):
+    assert check(source) == []
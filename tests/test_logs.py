@@ -0,0 +1,82 @@
+# coding=utf-8
+import atexit
+import json
+import logging
+import sys
+import threading
+
+import pytest
+
+from bot.logs import DropOldestQueue, JSONFormatter, setup_logging
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield root
+
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+
+    for handler in handlers:
+        root.addHandler(handler)
+
+    root.setLevel(level)
+
+
+def test_full_queue_drops_the_oldest():
+    queue = DropOldestQueue(3)
+
+    for number in range(5):
+        queue.put_nowait(number)
+
+    assert queue.dropped == 2
+    assert [queue.get_nowait() for _ in range(3)] == [2, 3, 4]
+
+
+def test_dropped_items_dont_need_task_done():
+    queue = DropOldestQueue(2)
+
+    for number in range(5):
+        queue.put(number)
+
+    while not queue.empty():
+        queue.get()
+        queue.task_done()
+
+    joined = threading.Thread(target=queue.join)
+    joined.start()
+    joined.join(1)
+
+    assert not joined.is_alive()
+
+
+def test_json_includes_the_exception():
+    try:
+        raise ValueError("oops")
+    except ValueError:
+        record = logging.getLogger("bot.test").makeRecord(
+            "bot.test", logging.ERROR, __file__, 1, "Failed to %s", ("hiss",), sys.exc_info()
+        )
+
+    data = json.loads(JSONFormatter().format(record))
+
+    assert data["level"] == "ERROR"
+    assert data["logger"] == "bot.test"
+    assert data["message"] == "Failed to hiss"
+    assert data["exception"].startswith("Traceback") and data["exception"].endswith("ValueError: oops")
+
+
+def test_stopping_the_listener_flushes_the_file(tmpdir, root_logger):
+    path = tmpdir.join("bot.log")
+    listener = setup_logging("INFO", log_format="json", path=str(path))
+    atexit.unregister(listener.stop)
+
+    for number in range(100):
+        logging.getLogger("bot.test").info("Record %d", number)
+
+    listener.stop()
+    lines = path.read_text("utf-8").splitlines()
+
+    assert [json.loads(line)["message"] for line in lines] == [f"Record {number}" for number in range(100)]
@@ -0,0 +1,79 @@
+# coding=utf-8
+from bot.metrics import Histogram, log_buckets, prometheus_counter, prometheus_histogram
+
+
+def test_log_buckets():
+    assert log_buckets(1, 2, 4) == [1, 2, 4, 8]
+
+
+def test_values_go_in_the_first_bucket_they_fit():
+    histogram = Histogram([1, 2, 4])
+
+    for value in (0.5, 1, 1.5, 3, 4, 100):
+        histogram.record(value)
+
+    assert histogram.counts == [2, 1, 2, 1]
+    assert histogram.count == 6
+    assert histogram.min == 0.5
+    assert histogram.max == 100
+
+
+def test_percentiles_are_bucket_bounds():
+    histogram = Histogram([1, 2, 4])
+
+    for value in [0.5] * 90 + [3] * 9 + [10]:
+        histogram.record(value)
+
+    assert histogram.percentile(50) == 1
+    assert histogram.percentile(90) == 1
+    assert histogram.percentile(99) == 4
+    assert histogram.percentile(100) == 10  # The overflow bucket reports the largest value
+    assert Histogram().percentile(50) == 0.0
+
+
+def test_cumulative():
+    histogram = Histogram([1, 2])
+
+    for value in (0.5, 1.5, 1.5, 5):
+        histogram.record(value)
+
+    assert histogram.cumulative() == [(1, 1), (2, 3), (float("inf"), 4)]
+
+
+def test_merge():
+    first, second = Histogram([1, 2]), Histogram([1, 2])
+    first.record(0.5)
+    second.record(1.5)
+    second.record(5)
+
+    first.merge(second)
+
+    assert first.counts == [1, 1, 1]
+    assert first.count == 3
+    assert first.total == 7
+    assert (first.min, first.max) == (0.5, 5)
+
+
+def test_prometheus_histogram():
+    histogram = Histogram([0.1, 1])
+    histogram.record(0.05)
+    histogram.record(0.5)
+
+    assert prometheus_histogram("latency_seconds", "How long it took", {'say "hi"': histogram}, "command") == [
+        "# HELP latency_seconds How long it took",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{command="say \\"hi\\"",le="0.1"} 1',
+        'latency_seconds_bucket{command="say \\"hi\\"",le="1"} 2',
+        'latency_seconds_bucket{command="say \\"hi\\"",le="+Inf"} 2',
+        'latency_seconds_sum{command="say \\"hi\\""} 0.55',
+        'latency_seconds_count{command="say \\"hi\\""} 2',
+    ]
+
+
+def test_prometheus_counter():
+    assert prometheus_counter("calls_total", "Calls", {"b": 2, "a": 1}, "command") == [
+        "# HELP calls_total Calls",
+        "# TYPE calls_total counter",
+        'calls_total{command="a"} 1',
+        'calls_total{command="b"} 2',
+    ]
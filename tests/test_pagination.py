@@ -0,0 +1,270 @@
+# coding=utf-8
+import asyncio
+from types import SimpleNamespace
+
+from discord import Embed
+
+import pytest
+
+from bot.pagination import (
+    DELETE_EMOJI, LEFT_EMOJI, LinePaginator, PAGINATION_EMOJI, PageStream, PaginationManager, PaginationSession,
+    RIGHT_EMOJI
+)
+
+from tests import async_test
+
+USER = SimpleNamespace(id=42)
+
+
+class StubMessage:
+    """
+    Just enough of a `discord.Message` for a pagination session, recording what it's asked to do
+    """
+
+    def __init__(self, reaction_delay: float = 0, manage_messages: bool = False):
+        self.id = 1
+        self.edits = []
+        self.reactions = []
+        self.removed = []
+        self.reaction_delay = reaction_delay
+
+        # Only messages in a guild can have other people's reactions removed
+        self.guild = SimpleNamespace(me=SimpleNamespace(id=0)) if manage_messages else None
+        self.channel = SimpleNamespace(permissions_for=lambda member: SimpleNamespace(manage_messages=True))
+
+    async def edit(self, embed: Embed):
+        self.edits.append(embed.description)
+
+    async def add_reaction(self, emoji: str):
+        await asyncio.sleep(self.reaction_delay)  # A round trip to Discord
+        self.reactions.append(emoji)
+
+    async def remove_reaction(self, emoji: str, user):
+        self.removed.append((emoji, user.id))
+
+
+class StubContext:
+    """
+    A context that sends `StubMessage`s, and keeps the bot's side of the pagination manager out of the way
+    """
+
+    def __init__(self):
+        self.bot = SimpleNamespace(
+            loop=asyncio.get_event_loop(), user=SimpleNamespace(id=0), add_listener=lambda listener: None
+        )
+        self.me = self.bot.user
+        self.sent = []
+
+    async def send(self, embed: Embed) -> StubMessage:
+        self.sent.append(embed.description)
+        return StubMessage()
+
+
+class SlowLines:
+    """
+    An async iterator that refuses to be advanced concurrently, like async generators on newer versions of Python
+    """
+
+    def __init__(self, count: int):
+        self.lines = iter(range(count))
+        self.running = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        if self.running:
+            raise RuntimeError("anext(): asynchronous generator is already running")
+
+        self.running = True
+
+        try:
+            await asyncio.sleep(0)
+            number = next(self.lines, None)
+        finally:
+            self.running = False
+
+        if number is None:
+            raise StopAsyncIteration
+
+        return f"line {number}"
+
+
+class CountedLines:
+    """
+    An async generator of lines that records how many of them have been read
+    """
+
+    def __init__(self, count: int):
+        self.count = count
+        self.read = 0
+
+    async def __aiter__(self):
+        for number in range(self.count):
+            await asyncio.sleep(0)
+            self.read += 1
+            yield f"line {number}"
+
+
+def stream(lines) -> PageStream:
+    return PageStream(LinePaginator(prefix="", suffix="", max_lines=2), lines, empty=False)
+
+
+@pytest.fixture(autouse=True)
+def embed_from_data(monkeypatch):
+    # The bot targets the rewrite from before `Embed.from_data` was renamed to `from_dict`
+    if hasattr(Embed, "from_dict"):
+        monkeypatch.setattr(Embed, "from_data", Embed.from_dict, raising=False)
+
+
+@async_test
+async def test_concurrent_gets_share_an_async_source():
+    pages = stream(SlowLines(50))
+
+    first, fifth, tenth = await asyncio.gather(pages.get(0), pages.get(4), pages.get(9))
+
+    assert first.split() == ["line", "0", "line", "1"]
+    assert fifth.split() == ["line", "8", "line", "9"]
+    assert tenth.split() == ["line", "18", "line", "19"]
+
+
+@async_test
+async def test_quick_clicks_stay_on_the_last_page():
+    pages = stream(SlowLines(4))  # Two pages
+    session = PaginationSession(pages, Embed(), debounce=0)
+    session.start(StubMessage())
+
+    await asyncio.gather(*(session.handle(RIGHT_EMOJI, USER) for _ in range(3)))
+    await session._flush_task
+
+    assert session.current_page == 1
+    assert [edit.split() for edit in session.message.edits] == [["line", "2", "line", "3"]]
+    session.finish()
+
+
+@async_test
+async def test_two_pages_only_get_left_and_right():
+    pages = stream(SlowLines(4))
+    await pages.get(0)
+    session = PaginationSession(pages, Embed())
+    session.start(StubMessage())
+
+    session.seed_reactions()
+    await session._seed_task
+
+    assert session.message.reactions == [LEFT_EMOJI, RIGHT_EMOJI, DELETE_EMOJI]
+
+
+@async_test
+async def test_more_pages_get_every_emoji():
+    pages = stream(SlowLines(20))
+    await pages.get(0)
+    session = PaginationSession(pages, Embed())
+    session.start(StubMessage())
+
+    session.seed_reactions()
+    await session._seed_task
+
+    assert session.message.reactions == PAGINATION_EMOJI
+
+
+@async_test
+async def test_navigates_while_seeding():
+    pages = stream(SlowLines(20))
+    session = PaginationSession(pages, Embed(), debounce=0)
+    session.start(StubMessage(reaction_delay=1))
+
+    session.seed_reactions()
+    await session.handle(RIGHT_EMOJI, USER)
+    await session._flush_task
+
+    assert not session._seed_task.done()
+    assert session.current_page == 1
+    assert len(session.message.edits) == 1
+    session.finish()
+
+
+@async_test
+async def test_pages_are_read_on_demand():
+    lines = CountedLines(1000)
+    ctx = StubContext()
+    task = asyncio.ensure_future(LinePaginator.paginate(lines, ctx, Embed(), max_lines=2, empty=False))
+    manager = PaginationManager.for_bot(ctx.bot)
+
+    while not manager.sessions:
+        await asyncio.sleep(0)
+
+    # The first page is sent once the second one is full - its first line closes it, by starting the third
+    assert ctx.sent[0].split() == ["line", "0", "line", "1"]
+    assert lines.read == 5
+
+    session, = manager.sessions.values()
+    await session.handle(RIGHT_EMOJI, USER)
+    assert lines.read == 7  # One more page of lookahead
+
+    session.finish()
+    await task
+    manager._ticker.cancel()
+
+    assert lines.read == 7
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+@async_test
+async def test_first_click_edits_straight_away():
+    pages = stream(SlowLines(20))
+    session = PaginationSession(pages, Embed(), debounce=60)
+    session.start(StubMessage())
+
+    await session.handle(RIGHT_EMOJI, USER)
+    await settle()
+    assert [edit.split() for edit in session.message.edits] == [["line", "2", "line", "3"]]
+
+    # Later clicks wait for the end of the window, and are shown together
+    await session.handle(RIGHT_EMOJI, USER)
+    await session.handle(RIGHT_EMOJI, USER)
+    await settle()
+    assert session.current_page == 3
+    assert len(session.message.edits) == 1
+    session.finish()
+
+
+@async_test
+async def test_reactions_are_only_removed_with_manage_messages():
+    for manage_messages, removed in ((False, []), (True, [(RIGHT_EMOJI, USER.id)])):
+        session = PaginationSession(stream(SlowLines(20)), Embed(), debounce=0)
+        session.start(StubMessage(manage_messages=manage_messages))
+
+        await session.handle(RIGHT_EMOJI, USER)
+        await session._flush_task
+
+        assert session.can_manage_messages is manage_messages
+        assert session.message.removed == removed
+        assert len(session.message.edits) == 1
+        session.finish()
+
+
+@async_test
+async def test_rendered_pages_follow_the_template():
+    template = Embed(title="Snakes", colour=0x00ff00).set_author(name="Snek")
+    session = PaginationSession(stream(SlowLines(20)), template, footer_text="Results")
+
+    first = await session.render(0)
+    assert await session.render(0) is first
+    assert first.footer.text == "Results (Page 1/?)"
+
+    for embed in (first, await session.render(1)):
+        data = embed.to_dict()
+        assert data.pop("description").split()[0] == "line"
+        data.pop("footer")
+        assert data == template.to_dict()
+
+    await session.pages.drain()  # Now the page count is known, so the footers are rendered again
+    rendered = await session.render(0)
+    assert rendered is not first
+    assert rendered.footer.text == "Results (Page 1/10)"
+    assert rendered.description == first.description
@@ -0,0 +1,64 @@
+# coding=utf-8
+from types import SimpleNamespace
+
+from bot.prefixes import PrefixTrie, when_mentioned_or_trie
+
+PREFIXES = (
+    ">>> self.", ">> self.", "> self.", "self.",
+    ">>> bot.", ">> bot.", "> bot.", "bot.",
+    ">>> ", ">> ", "> ",
+    ">>>", ">>", ">"
+)
+
+BOT = SimpleNamespace(user=SimpleNamespace(id=1234, mention="<@1234>"))
+
+
+def test_longest_prefix_listed_first_wins():
+    trie = PrefixTrie(*PREFIXES)
+
+    assert trie.match(">>> self.help()") == ">>> self."
+    assert trie.match(">> bot.help()") == ">> bot."
+    assert trie.match("> help") == "> "
+    assert trie.match(">>>help") == ">>>"
+    assert trie.match("bot.help()") == "bot."
+
+
+def test_order_matters():
+    assert PrefixTrie("a", "ab").match("abc") == "a"
+    assert PrefixTrie("ab", "a").match("abc") == "ab"
+    assert PrefixTrie("ab", "a").match("ac") == "a"
+
+
+def test_ignores_case():
+    trie = PrefixTrie("Bot.")
+
+    assert trie.match("BOT.help()") == "bot."
+    assert trie.match("bOt.help()") == "bot."
+
+
+def test_no_match():
+    trie = PrefixTrie(*PREFIXES)
+
+    assert trie.match("hello there") is None
+    assert trie.match("") is None
+    assert trie.match("bo") is None
+
+
+def test_start():
+    trie = PrefixTrie(*PREFIXES)
+
+    assert trie.match("xxbot.help()", start=2) == "bot."
+    assert trie.match("xxbot.help()") is None
+
+
+def test_duplicate_prefix_keeps_first():
+    trie = PrefixTrie("bot.", ">", "BOT.")
+
+    assert trie.match("bot.help") == "bot."
+
+
+def test_when_mentioned_or_trie():
+    get_prefix = when_mentioned_or_trie(*PREFIXES)
+
+    assert get_prefix(BOT, SimpleNamespace(content="bot.help()")) == ["<@1234> ", "<@!1234> ", "bot."]
+    assert get_prefix(BOT, SimpleNamespace(content="just chatting")) == ["<@1234> ", "<@!1234> "]
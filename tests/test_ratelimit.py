@@ -0,0 +1,41 @@
+# coding=utf-8
+import pytest
+
+from bot.ratelimit import RateLimited, RateLimiter, TokenBuckets, worker_share
+
+
+def test_buckets_refill_over_time():
+    buckets = TokenBuckets(rate=1, capacity=2)
+
+    buckets.take("user", 0)
+    buckets.take("user", 0)
+
+    assert buckets.wait_time("user", 0) == 1
+    assert buckets.wait_time("user", 0.5) == 0.5
+    assert buckets.wait_time("user", 1) == 0
+
+
+def test_sweep_forgets_full_buckets():
+    buckets = TokenBuckets(rate=1, capacity=2)
+    buckets.take("idle", 0)
+    buckets.take("busy", 9.5)
+
+    assert buckets.sweep(10) == 1
+    assert len(buckets) == 1
+    assert buckets.wait_time("busy", 10) == 0
+
+
+def test_limiter_takes_nothing_when_any_scope_is_empty():
+    limiter = RateLimiter(user=(1, 1), channel=(1, 5), command=(1, 5))
+    limiter.check(1, 10, "get", 0)
+
+    with pytest.raises(RateLimited) as error:
+        limiter.check(1, 10, "get", 0)
+
+    assert error.value.scope == "user"
+    assert limiter.channels.wait_time(10, 0) == 0 and limiter.channels._tokens[0] == 4
+
+
+@pytest.mark.parametrize("workers, share", [(1, (5, 30)), (3, (5 / 3, 10)), (60, (5 / 60, 1))])
+def test_worker_share(workers, share):
+    assert worker_share((5, 30), workers) == share
@@ -0,0 +1,177 @@
+# coding=utf-8
+import asyncio
+from types import SimpleNamespace
+from urllib.parse import unquote
+
+from aiohttp import ClientResponseError, test_utils, web
+
+import pytest
+
+from bot.cogs import snakes
+from bot.http_client import HTTPClient
+
+from tests import async_test
+
+
+class StubAPI:
+    """
+    A local snake API that counts the requests it gets, and takes a while to answer so concurrent lookups overlap
+    """
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.requests = []
+
+        app = web.Application()
+        app.router.add_get("/snakes/{name}", self.snake)
+        self.server = test_utils.TestServer(app)
+
+    async def snake(self, request: web.Request) -> web.Response:
+        name = unquote(request.match_info["name"])
+        self.requests.append(name)
+        await asyncio.sleep(self.delay)
+
+        if name == "missingno":
+            return web.json_response({"error": "No such snake"}, status=404)
+
+        return web.json_response({"name": name, "description": f"All about {name}"})
+
+    def url(self, name: str) -> str:
+        return str(self.server.make_url(f"/snakes/{name}"))
+
+
+class StubContext:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content: str = None, *, embed=None, file=None):
+        self.sent.append(embed.title if embed is not None else content)
+
+
+@pytest.fixture
+def cog_factory(tmpdir, monkeypatch):
+    monkeypatch.setattr(snakes, "SNAKE_CACHE_PATH", str(tmpdir.join("snakes.sqlite3")))
+    monkeypatch.setattr(snakes, "SNAKE_IMAGE_PATH", str(tmpdir.join("images")))
+
+    async def create(api: StubAPI) -> snakes.Snakes:
+        loop = asyncio.get_event_loop()
+        await api.server.start_server(loop=loop)
+
+        bot = SimpleNamespace(loop=loop, http_client=HTTPClient(loop=loop, retries=0), cluster=None)
+        cog = snakes.Snakes(bot)
+        cog.random_pool.stop()
+        cog.fetch_snek = lambda name=None: bot.http_client.get_json(api.url(name))
+        return cog
+
+    return create
+
+
+async def close(cog: snakes.Snakes, api: StubAPI):
+    cog._Snakes__unload()
+    await cog.bot.http_client.close()
+    await api.server.close()
+
+
+async def invoke(cog: snakes.Snakes, names):
+    contexts = [StubContext() for _ in names]
+    results = await asyncio.gather(
+        *(snakes.Snakes.get.callback(cog, ctx, name) for ctx, name in zip(contexts, names)), return_exceptions=True
+    )
+    return contexts, results
+
+
+@async_test
+async def test_concurrent_gets_share_one_request(cog_factory):
+    api = StubAPI()
+    cog = await cog_factory(api)
+
+    contexts, results = await invoke(cog, ["python"] * 50)
+    await close(cog, api)
+
+    assert results == [None] * 50
+    assert all(ctx.sent == ["Python"] for ctx in contexts)
+    assert api.requests == ["Python"]
+
+
+@async_test
+async def test_one_request_per_snake(cog_factory):
+    api = StubAPI()
+    cog = await cog_factory(api)
+
+    await invoke(cog, ["python", "ball python", "royal python", "PYTHON"] * 10)
+    await close(cog, api)
+
+    assert sorted(api.requests) == ["Ball Python", "Python"]
+
+
+@async_test
+async def test_errors_reach_every_waiter(cog_factory):
+    api = StubAPI()
+    cog = await cog_factory(api)
+
+    _, results = await invoke(cog, ["missingno"] * 10)
+    await close(cog, api)
+
+    assert all(isinstance(result, ClientResponseError) for result in results)
+    assert api.requests == ["missingno"]
+
+
+@async_test
+async def test_cancelling_one_waiter_leaves_the_rest(cog_factory):
+    api = StubAPI()
+    cog = await cog_factory(api)
+
+    first = asyncio.ensure_future(cog.get_snek("python"))
+    second = asyncio.ensure_future(cog.get_snek("python"))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    assert (await second)["name"] == "Python"
+    assert first.cancelled()
+    await close(cog, api)
+
+    assert api.requests == ["Python"]
+
+
+@async_test
+async def test_random_snake_before_fetch_snek_is_written(cog_factory):
+    api = StubAPI()
+    cog = await cog_factory(api)
+    del cog.fetch_snek  # Back to the template, which returns None
+
+    ctx = StubContext()
+    await snakes.Snakes.get.callback(cog, ctx)
+    await close(cog, api)
+
+    assert ctx.sent == ["I couldn't find a random snake right now. Try asking for one by name!"]
+
+
+@async_test
+async def test_one_unknown_species_doesnt_stop_the_random_pool(cog_factory):
+    api = StubAPI(delay=0)
+    cog = await cog_factory(api)
+    cog.index = snakes.SnakeIndex([
+        {"name": "Python", "scientific_name": "Pythonidae", "aliases": []},
+        {"name": "Missingno", "scientific_name": "Glitchus", "aliases": []},
+    ])
+
+    async def fetch_snek(name: str = None):
+        return None if name == "Missingno" else {"name": name}
+
+    cog.fetch_snek = fetch_snek
+    cog.random_pool.start()
+
+    for _ in range(100):
+        if len(cog.random_pool._items) == cog.random_pool.size:
+            break
+
+        await asyncio.sleep(0.01)
+
+    assert len(cog.random_pool._items) == cog.random_pool.size
+    assert not cog.random_pool.idle
+
+    ctx = StubContext()
+    await snakes.Snakes.get.callback(cog, ctx)
+    await close(cog, api)
+
+    assert ctx.sent == ["Python"]
@@ -0,0 +1,93 @@
+# coding=utf-8
+from types import SimpleNamespace
+
+from discord.ext.commands import Bot, CommandInvokeError, command
+
+from bot.cluster import aggregate_stats, shard_ranges
+from bot.cogs.stats import Stats
+from bot.pagination import LinePaginator
+
+from tests import async_test
+
+
+async def noop(ctx):
+    pass
+
+
+class StubContext(SimpleNamespace):
+    def __init__(self, bot: Bot, name: str):
+        super().__init__(bot=bot, command=bot.get_command(name))
+
+
+def stats_cog() -> Stats:
+    bot = Bot(command_prefix="bot.")
+    bot.cluster = None
+    bot.add_command(command(name="get")(noop))
+    bot.add_command(command(name="quiz")(noop))
+    return Stats(bot)
+
+
+async def run(cog: Stats, name: str, error: Exception = None):
+    ctx = StubContext(cog.bot, name)
+    await cog.on_command(ctx)
+
+    if error is None:
+        await cog.on_command_completion(ctx)
+    else:
+        await cog.on_command_error(ctx, error)
+
+
+@async_test
+async def test_counts_invocations_errors_and_latencies():
+    cog = stats_cog()
+
+    await run(cog, "get")
+    await run(cog, "get", CommandInvokeError(ValueError("oops")))
+    await run(cog, "quiz")
+    await cog.on_command_error(SimpleNamespace(command=None), CommandInvokeError(ValueError("unknown")))
+
+    assert cog.invocations == {"get": 2, "quiz": 1}
+    assert cog.errors == {"get": 1}
+    assert {name: histogram.count for name, histogram in cog.latencies.items()} == {"get": 2, "quiz": 1}
+    assert cog.cog_times().keys() == {"NoCategory"}
+
+    lines = cog.lines()
+    rows = {line.split()[0]: line.split()[1:3] for line in lines[3:5]}
+    assert rows == {"get": ["2", "1"], "quiz": ["1", "0"]}
+    assert "# Event loop lag, in ms" in lines
+
+    text = cog.prometheus()
+    assert 'bot_command_invocations_total{command="get"} 2' in text
+    assert 'bot_command_errors_total{command="get"} 1' in text
+    assert 'bot_command_latency_seconds_count{command="quiz"} 1' in text
+    assert text.endswith("\n")
+
+    cog._lag_task.cancel()
+
+
+@async_test
+async def test_stats_command_shows_the_cluster(monkeypatch):
+    cog = stats_cog()
+    await run(cog, "get")
+    shown = []
+
+    async def paginate(lines, ctx, embed, **kwargs):
+        shown.extend(lines)
+
+    async def cluster_stats():
+        # More workers than shards, so the second worker has none
+        workers = {index: {"shards": shards, "guilds": 3, "latency": 0.05, "invocations": {"get": 1}}
+                   for index, shards in enumerate(shard_ranges(1, 2))}
+        return aggregate_stats(workers)
+
+    monkeypatch.setattr(LinePaginator, "paginate", paginate)
+    cog.bot.cluster = SimpleNamespace(stats=cluster_stats)
+
+    await cog.stats.callback(cog, SimpleNamespace(bot=cog.bot))
+
+    workers = [line for line in shown if line.startswith("worker")]
+    assert workers[0].split()[:4] == ["worker", "0", "shards", "0-0"]
+    assert workers[1].split()[:4] == ["worker", "1", "shards", "-"]
+    assert shown[-1] == "2 commands run across the cluster, 0 failed"
+
+    cog._lag_task.cancel()
@@ -0,0 +1,45 @@
+# coding=utf-8
+from discord.ext.commands.view import StringView
+
+import bot  # Patches StringView
+
+
+def test_skip_string_ignores_case():
+    view = StringView("BOT.Help()")
+
+    assert view.skip_string("bot.")
+    assert view.index == 4
+    assert view.previous == 0
+
+
+def test_skip_string_no_match():
+    view = StringView("hello bot.")
+
+    assert not view.skip_string("bot.")
+    assert view.index == 0
+
+
+def test_skip_string_from_index():
+    view = StringView(">>> BOT.help()")
+    view.skip_string(">>> ")
+
+    assert view.skip_string("bot.")
+    assert view.index == 8
+
+
+def test_skip_string_past_the_end():
+    view = StringView("bo")
+
+    assert not view.skip_string("bot.")
+    assert view.index == 0
+
+
+def test_get_word_caches_invocations():
+    hits = bot.invocation_cache.hits
+
+    for _ in range(2):
+        view = StringView('cache_test("a", 2)')
+        assert view.get_word() == "cache_test"
+        assert view.buffer == 'cache_test "a" "2"'
+
+    assert bot.invocation_cache.hits == hits + 1
@@ -0,0 +1,67 @@
+# coding=utf-8
+import logging
+from types import SimpleNamespace
+
+from discord.ext.commands import Bot, CheckFailure, CommandInvokeError, CommandNotFound, command
+
+from bot.cogs.suggestions import Suggestions
+from bot.ratelimit import RateLimited
+
+from tests import async_test
+
+
+class StubContext(SimpleNamespace):
+    def __init__(self, invoked_with: str, prefix: str = "bot."):
+        super().__init__(author=SimpleNamespace(id=42), command=None, prefix=prefix, invoked_with=invoked_with, sent=[])
+
+    async def send(self, content: str):
+        self.sent.append(content)
+
+
+async def noop(ctx):
+    pass
+
+
+def suggestions() -> Suggestions:
+    bot = Bot(command_prefix="bot.")
+    bot.add_command(command(name="get")(noop))
+    return Suggestions(bot)
+
+
+@async_test
+async def test_suggests_close_commands(caplog):
+    ctx = StubContext("hlep")
+    await suggestions().on_command_error(ctx, CommandNotFound())
+
+    assert len(ctx.sent) == 1 and "`bot.help()`" in ctx.sent[0]
+    assert not [record for record in caplog.records if record.levelno >= logging.WARNING]
+
+
+@async_test
+async def test_quietly_ignores_unknown_commands_without_suggestions(caplog):
+    ctx = StubContext("xyzzy")
+    await suggestions().on_command_error(ctx, CommandNotFound())
+
+    assert ctx.sent == []
+    assert not [record for record in caplog.records if record.levelno >= logging.WARNING]
+
+
+@async_test
+async def test_quietly_ignores_check_failures(caplog):
+    cog = suggestions()
+
+    for error in (CheckFailure(), RateLimited("user", 5)):
+        ctx = StubContext("get")
+        await cog.on_command_error(ctx, error)
+        assert ctx.sent == []
+
+    assert not [record for record in caplog.records if record.levelno >= logging.WARNING]
+
+
+@async_test
+async def test_logs_other_errors(caplog):
+    ctx = StubContext("get")
+    await suggestions().on_command_error(ctx, CommandInvokeError(ValueError("oops")))
+
+    assert ctx.sent == []
+    assert [record.levelno for record in caplog.records] == [logging.ERROR]
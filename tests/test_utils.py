@@ -0,0 +1,45 @@
+# coding=utf-8
+import pickle
+
+from bot.utils import CaseInsensitiveDict, LRUCache
+
+
+def test_keys_are_case_folded():
+    cogs = CaseInsensitiveDict(Snakes=1)
+    cogs["STRASSE"] = 2
+
+    assert cogs["snakes"] == cogs.get("SNAKES") == 1
+    assert "straße" in cogs
+    assert cogs.pop("Straße") == 2
+    assert "strasse" not in cogs
+
+
+def test_remembers_original_keys():
+    cogs = CaseInsensitiveDict([("Snakes", 1)], Security=2)
+    cogs.update({"Stats": 3})
+    cogs.setdefault("Eval", 4)
+
+    assert sorted(cogs.original_keys()) == ["Eval", "Security", "Snakes", "Stats"]
+    assert cogs.original_key("SNAKES") == "Snakes"
+    assert cogs.popitem() == ("Eval", 4)
+
+
+def test_copies_and_pickles():
+    cogs = CaseInsensitiveDict(Snakes=1)
+
+    for copy in (cogs.copy(), pickle.loads(pickle.dumps(cogs))):
+        assert type(copy) is CaseInsensitiveDict
+        assert copy == cogs
+        assert copy.original_key("snakes") == "Snakes"
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache["a"] = 1
+    cache["b"] = 2
+    cache.get("a")
+    cache["c"] = 3
+
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses, cache.hit_rate) == (1, 1, 0.5)